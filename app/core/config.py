@@ -1,4 +1,5 @@
-from typing import Any, Literal
+from typing import Any, Literal, Optional
+from uuid import UUID
 
 from pydantic import Field
 from pydantic.fields import FieldInfo
@@ -9,13 +10,16 @@ class CustomSettingsSource(EnvSettingsSource):
     def prepare_field_value(
         self: 'CustomSettingsSource', field_name: str, field: FieldInfo, value: Any, value_is_complex: bool
     ) -> Any:
-        if field_name == 'ALLOWED_HOSTS':
+        if field_name == 'ALLOWED_HOSTS' or (field_name == 'ADMIN_USER_IDS' and value is not None):
             return value.strip().split(',')
         return super().prepare_field_value(field_name, field, value, value_is_complex)
 
 
 class Settings(BaseSettings):
     ALLOWED_HOSTS: list[str] = Field(default_factory=list)
+    # ids of users allowed to operate the app itself, e.g. run the profiler, comma separated like ALLOWED_HOSTS,
+    # ids because emails are not verified on sign up and anyone could register a listed one
+    ADMIN_USER_IDS: list[UUID] = Field(default_factory=list)
 
     @classmethod
     def settings_customise_sources(
@@ -49,13 +53,50 @@ class Settings(BaseSettings):
 
     REDIS_HOST: str
     REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    # cache writes made after the database commit and reads with a database fallback, see app.redis.cache_writer
+    REDIS_WRITE_TIMEOUT_SECONDS: float = 0.25
+    REDIS_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    REDIS_CIRCUIT_RESET_SECONDS: float = 10
+    REDIS_WRITE_BEHIND_SIZE: int = 10000
+    # command reporting, see app.redis.instrumented
+    REDIS_SLOW_COMMAND_SECONDS: float = 0.05
+    REDIS_LARGE_BATCH_KEYS: int = 100
+
+    # rescoring of past results after answer key changes, see app.services.quizz_service.rescoring
+    RESCORE_CHUNK_SIZE: int = 500
+    RESCORE_PAUSE_SECONDS: float = 0.1
+
+    # per request limits of database statements, see app.utils.instrumentation
+    QUERY_BUDGET: int = 50
+    QUERY_REPEAT_THRESHOLD: int = 10
+    QUERY_BUDGET_STRICT: bool = False
+    # Server-Timing response header, debug adds counts and spans of app.utils.instrumentation.timing_span,
+    # unset it is basic in the local environment only, timings would tell clients how requests are served
+    SERVER_TIMING: Optional[Literal['off', 'basic', 'debug']] = None
+
+    # sampling profiler of live workers, see app.utils.profiler
+    PROFILER_INTERVAL_SECONDS: float = 0.005
+    PROFILER_MAX_SECONDS: float = 60
+
+    @property
+    def server_timing(self: 'Settings') -> Literal['off', 'basic', 'debug']:
+        if self.SERVER_TIMING is not None:
+            return self.SERVER_TIMING
+        return 'basic' if self.ENVIRONMENT == 'local' else 'off'
 
     @property
     def redis_url(self: 'Settings') -> str:
-        return f'redis://{self.REDIS_HOST}:{self.REDIS_PORT}'
+        return f'redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}'
 
     ENVIRONMENT: Literal['local', 'staging', 'production'] = 'local'
 
+    # see app.utils.logging, records below WARNING are kept with LOG_SAMPLE_RATE probability
+    LOG_LEVEL: Literal['DEBUG', 'INFO', 'WARNING', 'ERROR'] = 'INFO'
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_MAX_BYTES: int = 10_000_000
+    LOG_BACKUP_COUNT: int = 5
+
     JWT_SECRET: str
     JWT_EXPIRATION_MINUTES: int = 60
 
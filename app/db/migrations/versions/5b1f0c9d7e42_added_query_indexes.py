@@ -0,0 +1,55 @@
+"""added query indexes
+
+Revision ID: 5b1f0c9d7e42
+Revises: 217bc160447e
+Create Date: 2026-10-19 12:14:03.218577
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c9d7e42'
+down_revision: Union[str, None] = '217bc160447e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial index condition)
+# created_at goes after the equality columns, so the same index serves both filtering and ordering
+INDEXES = [
+    ('ix_users_created_at_id', 'users', ['created_at', 'id'], None),
+    ('ix_companies_public_created_at_id', 'companies', ['created_at', 'id'], 'hidden = false'),
+    ('ix_companies_owner_id_created_at', 'companies', ['owner_id', 'created_at'], None),
+    ('ix_company_actions_user_id_type', 'company_actions', ['user_id', 'type'], None),
+    ('ix_quizzes_company_id_created_at', 'quizzes', ['company_id', 'created_at'], None),
+    ('ix_questions_quizz_id_created_at', 'questions', ['quizz_id', 'created_at'], None),
+    ('ix_answers_question_id_created_at', 'answers', ['question_id', 'created_at'], None),
+    ('ix_quizz_results_user_id_quizz_id_created_at', 'quizz_results', ['user_id', 'quizz_id', 'created_at'], None),
+    ('ix_quizz_results_company_id_created_at', 'quizz_results', ['company_id', 'created_at'], None),
+    ('ix_quizz_results_quizz_id', 'quizz_results', ['quizz_id'], None),
+    ('ix_notifications_user_id_created_at', 'notifications', ['user_id', 'created_at'], None),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY does not lock tables for writes, but can not run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""added quizz answer choices
+
+Revision ID: 8d3e6a41c2f7
+Revises: 5b1f0c9d7e42
+Create Date: 2026-10-19 15:02:27.480113
+
+"""
+
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3e6a41c2f7'
+down_revision: Union[str, None] = '5b1f0c9d7e42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'quizz_answer_choices',
+        sa.Column('quizz_result_id', sa.Uuid(), nullable=False),
+        sa.Column('question_id', sa.Uuid(), nullable=False),
+        sa.Column('answer_id', sa.Uuid(), nullable=True),
+        sa.Column('is_correct', sa.Boolean(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['answer_id'], ['answers.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['quizz_result_id'], ['quizz_results.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_quizz_answer_choices_quizz_result_id_position',
+        'quizz_answer_choices',
+        ['quizz_result_id', 'position'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_quizz_answer_choices_question_id_answer_id',
+        'quizz_answer_choices',
+        ['question_id', 'answer_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_quizz_answer_choices_question_id_answer_id', table_name='quizz_answer_choices')
+    op.drop_index('ix_quizz_answer_choices_quizz_result_id_position', table_name='quizz_answer_choices')
+    op.drop_table('quizz_answer_choices')
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import ClassVar
 from uuid import UUID, uuid4
 
-from sqlalchemy import TIMESTAMP, Boolean, ForeignKey, String, UniqueConstraint, Uuid
+from sqlalchemy import TIMESTAMP, Boolean, ForeignKey, Index, String, UniqueConstraint, Uuid, text
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -39,6 +39,8 @@ class User(ModelWithIdAndTimeStamps):
     email: Mapped[str] = mapped_column(String(50), index=True, unique=True)
     hashed_password: Mapped[str] = mapped_column(String(256))
 
+    __table_args__ = (Index('ix_users_created_at_id', 'created_at', 'id'),)
+
     companies: Mapped[list['Company']] = relationship(
         'Company', back_populates='owner', cascade='all, delete-orphan', passive_deletes=True
     )
@@ -57,6 +59,11 @@ class Company(ModelWithIdAndTimeStamps):
     hidden: Mapped[bool] = mapped_column(Boolean, default=True)
     owner_id: Mapped[UUID] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
 
+    __table_args__ = (
+        Index('ix_companies_public_created_at_id', 'created_at', 'id', postgresql_where=text('hidden = false')),
+        Index('ix_companies_owner_id_created_at', 'owner_id', 'created_at'),
+    )
+
     owner: Mapped[User] = relationship(back_populates='companies')
     company_actions: Mapped[list['CompanyAction']] = relationship(back_populates='company')
 
@@ -75,7 +82,10 @@ class CompanyAction(ModelWithIdAndTimeStamps):
     user_id: Mapped[UUID] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
     type: Mapped[CompanyActionType]
 
-    __table_args__ = (UniqueConstraint('company_id', 'user_id', name='unique_company_user'),)
+    __table_args__ = (
+        UniqueConstraint('company_id', 'user_id', name='unique_company_user'),
+        Index('ix_company_actions_user_id_type', 'user_id', 'type'),
+    )
 
     company: Mapped[Company] = relationship(back_populates='company_actions')
     user: Mapped[User] = relationship(back_populates='company_actions')
@@ -89,6 +99,8 @@ class Quizz(ModelWithIdAndTimeStamps):
     company_id: Mapped[UUID] = mapped_column(ForeignKey('companies.id', ondelete='CASCADE'))
     frequency: Mapped[int]
 
+    __table_args__ = (Index('ix_quizzes_company_id_created_at', 'company_id', 'created_at'),)
+
 
 class Question(ModelWithIdAndTimeStamps):
     __tablename__ = 'questions'
@@ -96,6 +108,8 @@ class Question(ModelWithIdAndTimeStamps):
     text: Mapped[str] = mapped_column(String(250))
     quizz_id: Mapped[UUID] = mapped_column(ForeignKey('quizzes.id', ondelete='CASCADE'))
 
+    __table_args__ = (Index('ix_questions_quizz_id_created_at', 'quizz_id', 'created_at'),)
+
 
 class Answer(ModelWithIdAndTimeStamps):
     __tablename__ = 'answers'
@@ -104,6 +118,8 @@ class Answer(ModelWithIdAndTimeStamps):
     question_id: Mapped[UUID] = mapped_column(ForeignKey('questions.id', ondelete='CASCADE'))
     is_correct: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    __table_args__ = (Index('ix_answers_question_id_created_at', 'question_id', 'created_at'),)
+
 
 class QuizzResult(ModelWithIdAndTimeStamps):
     __tablename__ = 'quizz_results'
@@ -113,6 +129,31 @@ class QuizzResult(ModelWithIdAndTimeStamps):
     company_id: Mapped[UUID] = mapped_column(ForeignKey('companies.id', ondelete='CASCADE'))
     score: Mapped[int]
 
+    __table_args__ = (
+        Index('ix_quizz_results_user_id_quizz_id_created_at', 'user_id', 'quizz_id', 'created_at'),
+        Index('ix_quizz_results_company_id_created_at', 'company_id', 'created_at'),
+        Index('ix_quizz_results_quizz_id', 'quizz_id'),
+    )
+
+
+class QuizzAnswerChoice(ModelWithIdAndTimeStamps):
+    """Answer choosen in a completed quizz, rows of one attempt are written together with its QuizzResult."""
+
+    __tablename__ = 'quizz_answer_choices'
+
+    quizz_result_id: Mapped[UUID] = mapped_column(ForeignKey('quizz_results.id', ondelete='CASCADE'))
+    question_id: Mapped[UUID] = mapped_column(ForeignKey('questions.id', ondelete='CASCADE'))
+    # kept without the answer once it is deleted, so the attempt and its correctness stay in the history
+    answer_id: Mapped[UUID] = mapped_column(ForeignKey('answers.id', ondelete='SET NULL'), nullable=True)
+    is_correct: Mapped[bool] = mapped_column(Boolean)
+    # order of the question within the attempt, responses are displayed in the order they were sent
+    position: Mapped[int]
+
+    __table_args__ = (
+        Index('ix_quizz_answer_choices_quizz_result_id_position', 'quizz_result_id', 'position'),
+        Index('ix_quizz_answer_choices_question_id_answer_id', 'question_id', 'answer_id'),
+    )
+
 
 class Notification(ModelWithIdAndTimeStamps):
     __tablename__ = 'notifications'
@@ -121,3 +162,5 @@ class Notification(ModelWithIdAndTimeStamps):
     title: Mapped[str] = mapped_column(String(50))
     body: Mapped[str] = mapped_column(String(250))
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
+
+    __table_args__ = (Index('ix_notifications_user_id_created_at', 'user_id', 'created_at'),)
@@ -3,16 +3,21 @@ from contextlib import asynccontextmanager
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.db.db import async_session
+from app.db.db import async_session, engine
+from app.redis import cache_writer
 from app.routers.company_router import router as company_router
 from app.routers.health_check_router import router as health_check_router
 from app.routers.notification_router import router as notification_router
+from app.routers.profiler_router import router as profiler_router
 from app.routers.quizz_router import router as quizz_router
 from app.routers.users_router import router as users_router
+from app.utils.instrumentation import RequestMetricsMiddleware, TimedJSONResponse, instrument_engine
+from app.utils.profiler import ProfilerMiddleware
 from app.utils.scheduler import check_quizz_completions
 
 
@@ -24,15 +29,18 @@ async def start_quizz_scheduler(app: FastAPI) -> AsyncGenerator[None, None]:
         task = scheduler.add_job(
             check_quizz_completions, args=[session], trigger=midnight_trigger, replace_existing=True
         )
+        # cache writes queued while redis was unavailable
+        replay_task = scheduler.add_job(cache_writer.flush, trigger=IntervalTrigger(seconds=5), replace_existing=True)
         scheduler.start()
         yield
         task.remove()
+        replay_task.remove()
         scheduler.shutdown()
 
 
 def create_app() -> FastAPI:
     """Create FastAPI application"""
-    app = FastAPI(lifespan=start_quizz_scheduler)
+    app = FastAPI(lifespan=start_quizz_scheduler, default_response_class=TimedJSONResponse)
 
     app.add_middleware(
         CORSMiddleware,
@@ -41,12 +49,16 @@ def create_app() -> FastAPI:
         allow_methods=['*'],
         allow_headers=['*'],
     )
+    app.add_middleware(ProfilerMiddleware)
+    app.add_middleware(RequestMetricsMiddleware)
+    instrument_engine(engine.sync_engine)
 
     app.include_router(health_check_router, prefix='/health', tags=['health'])
     app.include_router(users_router, prefix='/users', tags=['users'])
     app.include_router(company_router, prefix='/companies', tags=['companies'])
     app.include_router(quizz_router, prefix='/quizzes', tags=['quizzes'])
     app.include_router(notification_router, prefix='/notifications', tags=['notifications'])
+    app.include_router(profiler_router, prefix='/profiler', tags=['profiler'])
 
     return app
 
@@ -1,5 +1,9 @@
+from .cache_writer import CacheUnavailable, CacheWrite, cache_writer
 from .redis import get_redis_client
 
 __all__ = [
+    'CacheUnavailable',
+    'CacheWrite',
+    'cache_writer',
     'get_redis_client',
 ]
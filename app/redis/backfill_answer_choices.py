@@ -0,0 +1,53 @@
+"""Stores cached attempts, completed before answer choices were persisted, in the database.
+
+Run once after deploy, after migrate_answer_keys:
+    python -m app.redis.backfill_answer_choices
+"""
+
+import asyncio
+from uuid import UUID
+
+from aioredis import Redis
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db import async_session
+from app.db.models import QuizzAnswerChoice
+from app.redis.redis import get_redis_client
+from app.redis.response_codec import decode_response
+from app.repositories.quizz_repository import RESPONSE_KEY_PREFIX, QuizzRepository
+from app.utils.logging import logger
+
+
+async def backfill_answer_choices(session: AsyncSession, redis: Redis) -> int:
+    """Returns number of stored attempts, results which already have choices are skipped."""
+    quizz_repository = QuizzRepository(session)
+    backfilled = 0
+    async for key in redis.scan_iter(match=f'{RESPONSE_KEY_PREFIX}:*:*:*', count=1000):
+        value = await redis.get(key)
+        if value is None:
+            continue
+        _, user_id, _, quizz_id = key.decode().split(':')
+        result = await quizz_repository.get_latest_quizz_result(UUID(user_id), UUID(quizz_id))
+        if result is None:
+            continue
+        has_choices = await session.scalar(select(exists().where(QuizzAnswerChoice.quizz_result_id == result.id)))
+        if has_choices:
+            continue
+        # cached attempt is always the latest one of the user
+        await quizz_repository.create_answer_choices(result.id, decode_response(result.user_id, result.quizz_id, value))
+        backfilled += 1
+    await session.commit()
+    return backfilled
+
+
+async def main() -> None:
+    redis = await get_redis_client()
+    async with async_session() as session:
+        backfilled = await backfill_answer_choices(session, redis)
+    await redis.close()
+    logger.info('Stored answer choices of %s cached attempts', backfilled)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,214 @@
+"""Cache writes that must not fail or slow down a request whose data is already committed to the database.
+
+Every write gets a timeout budget. Failures open a circuit breaker, and while it is open writes skip redis
+and wait in a bounded local queue, which is replayed once redis answers again. Reads and invalidations
+which can fall back to the database go through `run` and share the breaker, they are not queued.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from fnmatch import fnmatchcase
+from typing import NamedTuple, Optional, TypeVar
+
+from aioredis import Redis
+from aioredis.exceptions import RedisError
+
+from app.core.config import settings
+from app.redis.instrumented import calling_function, redis_caller
+from app.redis.redis import get_redis_client
+from app.utils.logging import logger
+
+T = TypeVar('T')
+
+
+class CacheWrite(NamedTuple):
+    key: str
+    # None deletes the key, or only the field
+    value: Optional[bytes]
+    ttl_seconds: int
+    # writes a single field of a hash, ttl applies to the whole hash
+    field: Optional[str] = None
+
+
+def _slot(write: CacheWrite) -> tuple[str, Optional[str]]:
+    return write.key, write.field
+
+
+class CacheUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Closed until failure_threshold consecutive failures, then open for reset_seconds.
+
+    After that a single call is let through (half open), its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self._opened_at < self.reset_seconds:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class ResilientCacheWriter:
+    def __init__(
+        self,
+        timeout_seconds: float,
+        queue_size: int,
+        breaker: CircuitBreaker,
+        redis_factory: Callable[[], Awaitable[Redis]] = get_redis_client,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.queue_size = queue_size
+        self.breaker = breaker
+        self._redis_factory = redis_factory
+        # latest pending write by key and hash field, a newer write of the same slot replaces the queued one
+        self._pending: OrderedDict[tuple[str, Optional[str]], CacheWrite] = OrderedDict()
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def write(self, writes: Iterable[CacheWrite]) -> bool:
+        """Sets all keys in one transaction, returns False when they were queued instead."""
+        writes = list(writes)
+        if self.breaker.allow() and await self._execute(writes):
+            for write in writes:
+                self._pending.pop(_slot(write), None)
+            return True
+        self._enqueue(writes)
+        return False
+
+    async def delete(self, keys: Iterable[str]) -> bool:
+        """Deletes keys like `write` sets them, queued deletions replace queued writes of the same keys."""
+        return await self.write(CacheWrite(key, None, 0) for key in keys)
+
+    def is_pending(self, key: str, field: Optional[str] = None) -> bool:
+        """Redis value of a key with a queued write is outdated, readers should not trust it."""
+        return (key, field) in self._pending or (key, None) in self._pending
+
+    async def run(self, operation: Callable[[Redis], Awaitable[T]]) -> T:
+        """Runs operation within the timeout budget, raises CacheUnavailable on redis errors or an open circuit."""
+        if not self.breaker.allow():
+            raise CacheUnavailable('circuit is open')
+        try:
+            result = await self._within_timeout(self._run(operation))
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self.breaker.record_failure()
+            logger.warning('Redis call failed: %r', e)
+            raise CacheUnavailable() from e
+        self.breaker.record_success()
+        return result
+
+    async def flush(self) -> int:
+        """Replays queued writes while redis keeps accepting them, returns number of written keys.
+
+        Runs periodically from the app scheduler, so requests never wait for the backlog.
+        """
+        written = 0
+        async with self._flush_lock:
+            while self._pending and self.breaker.allow():
+                batch = [self._pending[slot] for slot in list(self._pending)[:1000]]
+                if not await self._execute(batch):
+                    break
+                for write in batch:
+                    # key could be written again while batch was in flight, keep the newer write
+                    if self._pending.get(_slot(write)) is write:
+                        del self._pending[_slot(write)]
+                written += len(batch)
+        if written:
+            logger.info('Replayed %s queued cache writes', written)
+        return written
+
+    def discard(self, pattern: str) -> None:
+        """Drops queued writes of keys matching glob pattern, for invalidations made while they wait."""
+        for slot in [slot for slot in self._pending if fnmatchcase(slot[0], pattern)]:
+            del self._pending[slot]
+
+    async def _execute(self, writes: list[CacheWrite]) -> bool:
+        try:
+            await self._within_timeout(self._set_all(writes))
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self.breaker.record_failure()
+            logger.warning('Cache write of %s keys failed: %r', len(writes), e)
+            return False
+        self.breaker.record_success()
+        return True
+
+    async def _within_timeout(self, operation: Awaitable[T]) -> T:
+        # wait_for runs the operation in a task of its own, commands are reported with the caller found here
+        token = redis_caller.set(calling_function())
+        try:
+            return await asyncio.wait_for(operation, timeout=self.timeout_seconds)
+        finally:
+            redis_caller.reset(token)
+
+    async def _run(self, operation: Callable[[Redis], Awaitable[T]]) -> T:
+        redis = await self._redis_factory()
+        try:
+            return await operation(redis)
+        finally:
+            await redis.close()
+
+    async def _set_all(self, writes: list[CacheWrite]) -> None:
+        async def set_all(redis: Redis) -> None:
+            async with redis.pipeline(transaction=True) as pipe:
+                for write in writes:
+                    if write.field is not None and write.value is None:
+                        pipe.hdel(write.key, write.field)
+                    elif write.field is not None:
+                        pipe.hset(write.key, write.field, write.value)
+                        pipe.expire(write.key, write.ttl_seconds)
+                    elif write.value is None:
+                        pipe.delete(write.key)
+                    else:
+                        pipe.set(write.key, write.value, ex=write.ttl_seconds)
+                await pipe.execute()
+
+        await self._run(set_all)
+
+    def _enqueue(self, writes: list[CacheWrite]) -> None:
+        for write in writes:
+            self._pending.pop(_slot(write), None)
+            self._pending[_slot(write)] = write
+        dropped = 0
+        while len(self._pending) > self.queue_size:
+            self._pending.popitem(last=False)
+            dropped += 1
+        if dropped:
+            logger.warning('Cache write-behind queue is full, dropped %s oldest writes', dropped)
+
+
+cache_writer = ResilientCacheWriter(
+    timeout_seconds=settings.REDIS_WRITE_TIMEOUT_SECONDS,
+    queue_size=settings.REDIS_WRITE_BEHIND_SIZE,
+    breaker=CircuitBreaker(settings.REDIS_CIRCUIT_FAILURE_THRESHOLD, settings.REDIS_CIRCUIT_RESET_SECONDS),
+)
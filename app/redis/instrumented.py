@@ -0,0 +1,135 @@
+"""Redis client recording latency, payload size and key patterns of every command.
+
+Keys are reduced to patterns by replacing ids with {id}, so response:<user>:<company>:<quizz> keys share one series.
+Commands walking the whole keyspace and batches over REDIS_LARGE_BATCH_KEYS keys are flagged, commands slower
+than REDIS_SLOW_COMMAND_SECONDS are logged together with the app function which issued them.
+"""
+
+import re
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from aioredis import Redis
+from aioredis.client import Pipeline
+
+from app.core.config import settings
+from app.utils.instrumentation import record_redis_time
+from app.utils.logging import logger
+from app.utils.metrics import SIZE_BUCKETS, Counter, Histogram, registry
+
+# commands which are O(N) in the size of the keyspace
+KEYSPACE_COMMANDS = frozenset({'KEYS', 'FLUSHDB', 'FLUSHALL'})
+BATCH_COMMANDS = frozenset({'MGET', 'MSET', 'DEL', 'UNLINK', 'HMGET', 'HDEL'})
+
+# modules handling redis for the app, the function reported for a command is the first one outside of them
+_REDIS_MODULES = frozenset({__name__, 'app.redis.cache_writer'})
+# set by code which runs commands in a task of its own, e.g. under asyncio.wait_for, the stack ends in that task
+redis_caller: ContextVar[Optional[str]] = ContextVar('redis_caller', default=None)
+
+_ID_SEGMENT = re.compile(r'^(?:[0-9a-fA-F]{8}-?(?:[0-9a-fA-F]{4}-?){3}[0-9a-fA-F]{12}|\d+)$')
+
+REDIS_COMMANDS = registry.register(
+    Counter('redis_commands_total', 'Redis commands by key pattern', ('command', 'key_pattern'))
+)
+REDIS_COMMAND_DURATION = registry.register(
+    Histogram('redis_command_duration_seconds', 'Redis round trip of a command or a whole pipeline', ('command',))
+)
+REDIS_COMMAND_PAYLOAD = registry.register(
+    Histogram('redis_command_payload_bytes', 'Bytes sent and received by a command', ('command',), buckets=SIZE_BUCKETS)
+)
+REDIS_FLAGGED_COMMANDS = registry.register(
+    Counter('redis_flagged_commands_total', 'Commands which block redis for long on big data', ('command', 'reason'))
+)
+
+
+def key_pattern(key: Any) -> str:
+    if isinstance(key, bytes):
+        key = key.decode(errors='replace')
+    return ':'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in str(key).split(':'))
+
+
+def payload_size(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(payload_size(key) + payload_size(item) for key, item in value.items())
+    return 0 if value is None else len(str(value))
+
+
+def calling_function() -> str:
+    """First function of the app up the stack which is not part of redis handling, e.g. QuizzRepository.get_quizz."""
+    caller = redis_caller.get()
+    if caller is not None:
+        return caller
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('app.') and module not in _REDIS_MODULES:
+            owner = frame.f_locals.get('self')
+            name = frame.f_code.co_name
+            return f'{type(owner).__name__}.{name}' if owner is not None else f'{module}.{name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+def _record_command(args: tuple[Any, ...], response: Any) -> str:
+    command = str(args[0]).upper()
+    pattern = key_pattern(args[1]) if len(args) > 1 else ''
+    REDIS_COMMANDS.inc(command, pattern)
+    REDIS_COMMAND_PAYLOAD.observe(payload_size(args[1:]) + payload_size(response), command)
+
+    reason = None
+    if command in KEYSPACE_COMMANDS:
+        reason = 'keyspace'
+    elif command in BATCH_COMMANDS and len(args) - 1 > settings.REDIS_LARGE_BATCH_KEYS:
+        reason = 'large_batch'
+    if reason:
+        REDIS_FLAGGED_COMMANDS.inc(command, reason)
+        logger.warning(
+            'Redis %s %s with %s arguments (%s) in %s', command, pattern, len(args) - 1, reason, calling_function()
+        )
+    return command
+
+
+def _check_slow(description: str, seconds: float) -> None:
+    if seconds > settings.REDIS_SLOW_COMMAND_SECONDS:
+        logger.warning('Slow redis %s took %.1f ms in %s', description, seconds * 1000, calling_function())
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        commands = [args for args, _ in self.command_stack]
+        started = time.perf_counter()
+        try:
+            responses = await super().execute(raise_on_error)
+        finally:
+            seconds = time.perf_counter() - started
+            record_redis_time(seconds)
+            REDIS_COMMAND_DURATION.observe(seconds, 'PIPELINE')
+        for args, response in zip(commands, responses):
+            _record_command(args, response)
+        _check_slow(f'pipeline of {len(commands)} commands', seconds)
+        return responses
+
+
+class InstrumentedRedis(Redis):
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await super().execute_command(*args, **options)
+        finally:
+            seconds = time.perf_counter() - started
+            record_redis_time(seconds)
+            REDIS_COMMAND_DURATION.observe(seconds, str(args[0]).upper())
+        command = _record_command(args, response)
+        _check_slow(f'{command} {key_pattern(args[1]) if len(args) > 1 else ""}'.rstrip(), seconds)
+        return response
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
@@ -0,0 +1,74 @@
+"""Moves cached responses from per-answer keys to one encoded key per attempt.
+
+Legacy layout: answer:<user>:<company>:<quizz>:<question>:<answer> -> '0' / '1'
+Run once after deploy:
+    python -m app.redis.migrate_answer_keys
+"""
+
+import asyncio
+from collections import defaultdict
+from uuid import UUID
+
+from aioredis import Redis
+
+from app.redis.redis import get_redis_client
+from app.redis.response_codec import encode_response
+from app.repositories.quizz_repository import RESPONSE_KEY_PREFIX
+from app.schemas.quizz_schema import ChoosenAnswerSchema, QuestionResultSchema, QuizzDetailResultSchema
+from app.utils.logging import logger
+
+LEGACY_KEY_PATTERN = 'answer:*:*:*:*:*'
+
+
+async def migrate_answer_keys(redis: Redis) -> int:
+    """Returns number of migrated attempts, keys of attempts already in new layout are just dropped."""
+    keys_by_attempt: dict[tuple[str, str, str], list[bytes]] = defaultdict(list)
+    async for key in redis.scan_iter(match=LEGACY_KEY_PATTERN, count=1000):
+        _, user_id, company_id, quizz_id, _, _ = key.decode().split(':')
+        keys_by_attempt[(user_id, company_id, quizz_id)].append(key)
+
+    migrated = 0
+    for (user_id, company_id, quizz_id), keys in keys_by_attempt.items():
+        migrated += await _migrate_attempt(redis, user_id, company_id, quizz_id, keys)
+    return migrated
+
+
+async def _migrate_attempt(redis: Redis, user_id: str, company_id: str, quizz_id: str, keys: list[bytes]) -> int:
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.mget(keys)
+        for key in keys:
+            pipe.pttl(key)
+        values, *ttls = await pipe.execute()
+
+    questions: dict[UUID, QuestionResultSchema] = {}
+    for key, value in zip(keys, values):
+        if value is None:
+            continue
+        question_id, answer_id = (UUID(part) for part in key.decode().split(':')[4:])
+        question = questions.setdefault(question_id, QuestionResultSchema(question_id=question_id, choosen_answers=[]))
+        question.choosen_answers.append(ChoosenAnswerSchema(answer_id=answer_id, is_correct=value == b'1'))
+    # remaining lifetime of the attempt is kept, keys without ttl stay without it
+    ttl = min((ttl for ttl in ttls if ttl > 0), default=None)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        if questions:
+            response = QuizzDetailResultSchema(
+                user_id=UUID(user_id), quizz_id=UUID(quizz_id), questions=list(questions.values())
+            )
+            # attempt written after deploy is newer than the legacy one
+            key = f'{RESPONSE_KEY_PREFIX}:{user_id}:{company_id}:{quizz_id}'
+            pipe.set(key, encode_response(response), px=ttl, nx=True)
+        pipe.delete(*keys)
+        results = await pipe.execute()
+    return int(bool(questions) and bool(results[0]))
+
+
+async def main() -> None:
+    redis = await get_redis_client()
+    migrated = await migrate_answer_keys(redis)
+    await redis.close()
+    logger.info('Migrated %s cached attempts to compact encoding', migrated)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
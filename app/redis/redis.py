@@ -1,8 +1,8 @@
-import aioredis
 from aioredis import Redis
 
 from app.core.config import settings
+from app.redis.instrumented import InstrumentedRedis
 
 
 async def get_redis_client() -> Redis:
-    return await aioredis.from_url(settings.redis_url)
+    return await InstrumentedRedis.from_url(settings.redis_url)
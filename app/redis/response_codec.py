@@ -0,0 +1,54 @@
+"""Compact binary encoding of a single quizz attempt stored in redis.
+
+Layout (big endian):
+    version: B, question count: H
+    for each question:
+        question id: 16s, answer count: B
+        for each choosen answer: answer id: 16s, is correct: ?
+"""
+
+import struct
+from uuid import UUID
+
+from app.schemas.quizz_schema import ChoosenAnswerSchema, QuestionResultSchema, QuizzDetailResultSchema
+
+VERSION = 1
+
+_HEADER = struct.Struct('>BH')
+_QUESTION = struct.Struct('>16sB')
+_ANSWER = struct.Struct('>16s?')
+
+
+class ResponseDecodeError(ValueError):
+    pass
+
+
+def encode_response(response: QuizzDetailResultSchema) -> bytes:
+    chunks = [_HEADER.pack(VERSION, len(response.questions))]
+    for question in response.questions:
+        # same answer sent several times is stored once
+        answers = {answer.answer_id: answer.is_correct for answer in question.choosen_answers}
+        chunks.append(_QUESTION.pack(question.question_id.bytes, len(answers)))
+        chunks.extend(_ANSWER.pack(answer_id.bytes, is_correct) for answer_id, is_correct in answers.items())
+    return b''.join(chunks)
+
+
+def decode_response(user_id: UUID, quizz_id: UUID, data: bytes) -> QuizzDetailResultSchema:
+    try:
+        version, question_count = _HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ResponseDecodeError(f'Unsupported response encoding version {version}')
+        offset = _HEADER.size
+        questions = []
+        for _ in range(question_count):
+            question_id, answer_count = _QUESTION.unpack_from(data, offset)
+            offset += _QUESTION.size
+            choosen_answers = []
+            for _ in range(answer_count):
+                answer_id, is_correct = _ANSWER.unpack_from(data, offset)
+                offset += _ANSWER.size
+                choosen_answers.append(ChoosenAnswerSchema(answer_id=UUID(bytes=answer_id), is_correct=is_correct))
+            questions.append(QuestionResultSchema(question_id=UUID(bytes=question_id), choosen_answers=choosen_answers))
+    except struct.error as e:
+        raise ResponseDecodeError('Truncated response') from e
+    return QuizzDetailResultSchema(user_id=user_id, quizz_id=quizz_id, questions=questions)
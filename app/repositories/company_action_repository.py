@@ -1,14 +1,32 @@
 from collections.abc import Sequence
-from typing import Union
-from uuid import UUID
+from contextlib import suppress
+from typing import Optional, Union
+from uuid import UUID, uuid4
 
+from aioredis import Redis
+from aioredis.exceptions import WatchError
 from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from app.db.models import Company, CompanyAction, CompanyActionType, User
+from app.redis import CacheUnavailable, cache_writer
 from app.repositories.repository_base import RepositoryBase
 
+# role hashes are invalidated on every change made through this repository, ttl bounds staleness of changes
+# whose invalidation is lost: made elsewhere (e.g. cascades on user deletion), dropped from a full write-behind
+# queue or queued by a process which restarted before redis came back. Roles grant permissions, keep it short.
+COMPANY_ROLES_TTL_SECONDS = 5 * 60
+ROLES_LOADED_FIELD = '__loaded__'
+# replaced on every invalidation, a reload only stores roles if it is unchanged since they were read
+ROLES_VERSION_FIELD = '__version__'
+
 
 class CompanyActionRepository(RepositoryBase):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+        self._pending_companies: set[UUID] = set()
+
     async def get_company_action_for_company_by_type(
         self, company_id: UUID, _type: CompanyActionType
     ) -> list[CompanyAction]:
@@ -34,6 +52,7 @@ class CompanyActionRepository(RepositoryBase):
         query = (
             select(Company)
             .join_from(CompanyAction, Company)
+            .options(joinedload(Company.owner))
             .where(and_(CompanyAction.user_id == user_id, CompanyAction.type == relation))
             .order_by(Company.created_at)
         )
@@ -64,8 +83,16 @@ class CompanyActionRepository(RepositoryBase):
     def create(self, company_id: UUID, user_id: UUID, type: CompanyActionType) -> Union[CompanyAction, None]:
         action = CompanyAction(company_id=company_id, user_id=user_id, type=type)
         self.db.add(action)
+        # cached roles are dropped once the action is committed
+        self._pending_companies.add(company_id)
         return action
 
+    async def commit(self) -> None:
+        pending_companies, self._pending_companies = self._pending_companies, set()
+        await super().commit()
+        if pending_companies:
+            await self._invalidate_roles(pending_companies)
+
     async def create_invintation(self, company_id: UUID, user_id: UUID) -> Union[CompanyAction, None]:
         invite = self.create(company_id, user_id, CompanyActionType.INVITATION)
         try:
@@ -87,24 +114,32 @@ class CompanyActionRepository(RepositoryBase):
         self.db.add(company_action)
         await self.db.commit()
         await self.db.refresh(company_action)
+        await self._invalidate_roles({company_action.company_id})
         return company_action
 
     async def delete(self, company_id: UUID, user_id: UUID, _type: CompanyActionType) -> None:
-        await self.db.execute(
-            delete(CompanyAction).where(
+        result = await self.db.execute(
+            delete(CompanyAction)
+            .where(
                 and_(
                     CompanyAction.company_id == company_id,
                     CompanyAction.user_id == user_id,
                     CompanyAction.type == _type,
                 )
             )
+            .returning(CompanyAction.id)
         )
+        deleted = result.scalars().all()
         await self.db.commit()
+        # user has at most one action per company, so role is gone only if a row was actually deleted
+        if deleted:
+            await self._invalidate_roles({company_id})
 
     async def get_companies_user_is_part_of(self, user_id: UUID) -> Sequence[Company]:
         query = (
             select(Company)
             .join(CompanyAction)
+            .options(joinedload(Company.owner))
             .where(
                 or_(
                     Company.owner_id == user_id,
@@ -116,3 +151,79 @@ class CompanyActionRepository(RepositoryBase):
         )
         result = await self.db.execute(query)
         return result.scalars().all()
+
+    async def get_cached_role(self, company_id: UUID, user_id: UUID) -> Union[CompanyActionType, None]:
+        """Returns type of user's action in company, loading whole company into cache on miss.
+
+        Falls back to the database when redis is unavailable, so permission checks keep working without it.
+        """
+        key = self._create_roles_key(company_id)
+        if cache_writer.is_pending(key):
+            return await self._get_company_role(company_id, user_id)
+        try:
+            loaded, role, version = await cache_writer.run(
+                lambda redis: redis.hmget(key, ROLES_LOADED_FIELD, str(user_id), ROLES_VERSION_FIELD)
+            )
+        except CacheUnavailable:
+            return await self._get_company_role(company_id, user_id)
+        if loaded is not None:
+            return None if role is None else CompanyActionType(role.decode())
+
+        roles = await self._get_company_roles(company_id)
+        with suppress(CacheUnavailable):
+            await cache_writer.run(lambda redis: self._store_roles(redis, key, version, roles))
+        role = roles.get(str(user_id))
+        return None if role is None else CompanyActionType(role)
+
+    async def delete_cached_company_roles(self, company_id: UUID) -> None:
+        await cache_writer.delete([self._create_roles_key(company_id)])
+
+    async def _get_company_role(self, company_id: UUID, user_id: UUID) -> Union[CompanyActionType, None]:
+        action = await self.get_by_company_and_user(company_id, user_id)
+        return None if action is None else action.type
+
+    async def _get_company_roles(self, company_id: UUID) -> dict[str, str]:
+        query = select(CompanyAction.user_id, CompanyAction.type).where(CompanyAction.company_id == company_id)
+        result = await self.db.execute(query)
+        return {str(user_id): _type.value for user_id, _type in result.all()}
+
+    async def _store_roles(self, redis: Redis, key: str, version: Optional[bytes], roles: dict[str, str]) -> None:
+        """Stores roles read from the database unless the hash was invalidated since `version` was read with them."""
+        async with redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.hget(key, ROLES_VERSION_FIELD) != version:
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                pipe.hset(key, mapping={ROLES_LOADED_FIELD: 1, **roles})
+                pipe.expire(key, COMPANY_ROLES_TTL_SECONDS)
+                await pipe.execute()
+            except WatchError:
+                # invalidated while storing, next read loads roles again
+                pass
+
+    async def _invalidate_roles(self, company_ids: set[UUID]) -> None:
+        """Replaces role hashes by a fresh version, so reloads which read the database before the change are dropped.
+
+        Called after the database commit, when redis is unavailable the hashes are deleted once it is back
+        and until then roles are read from the database. Queued deletions live in this process only, if one
+        is lost other processes may see the previous role until the hash expires, COMPANY_ROLES_TTL_SECONDS.
+        """
+        keys = [self._create_roles_key(company_id) for company_id in company_ids]
+
+        async def invalidate(redis: Redis) -> None:
+            async with redis.pipeline(transaction=True) as pipe:
+                for key in keys:
+                    pipe.delete(key)
+                    pipe.hset(key, ROLES_VERSION_FIELD, uuid4().hex)
+                    pipe.expire(key, COMPANY_ROLES_TTL_SECONDS)
+                await pipe.execute()
+
+        try:
+            await cache_writer.run(invalidate)
+        except CacheUnavailable:
+            await cache_writer.delete(keys)
+
+    def _create_roles_key(self, company_id: UUID) -> str:
+        return f'company_roles:{company_id}'
@@ -1,19 +1,31 @@
-from typing import Union
+from typing import Optional, Union
 from uuid import UUID
 
 from sqlalchemy import and_
+from sqlalchemy.orm import joinedload
 
 from app.db.models import Company
 from app.repositories.repository_base import RepositoryBase
 from app.schemas.company_schema import CompanyCreateSchema, CompanyUpdateSchema
+from app.utils.pagination import CountMode, PageCursor
+
+PUBLIC_COMPANIES_COUNT_KEY = 'count:companies:public'
 
 
 class CompanyRepository(RepositoryBase):
-    async def get_all_companies(self, offset: int, limit: int) -> tuple[list[Company], int]:
-        condition = Company.hidden == False  # noqa
-        companies = await self._get_all_meeting_condition(offset, limit, condition, Company)
-        count = await self._get_items_count_by_condition(condition, Company)
-        return companies, count
+    async def get_all_companies(
+        self, offset: int, limit: int, after: Optional[PageCursor] = None, count_mode: CountMode = 'exact'
+    ) -> tuple[list[Company], int, CountMode]:
+        return await self._get_page_with_count(
+            offset,
+            limit,
+            Company,
+            condition=Company.hidden == False,  # noqa
+            options=[joinedload(Company.owner)],
+            after=after,
+            count_mode=count_mode,
+            count_cache_key=PUBLIC_COMPANIES_COUNT_KEY,
+        )
 
     async def get_companies_count(self) -> int:
         return await self._get_items_count(Company)
@@ -24,7 +36,9 @@ class CompanyRepository(RepositoryBase):
         condition = and_(Company.owner_id == owner_id, Company.hidden == False)  # noqa
         if including_hidden:
             condition = Company.owner_id == owner_id
-        companies = await self._get_all_meeting_condition(offset, limit, condition, Company)
+        companies = await self._get_all_meeting_condition(
+            offset, limit, condition, Company, options=[joinedload(Company.owner)]
+        )
         count = await self._get_items_count_by_condition(condition, Company)
         return companies, count
 
@@ -34,16 +48,21 @@ class CompanyRepository(RepositoryBase):
     async def delete_company_by_id_and_commit(self, company_id: UUID) -> None:
         await self._delete_item_by_id(company_id, Company)
         await self.db.commit()
+        self._mark_count_stale(PUBLIC_COMPANIES_COUNT_KEY)
+        await self._drop_stale_counts()
 
     def create_company(self, company_data: CompanyCreateSchema, owner_id: UUID) -> Company:
         company = Company(
             name=company_data.name, description=company_data.description, owner_id=owner_id, hidden=company_data.hidden
         )
         self.db.add(company)
+        self._mark_count_stale(PUBLIC_COMPANIES_COUNT_KEY)
         return company
 
     def update_company(self, company: Company, company_data: CompanyUpdateSchema) -> Company:
         new_data = company_data.model_dump(exclude_none=True)
         for field, value in new_data.items():
             setattr(company, field, value)
+        if 'hidden' in new_data:
+            self._mark_count_stale(PUBLIC_COMPANIES_COUNT_KEY)
         return company
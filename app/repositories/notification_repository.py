@@ -1,8 +1,8 @@
-from collections.abc import Sequence
+from collections.abc import Collection, Sequence
 from typing import Union
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
 
 from app.db.models import Notification
 from app.repositories.repository_base import RepositoryBase
@@ -33,6 +33,14 @@ class NotificationRepository(RepositoryBase):
         self.db.add(notification)
         return notification
 
+    async def create_notifications(self, user_ids: Collection[UUID], title: str, body: str) -> None:
+        """Same notification for all users, inserted in one statement."""
+        if not user_ids:
+            return
+        await self.db.execute(
+            insert(Notification), [{'user_id': user_id, 'title': title, 'body': body} for user_id in user_ids]
+        )
+
     async def create_notification_and_commit(self, user_id: UUID, title: str, body: str) -> Union[Notification, None]:
         notification = self.create_notification(user_id, title, body)
         try:
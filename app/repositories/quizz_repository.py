@@ -1,31 +1,61 @@
 import datetime
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Collection, Iterable, Sequence
+from itertools import groupby
 from typing import Literal, Optional, Union
-from uuid import UUID
-
-from sqlalchemy import and_, func, or_, select
+from uuid import UUID, uuid4
+
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    Subquery,
+    and_,
+    delete,
+    exists,
+    func,
+    insert,
+    or_,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.dialects.postgresql import INTERVAL
 from sqlalchemy.sql.functions import concat
 
-from app.db.models import Answer, Company, CompanyAction, Question, Quizz, QuizzResult, User
-from app.redis import get_redis_client
+from app.db.models import Answer, Company, CompanyAction, Question, Quizz, QuizzAnswerChoice, QuizzResult, User
+from app.redis import CacheUnavailable, CacheWrite, cache_writer, get_redis_client
+from app.redis.response_codec import decode_response, encode_response
 from app.repositories.repository_base import RepositoryBase
 from app.schemas.quizz_schema import (
+    AnswerCreateSchema,
     AnswerUpdateSchema,
     ChoosenAnswerSchema,
+    QuestionCreateSchema,
     QuestionResultSchema,
     QuestionUpdateSchema,
     QuizzDetailResultSchema,
     QuizzUpdateSchema,
 )
+from app.utils.pagination import CountMode, PageCursor
 
 ID_OR_MATCH_ALL = Union[UUID, Literal['*']]
+# number of responses yielded at once when streaming
+RESPONSES_CHUNK_SIZE = 100
+CACHED_RESPONSE_TTL_SECONDS = 48 * 60 * 60
+# analytics are recomputed at most this often, completions do not invalidate them
+CACHED_ANALYTICS_TTL_SECONDS = 60
+RESCORE_PROGRESS_TTL_SECONDS = 24 * 60 * 60
+# share of attempts with highest and lowest scores compared by discrimination index
+DISCRIMINATION_GROUP_SHARE = 0.27
+# one key per attempt, holding encoded answers (see app.redis.response_codec)
+RESPONSE_KEY_PREFIX = 'response'
 
 
 class QuizzRepository(RepositoryBase):
     async def create_quizz(self, title: str, description: Optional[str], frequency: int, company_id: UUID) -> Quizz:
         quizz = Quizz(title=title, description=description, frequency=frequency, company_id=company_id)
         self.db.add(quizz)
+        self._mark_count_stale(self._create_quizzes_count_key(company_id))
         await self.db.flush()
         await self.db.refresh(quizz)
         return quizz
@@ -44,9 +74,48 @@ class QuizzRepository(RepositoryBase):
         await self.db.refresh(answer)
         return answer
 
+    async def create_questions(self, quizz_id: UUID, questions: Sequence[QuestionCreateSchema]) -> None:
+        """Inserts questions with their answers in two statements, ids are generated here to link the answers."""
+        if not questions:
+            return
+        question_ids = [uuid4() for _ in questions]
+        await self.db.execute(
+            insert(Question),
+            [
+                {'id': question_id, 'text': question.text, 'quizz_id': quizz_id}
+                for question_id, question in zip(question_ids, questions)
+            ],
+        )
+        await self.create_answers(
+            (question_id, answer)
+            for question_id, question in zip(question_ids, questions)
+            for answer in question.answers
+        )
+
+    async def create_answers(self, answers: Iterable[tuple[UUID, AnswerCreateSchema]]) -> None:
+        """Inserts (question_id, answer) pairs of any questions in one statement."""
+        rows = [{**answer.model_dump(), 'question_id': question_id} for question_id, answer in answers]
+        if rows:
+            await self.db.execute(insert(Answer), rows)
+
     async def get_quizz(self, quizz_id: UUID) -> Union[Quizz, None]:
         return await self._get_item_by_id(quizz_id, Quizz)
 
+    async def get_quizz_titles(self, quizz_ids: Collection[UUID]) -> Sequence:
+        query = select(Quizz.id, Quizz.title).where(Quizz.id.in_(quizz_ids))
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def get_question_texts(self, question_ids: Collection[UUID]) -> Sequence:
+        query = select(Question.id, Question.text).where(Question.id.in_(question_ids))
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def get_answer_texts(self, answer_ids: Collection[UUID]) -> Sequence:
+        query = select(Answer.id, Answer.text).where(Answer.id.in_(answer_ids))
+        result = await self.db.execute(query)
+        return result.all()
+
     async def get_quizz_by_company_and_title(self, company_id: UUID, title: str) -> Union[Quizz, None]:
         query = select(Quizz).where(and_(Quizz.company_id == company_id, Quizz.title == title))
         result = await self.db.execute(query)
@@ -58,25 +127,23 @@ class QuizzRepository(RepositoryBase):
     async def get_answer(self, answer_id: UUID) -> Union[Answer, None]:
         return await self._get_item_by_id(answer_id, Answer)
 
-    async def get_question_by_quizz_and_text(self, quizz_id: UUID, text: str) -> Union[Question, None]:
-        query = select(Question).where(and_(Question.quizz_id == quizz_id, Question.text == text))
-        result = await self.db.execute(query)
-        return result.scalars().first()
-
-    async def get_answer_by_question_and_text(self, question_id: UUID, text: str) -> Union[Answer, None]:
-        query = select(Answer).where(and_(Answer.question_id == question_id, Answer.text == text))
-        result = await self.db.execute(query)
-        return result.scalars().first()
-
-    async def get_company_quizzes(self, company_id: UUID, offset: int = 0, limit: int = 10) -> list[Quizz]:
-        query = select(Quizz).where(Quizz.company_id == company_id).offset(offset).limit(limit)
-        result = await self.db.execute(query)
-        return result.scalars().all()
-
-    async def get_company_quizzes_count(self, company_id: UUID) -> int:
-        query = select(func.count(Quizz.id)).where(Quizz.company_id == company_id)
-        result = await self.db.execute(query)
-        return result.scalar_one()
+    async def get_company_quizzes_with_count(
+        self,
+        company_id: UUID,
+        offset: int = 0,
+        limit: int = 10,
+        after: Optional[PageCursor] = None,
+        count_mode: CountMode = 'exact',
+    ) -> tuple[list[Quizz], int, CountMode]:
+        return await self._get_page_with_count(
+            offset,
+            limit,
+            Quizz,
+            condition=Quizz.company_id == company_id,
+            after=after,
+            count_mode=count_mode,
+            count_cache_key=self._create_quizzes_count_key(company_id),
+        )
 
     async def get_quizz_questions(self, quizz_id: UUID) -> list[Question]:
         query = select(Question).where(Question.quizz_id == quizz_id).order_by(Question.created_at)
@@ -93,14 +160,23 @@ class QuizzRepository(RepositoryBase):
         result = await self.db.execute(query)
         return result.scalars().all()
 
+    async def get_quizz_answers(self, quizz_id: UUID) -> list[Answer]:
+        query = select(Answer).join(Question).where(Question.quizz_id == quizz_id).order_by(Answer.created_at)
+        result = await self.db.execute(query)
+        return result.scalars().all()
+
     async def get_question_answers_count(self, question_id: UUID) -> int:
         query = select(func.count(Answer.id)).where(Answer.question_id == question_id)
         result = await self.db.execute(query)
         return result.scalar_one()
 
     async def delete_quizz_and_commit(self, quizz_id: UUID) -> None:
-        await self._delete_item_by_id(quizz_id, Quizz)
+        result = await self.db.execute(delete(Quizz).where(Quizz.id == quizz_id).returning(Quizz.company_id))
+        company_ids = result.scalars().all()
         await self.db.commit()
+        for company_id in company_ids:
+            self._mark_count_stale(self._create_quizzes_count_key(company_id))
+        await self._drop_stale_counts()
 
     async def delete_question_and_commit(self, question_id: UUID) -> None:
         await self._delete_item_by_id(question_id, Question)
@@ -110,11 +186,13 @@ class QuizzRepository(RepositoryBase):
         await self._delete_item_by_id(answer_id, Answer)
         await self.db.commit()
 
-    async def delete_answer(self, answer_id: UUID) -> None:
-        await self._delete_item_by_id(answer_id, Answer)
+    async def delete_answers(self, answer_ids: Collection[UUID]) -> None:
+        if answer_ids:
+            await self.db.execute(delete(Answer).where(Answer.id.in_(answer_ids)))
 
-    async def delete_question(self, question_id: UUID) -> None:
-        await self._delete_item_by_id(question_id, Question)
+    async def delete_questions(self, question_ids: Collection[UUID]) -> None:
+        if question_ids:
+            await self.db.execute(delete(Question).where(Question.id.in_(question_ids)))
 
     async def update_quizz(self, quizz: Quizz, new_data: QuizzUpdateSchema) -> Quizz:
         for field in new_data.dict(exclude_unset=True):
@@ -144,6 +222,25 @@ class QuizzRepository(RepositoryBase):
         await self.db.refresh(quizz_result)
         return quizz_result
 
+    async def create_answer_choices(self, quizz_result_id: UUID, response: QuizzDetailResultSchema) -> None:
+        """Stores choosen answers of an attempt with a single multi-row insert."""
+        choices = [
+            {
+                'quizz_result_id': quizz_result_id,
+                'question_id': question.question_id,
+                'answer_id': answer_id,
+                'is_correct': is_correct,
+                'position': position,
+            }
+            for position, question in enumerate(response.questions)
+            # same answer sent several times is stored once
+            for answer_id, is_correct in {
+                answer.answer_id: answer.is_correct for answer in question.choosen_answers
+            }.items()
+        ]
+        if choices:
+            await self.db.execute(insert(QuizzAnswerChoice), choices)
+
     async def get_latest_quizz_result(self, user_id: UUID, quizz_id: UUID) -> Union[QuizzResult, None]:
         query = (
             select(QuizzResult)
@@ -153,6 +250,17 @@ class QuizzRepository(RepositoryBase):
         result = await self.db.execute(query)
         return result.scalars().first()
 
+    async def get_latest_quizz_results(self, user_quizz_pairs: Collection[tuple[UUID, UUID]]) -> Sequence:
+        """Latest score for each of (user_id, quizz_id) pairs in a single query."""
+        query = (
+            select(QuizzResult.user_id, QuizzResult.quizz_id, QuizzResult.score)
+            .where(tuple_(QuizzResult.user_id, QuizzResult.quizz_id).in_(list(user_quizz_pairs)))
+            .distinct(QuizzResult.user_id, QuizzResult.quizz_id)
+            .order_by(QuizzResult.user_id, QuizzResult.quizz_id, QuizzResult.created_at.desc())
+        )
+        result = await self.db.execute(query)
+        return result.all()
+
     async def get_average_score_by_company(self, company_id: UUID) -> float:
         query = select(func.avg(QuizzResult.score)).where(QuizzResult.company_id == company_id)
         result = await self.db.execute(query)
@@ -241,118 +349,390 @@ class QuizzRepository(RepositoryBase):
         result = await self.db.execute(query)
         return result.scalars().all()
 
-    async def cache_quizz_result(
-        self, user_id: UUID, company_id: UUID, quizz_id: UUID, data: QuizzDetailResultSchema
+    async def replace_cached_attempt(
+        self, user_id: UUID, company_id: UUID, quizz_id: UUID, data: QuizzDetailResultSchema, view: bytes
     ) -> None:
-        redis = await get_redis_client()
-        _48_hours = 48 * 60 * 60
-        async with redis.pipeline(transaction=True) as pipe:
-            for question in data.questions:
-                for answer in question.choosen_answers:
-                    key = self._create_key(user_id, company_id, quizz_id, question.question_id, answer.answer_id)
-                    pipe.set(key, 1 if answer.is_correct else 0, ex=_48_hours)
-
-            await pipe.execute()
-        await redis.close()
+        """Swaps previous attempt and its rendered view in one MULTI/EXEC round trip, readers never see them missing.
+
+        Quizz belongs to a single company so key of the attempt is known up front and SET overwrites it with fresh ttl.
+        Result is already committed at this point, when redis is unavailable the write is queued and replayed later.
+        """
+        await cache_writer.write(
+            [
+                CacheWrite(
+                    self._create_key(user_id, company_id, quizz_id), encode_response(data), CACHED_RESPONSE_TTL_SECONDS
+                ),
+                CacheWrite(
+                    self._create_response_views_key(quizz_id), view, CACHED_RESPONSE_TTL_SECONDS, field=str(user_id)
+                ),
+            ]
+        )
 
-    async def delete_cached_quizz_for_user(self, user_id: UUID, quizz_id: UUID) -> None:
-        redis = await get_redis_client()
-        lookup_key = self._create_key(
-            user_id=user_id, company_id='*', quizz_id=quizz_id, question_id='*', answer_id='*'
+    async def get_cached_response_view(self, user_id: UUID, quizz_id: UUID) -> Union[bytes, None]:
+        """Returns None when the view is missing, outdated by a queued write or redis is unavailable."""
+        key = self._create_response_views_key(quizz_id)
+        if cache_writer.is_pending(key, str(user_id)):
+            return None
+        try:
+            return await cache_writer.run(lambda redis: redis.hget(key, str(user_id)))
+        except CacheUnavailable:
+            return None
+
+    async def cache_response_view(self, user_id: UUID, quizz_id: UUID, view: bytes) -> None:
+        await cache_writer.write(
+            [
+                CacheWrite(
+                    self._create_response_views_key(quizz_id), view, CACHED_RESPONSE_TTL_SECONDS, field=str(user_id)
+                )
+            ]
         )
-        keys = await redis.keys(lookup_key)
-        if len(keys) > 0:
-            await redis.delete(*keys)
-        await redis.close()
 
-    def _parse_key(self, key: str) -> tuple[UUID, UUID, UUID, UUID, UUID]:
-        _, user_id, company_id, quizz_id, question_id, answer_id = key.split(':')
-        return UUID(user_id), UUID(company_id), UUID(quizz_id), UUID(question_id), UUID(answer_id)
+    async def delete_cached_response_views(self, quizz_id: UUID) -> None:
+        """Drops rendered responses of all users and analytics, they embed question and answer texts of the quizz.
+
+        Rendered responses are fields of one hash keyed by user id, so a single DEL drops them without a SCAN.
+        Edit is already committed, when redis is unavailable the deletion is queued and readers skip the keys.
+        """
+        cache_writer.discard(self._create_response_views_key(quizz_id))
+        await cache_writer.delete([self._create_analytics_key(quizz_id), self._create_response_views_key(quizz_id)])
+
+    def _create_response_views_key(self, quizz_id: UUID) -> str:
+        return f'response_views:{quizz_id}'
+
+    def _create_quizzes_count_key(self, company_id: UUID) -> str:
+        return f'count:quizzes:{company_id}'
+
+    def _parse_key(self, key: str) -> tuple[UUID, UUID, UUID]:
+        _, user_id, company_id, quizz_id = key.split(':')
+        return UUID(user_id), UUID(company_id), UUID(quizz_id)
 
     def _create_key(
         self,
         user_id: ID_OR_MATCH_ALL,
         company_id: ID_OR_MATCH_ALL,
         quizz_id: ID_OR_MATCH_ALL,
-        question_id: ID_OR_MATCH_ALL,
-        answer_id: ID_OR_MATCH_ALL,
     ) -> str:
-        return f'answer:{user_id}:{company_id}:{quizz_id}:{question_id}:{answer_id}'
+        return f'{RESPONSE_KEY_PREFIX}:{user_id}:{company_id}:{quizz_id}'
 
-    async def _get_records_from_redis(self, lookup_key: str) -> tuple[list[str], list[str]]:
-        redis = await get_redis_client()
-        keys = await redis.keys(lookup_key)
-        responses = await redis.mget(keys)
-        keys = [key.decode() for key in keys]
-        responses = [response.decode() for response in responses]
-        await redis.close()
-        return keys, responses
-
-    async def get_cached_responses_by_key(self, lookup_key: str) -> list[QuizzDetailResultSchema]:
-        keys, responses = await self._get_records_from_redis(lookup_key)
-        used_quizzes = {}
-        used_questions_in_quizz = {}
-        list_of_responses: list[QuizzDetailResultSchema] = []
-        for key, response in zip(keys, responses):
-            user_id, company_id, quizz_id, question_id, answer_id = self._parse_key(key)
-            if quizz_id not in used_quizzes:
-                used_quizzes[quizz_id] = len(list_of_responses)
-                list_of_responses.append(QuizzDetailResultSchema(user_id=user_id, quizz_id=quizz_id, questions=[]))
-            question_key = str(user_id) + str(question_id)
-            if question_key not in used_questions_in_quizz:
-                used_questions_in_quizz[question_key] = len(list_of_responses[used_quizzes[quizz_id]].questions)
-                list_of_responses[used_quizzes[quizz_id]].questions.append(
-                    QuestionResultSchema(question_id=question_id, choosen_answers=[])
-                )
-            list_of_responses[used_quizzes[quizz_id]].questions[
-                used_questions_in_quizz[question_key]
-            ].choosen_answers.append(ChoosenAnswerSchema(answer_id=answer_id, is_correct=response == '1'))
-        return list_of_responses
-
-    async def get_user_quizz_response_from_cache(
-        self, user_id: UUID, quizz_id: UUID
-    ) -> Union[QuizzDetailResultSchema, None]:
-        lookup_key = self._create_key(
-            user_id=user_id,
-            company_id='*',
-            quizz_id=quizz_id,
-            question_id='*',
-            answer_id='*',
+    def _decode_responses(
+        self, keys: Sequence[str], values: Sequence[Union[bytes, None]]
+    ) -> list[QuizzDetailResultSchema]:
+        responses = []
+        # keys could expire between lookup and mget
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            user_id, _, quizz_id = self._parse_key(key)
+            responses.append(decode_response(user_id, quizz_id, value))
+        return responses
+
+    def _latest_responses_query(self, *conditions: ColumnElement[bool]) -> Select:
+        """Choices of the latest attempt for each (user, quizz) among results matching conditions."""
+        latest_results = (
+            select(QuizzResult.id, QuizzResult.user_id, QuizzResult.quizz_id)
+            .where(*conditions)
+            .distinct(QuizzResult.user_id, QuizzResult.quizz_id)
+            .order_by(QuizzResult.user_id, QuizzResult.quizz_id, QuizzResult.created_at.desc())
+            .subquery()
         )
-        results = await self.get_cached_responses_by_key(lookup_key)
-        return results[0] if results else None
-
-    async def get_user_cached_responses(self, user_id: UUID) -> list[QuizzDetailResultSchema]:
-        lookup_key = self._create_key(
-            user_id=user_id,
-            company_id='*',
-            quizz_id='*',
-            question_id='*',
-            answer_id='*',
+        return (
+            select(
+                latest_results.c.user_id,
+                latest_results.c.quizz_id,
+                QuizzAnswerChoice.question_id,
+                QuizzAnswerChoice.answer_id,
+                QuizzAnswerChoice.is_correct,
+                QuizzAnswerChoice.position,
+            )
+            .join(QuizzAnswerChoice, QuizzAnswerChoice.quizz_result_id == latest_results.c.id)
+            .order_by(latest_results.c.user_id, latest_results.c.quizz_id, QuizzAnswerChoice.position)
         )
-        return await self.get_cached_responses_by_key(lookup_key)
 
-    async def get_user_cached_responses_in_company(
-        self, user_id: UUID, copmany_id: UUID
+    def _build_responses(self, rows: Iterable[Row]) -> list[QuizzDetailResultSchema]:
+        """Groups choice rows ordered by attempt and position into responses."""
+        responses = []
+        for (user_id, quizz_id), attempt_rows in groupby(rows, key=lambda row: (row.user_id, row.quizz_id)):
+            response = QuizzDetailResultSchema(user_id=user_id, quizz_id=quizz_id, questions=[])
+            for _, question_rows in groupby(attempt_rows, key=lambda row: row.position):
+                question_rows = list(question_rows)
+                response.questions.append(
+                    QuestionResultSchema(
+                        question_id=question_rows[0].question_id,
+                        choosen_answers=[
+                            ChoosenAnswerSchema(answer_id=row.answer_id, is_correct=row.is_correct)
+                            for row in question_rows
+                            # answer was deleted since the attempt
+                            if row.answer_id is not None
+                        ],
+                    )
+                )
+            responses.append(response)
+        return responses
+
+    async def get_latest_responses(self, *conditions: ColumnElement[bool]) -> list[QuizzDetailResultSchema]:
+        result = await self.db.execute(self._latest_responses_query(*conditions))
+        return self._build_responses(result.all())
+
+    async def iter_latest_responses(
+        self, *conditions: ColumnElement[bool], chunk_size: int = RESPONSES_CHUNK_SIZE
+    ) -> AsyncIterator[list[QuizzDetailResultSchema]]:
+        """Streams responses in chunks of chunk_size attempts through a server side cursor."""
+        result = await self.db.stream(self._latest_responses_query(*conditions))
+        rows = []
+        attempts = 0
+        async for row in result:
+            if rows and (row.user_id, row.quizz_id) != (rows[-1].user_id, rows[-1].quizz_id):
+                attempts += 1
+                if attempts == chunk_size:
+                    yield self._build_responses(rows)
+                    rows, attempts = [], 0
+            rows.append(row)
+        if rows:
+            yield self._build_responses(rows)
+
+    async def get_users_quizz_responses(
+        self, user_ids: Sequence[UUID], company_id: UUID, quizz_id: UUID
     ) -> list[QuizzDetailResultSchema]:
-        lookup_key = self._create_key(
-            user_id=user_id,
-            company_id=copmany_id,
-            quizz_id='*',
-            question_id='*',
-            answer_id='*',
+        """Keys are known from ids, so all users are read with one MGET, misses are loaded with one query."""
+        if not user_ids:
+            return []
+        keys = [self._create_key(user_id, company_id, quizz_id) for user_id in user_ids]
+        values = await self._get_cached_responses(keys)
+        if values is None:
+            return await self.get_latest_responses(QuizzResult.user_id.in_(user_ids), QuizzResult.quizz_id == quizz_id)
+        responses = self._decode_responses(keys, values)
+
+        missing = [user_id for user_id, value in zip(user_ids, values) if value is None]
+        if missing:
+            stored = await self.get_latest_responses(QuizzResult.user_id.in_(missing), QuizzResult.quizz_id == quizz_id)
+            await self._cache_responses(company_id, stored)
+            responses.extend(stored)
+        return responses
+
+    async def get_user_quizz_response(self, user_id: UUID, quizz_id: UUID) -> Union[QuizzDetailResultSchema, None]:
+        """Latest attempt, read from redis and loaded from the database once it expired there."""
+        result = await self.get_latest_quizz_result(user_id, quizz_id)
+        if result is None:
+            return None
+        values = await self._get_cached_responses([self._create_key(user_id, result.company_id, quizz_id)])
+        if values is not None and values[0] is not None:
+            return decode_response(user_id, quizz_id, values[0])
+
+        query = (
+            select(
+                QuizzResult.user_id,
+                QuizzResult.quizz_id,
+                QuizzAnswerChoice.question_id,
+                QuizzAnswerChoice.answer_id,
+                QuizzAnswerChoice.is_correct,
+                QuizzAnswerChoice.position,
+            )
+            .join(QuizzAnswerChoice, QuizzAnswerChoice.quizz_result_id == QuizzResult.id)
+            .where(QuizzResult.id == result.id)
+            .order_by(QuizzAnswerChoice.position)
         )
-        return await self.get_cached_responses_by_key(lookup_key)
+        responses = self._build_responses((await self.db.execute(query)).all())
+        if values is not None:
+            await self._cache_responses(result.company_id, responses)
+        return responses[0] if responses else None
+
+    async def _get_cached_responses(self, keys: list[str]) -> Union[list[Union[bytes, None]], None]:
+        """Values of keys with one MGET, keys with a queued write are misses since redis holds an older attempt.
+
+        Returns None when redis is unavailable, callers then load responses from the database and do not cache them.
+        """
+        try:
+            values = await cache_writer.run(lambda redis: redis.mget(keys))
+        except CacheUnavailable:
+            return None
+        return [None if cache_writer.is_pending(key) else value for key, value in zip(keys, values)]
+
+    async def _cache_responses(self, company_id: UUID, responses: list[QuizzDetailResultSchema]) -> None:
+        if responses:
+            await cache_writer.write(
+                CacheWrite(
+                    self._create_key(response.user_id, company_id, response.quizz_id),
+                    encode_response(response),
+                    CACHED_RESPONSE_TTL_SECONDS,
+                )
+                for response in responses
+            )
+
+    async def get_user_responses(self, user_id: UUID) -> list[QuizzDetailResultSchema]:
+        return await self.get_latest_responses(QuizzResult.user_id == user_id)
+
+    async def get_user_responses_in_company(self, user_id: UUID, company_id: UUID) -> list[QuizzDetailResultSchema]:
+        return await self.get_latest_responses(QuizzResult.user_id == user_id, QuizzResult.company_id == company_id)
 
     async def get_company_members_responses(self, company_id: UUID) -> list[QuizzDetailResultSchema]:
-        lookup_key = self._create_key(
-            user_id='*',
-            company_id=company_id,
-            quizz_id='*',
-            question_id='*',
-            answer_id='*',
+        return await self.get_latest_responses(QuizzResult.company_id == company_id)
+
+    def iter_user_responses(self, user_id: UUID) -> AsyncIterator[list[QuizzDetailResultSchema]]:
+        return self.iter_latest_responses(QuizzResult.user_id == user_id)
+
+    def iter_user_responses_in_company(
+        self, user_id: UUID, company_id: UUID
+    ) -> AsyncIterator[list[QuizzDetailResultSchema]]:
+        return self.iter_latest_responses(QuizzResult.user_id == user_id, QuizzResult.company_id == company_id)
+
+    def iter_company_members_responses(self, company_id: UUID) -> AsyncIterator[list[QuizzDetailResultSchema]]:
+        return self.iter_latest_responses(QuizzResult.company_id == company_id)
+
+    def _ranked_attempts(self, quizz_id: UUID) -> Subquery:
+        """Attempts with stored choices, ranked by score from 0 (lowest) to 1 (highest)."""
+        return (
+            select(QuizzResult.id, func.percent_rank().over(order_by=QuizzResult.score).label('score_rank'))
+            .where(
+                QuizzResult.quizz_id == quizz_id,
+                exists().where(QuizzAnswerChoice.quizz_result_id == QuizzResult.id),
+            )
+            .subquery()
+        )
+
+    async def get_quizz_attempt_groups(self, quizz_id: UUID) -> Row:
+        """Number of attempts in total, among the highest and among the lowest scores."""
+        attempts = self._ranked_attempts(quizz_id)
+        query = select(
+            func.count().label('total'),
+            func.count().filter(attempts.c.score_rank >= 1 - DISCRIMINATION_GROUP_SHARE).label('upper'),
+            func.count().filter(attempts.c.score_rank <= DISCRIMINATION_GROUP_SHARE).label('lower'),
+        ).select_from(attempts)
+        result = await self.db.execute(query)
+        return result.one()
+
+    async def get_quizz_question_stats(self, quizz_id: UUID) -> Sequence:
+        """Per question: attempts which answered it, fully correct ones overall, in upper and in lower score group.
+
+        Question is fully correct when all its correct answers and nothing else were choosen.
+        """
+        attempts = self._ranked_attempts(quizz_id)
+        correct_counts = (
+            select(Answer.question_id, func.count().filter(Answer.is_correct).label('correct_count'))
+            .join(Question, Question.id == Answer.question_id)
+            .where(Question.quizz_id == quizz_id)
+            .group_by(Answer.question_id)
+            .subquery()
+        )
+        question_attempts = (
+            select(
+                QuizzAnswerChoice.question_id,
+                attempts.c.score_rank,
+                and_(func.bool_and(QuizzAnswerChoice.is_correct), func.count() == correct_counts.c.correct_count).label(
+                    'is_correct'
+                ),
+            )
+            .join(attempts, attempts.c.id == QuizzAnswerChoice.quizz_result_id)
+            .join(correct_counts, correct_counts.c.question_id == QuizzAnswerChoice.question_id)
+            .group_by(
+                QuizzAnswerChoice.quizz_result_id,
+                QuizzAnswerChoice.question_id,
+                attempts.c.score_rank,
+                correct_counts.c.correct_count,
+            )
+            .subquery()
+        )
+        is_correct = question_attempts.c.is_correct
+        score_rank = question_attempts.c.score_rank
+        query = select(
+            question_attempts.c.question_id,
+            func.count().label('responses'),
+            func.count().filter(is_correct).label('correct'),
+            func.count().filter(is_correct, score_rank >= 1 - DISCRIMINATION_GROUP_SHARE).label('upper_correct'),
+            func.count().filter(is_correct, score_rank <= DISCRIMINATION_GROUP_SHARE).label('lower_correct'),
+        ).group_by(question_attempts.c.question_id)
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def get_quizz_answer_choice_counts(self, quizz_id: UUID) -> Sequence:
+        """How many times each answer of the quizz was choosen, answers never choosen are absent."""
+        query = (
+            select(QuizzAnswerChoice.answer_id, func.count().label('count'))
+            .join(QuizzResult, QuizzResult.id == QuizzAnswerChoice.quizz_result_id)
+            .where(QuizzResult.quizz_id == quizz_id)
+            .group_by(QuizzAnswerChoice.answer_id)
+        )
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def lock_quizz_rescoring(self, quizz_id: UUID) -> None:
+        """Transaction level advisory lock, serializes rescoring runs of the quizz."""
+        await self.db.execute(select(func.pg_advisory_xact_lock(quizz_id.int >> 65)))
+
+    async def get_rescorable_results(self, quizz_id: UUID) -> Sequence:
+        """Ids and scores of quizz results with stored answer choices, older ones can not be rescored."""
+        query = (
+            select(QuizzResult.id, QuizzResult.score)
+            .where(
+                QuizzResult.quizz_id == quizz_id,
+                exists().where(QuizzAnswerChoice.quizz_result_id == QuizzResult.id),
+            )
+            .order_by(QuizzResult.id)
+        )
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def get_results_answer_ids(self, result_ids: Collection[UUID]) -> dict[UUID, list[UUID]]:
+        query = select(QuizzAnswerChoice.quizz_result_id, QuizzAnswerChoice.answer_id).where(
+            QuizzAnswerChoice.quizz_result_id.in_(result_ids)
+        )
+        answer_ids: dict[UUID, list[UUID]] = {result_id: [] for result_id in result_ids}
+        for result_id, answer_id in await self.db.execute(query):
+            answer_ids[result_id].append(answer_id)
+        return answer_ids
+
+    async def update_result_scores(self, scores: dict[UUID, int]) -> None:
+        """Single executemany UPDATE by primary key."""
+        if scores:
+            await self.db.execute(
+                update(QuizzResult), [{'id': result_id, 'score': score} for result_id, score in scores.items()]
+            )
+
+    async def update_answer_choices_correctness(self, result_ids: Collection[UUID]) -> None:
+        """Copies current correctness of answers to choices of the results, analytics are computed from choices."""
+        await self.db.execute(
+            update(QuizzAnswerChoice)
+            .where(
+                QuizzAnswerChoice.answer_id == Answer.id,
+                QuizzAnswerChoice.quizz_result_id.in_(result_ids),
+                QuizzAnswerChoice.is_correct != Answer.is_correct,
+            )
+            .values(is_correct=Answer.is_correct)
+            .execution_options(synchronize_session=False)
         )
-        return await self.get_cached_responses_by_key(lookup_key)
+
+    async def get_rescore_progress(self, quizz_id: UUID) -> dict[bytes, bytes]:
+        redis = await get_redis_client()
+        progress = await redis.hgetall(self._create_rescore_key(quizz_id))
+        await redis.close()
+        return progress
+
+    async def set_rescore_progress(self, quizz_id: UUID, **fields: Union[str, int]) -> None:
+        redis = await get_redis_client()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._create_rescore_key(quizz_id), mapping=fields)
+            pipe.expire(self._create_rescore_key(quizz_id), RESCORE_PROGRESS_TTL_SECONDS)
+            await pipe.execute()
+        await redis.close()
+
+    def _create_rescore_key(self, quizz_id: UUID) -> str:
+        return f'rescore:{quizz_id}'
+
+    async def get_cached_analytics(self, quizz_id: UUID) -> Union[bytes, None]:
+        key = self._create_analytics_key(quizz_id)
+        if cache_writer.is_pending(key):
+            return None
+        try:
+            return await cache_writer.run(lambda redis: redis.get(key))
+        except CacheUnavailable:
+            return None
+
+    async def cache_analytics(self, quizz_id: UUID, analytics: bytes) -> None:
+        await cache_writer.write(
+            [CacheWrite(self._create_analytics_key(quizz_id), analytics, CACHED_ANALYTICS_TTL_SECONDS)]
+        )
+
+    def _create_analytics_key(self, quizz_id: UUID) -> str:
+        return f'analytics:{quizz_id}'
 
     async def get_company_members_with_lastest_complition_date(self, company_id: UUID) -> Sequence:
         subquery_company_action = (
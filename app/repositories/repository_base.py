@@ -1,30 +1,178 @@
 import contextlib
-from collections.abc import AsyncGenerator
-from typing import TypeVar, Union
+from collections.abc import AsyncGenerator, Sequence
+from typing import Any, Optional, TypeVar, Union
 from uuid import UUID
 
-from sqlalchemy import ColumnElement, delete, func, select
+from sqlalchemy import ColumnElement, Select, delete, func, select, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable, ExecutableOption
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.elements import ClauseElement
+
+from app.redis import CacheUnavailable, cache_writer
+from app.utils.pagination import CountMode, PageCursor
 
 T = TypeVar('T')
 
+COUNT_CACHE_TTL_SECONDS = 60
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a query, executed with the bind parameters of the query."""
+
+    inherit_cache = False
+
+    def __init__(self, query: Select) -> None:
+        self.query = query
+
+
+@compiles(Explain)
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kwargs: Any) -> str:
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.query, **kwargs)
+
 
 class RepositoryBase:
+    # below this many rows exact count is cheap enough, and planner statistics are too coarse to be useful
+    exact_count_threshold = 10_000
+
     def __init__(self, db: AsyncSession):
         self.db = db
+        self._stale_count_keys: set[str] = set()
 
-    async def _get_all_items(self, offset: int, limit: int, table: T) -> list[T]:
-        query = select(table).offset(offset).limit(limit).order_by(table.created_at)
+    def _paginate(self, query: Select, table: T, offset: int, limit: int, after: Optional[PageCursor]) -> Select:
+        """Orders query by (created_at, id) and applies either keyset (after) or offset pagination."""
+        if after is not None:
+            query = query.where(tuple_(table.created_at, table.id) > tuple_(after.created_at, after.id))
+        else:
+            query = query.offset(offset)
+        return query.order_by(table.created_at, table.id).limit(limit)
+
+    async def _get_all_items(
+        self,
+        offset: int,
+        limit: int,
+        table: T,
+        options: Sequence[ExecutableOption] = (),
+        after: Optional[PageCursor] = None,
+    ) -> list[T]:
+        query = self._paginate(select(table).options(*options), table, offset, limit, after)
         results = await self.db.execute(query)
         return results.scalars().all()
 
     async def _get_all_meeting_condition(
-        self, offset: int, limit: int, condition: ColumnElement[bool], table: T
+        self,
+        offset: int,
+        limit: int,
+        condition: ColumnElement[bool],
+        table: T,
+        options: Sequence[ExecutableOption] = (),
+        after: Optional[PageCursor] = None,
     ) -> list[T]:
-        query = select(table).where(condition).offset(offset).limit(limit).order_by(table.created_at)
+        query = self._paginate(select(table).options(*options).where(condition), table, offset, limit, after)
         results = await self.db.execute(query)
         return results.scalars().all()
 
+    async def _get_page_with_count(
+        self,
+        offset: int,
+        limit: int,
+        table: T,
+        condition: Optional[ColumnElement[bool]] = None,
+        options: Sequence[ExecutableOption] = (),
+        after: Optional[PageCursor] = None,
+        count_mode: CountMode = 'exact',
+        count_cache_key: Optional[str] = None,
+    ) -> tuple[list[T], int, CountMode]:
+        """Returns page of items together with total count and the count mode that was actually used.
+
+        'estimate' falls back to 'exact' for small or never analyzed tables,
+        'cached' falls back to 'exact' when no cache key is given.
+        """
+        if count_mode == 'estimate':
+            count = await self._estimate_count(table, condition)
+            if count is not None:
+                return await self._get_page(offset, limit, table, condition, options, after), count, 'estimate'
+        if count_mode == 'cached' and count_cache_key is not None:
+            count = await self._get_cached_count(count_cache_key, table, condition)
+            return await self._get_page(offset, limit, table, condition, options, after), count, 'cached'
+
+        # uncorrelated subquery is evaluated once, so count comes in the same round trip as the page
+        total_count = self._count_query(table, condition).scalar_subquery()
+        query = select(table, total_count).options(*options)
+        if condition is not None:
+            query = query.where(condition)
+        results = await self.db.execute(self._paginate(query, table, offset, limit, after))
+        rows = results.all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1], 'exact'
+        if offset == 0 and after is None:
+            return [], 0, 'exact'
+        # page past the end carries no rows to read count from
+        return [], (await self.db.execute(self._count_query(table, condition))).scalar_one(), 'exact'
+
+    async def _get_page(
+        self,
+        offset: int,
+        limit: int,
+        table: T,
+        condition: Optional[ColumnElement[bool]],
+        options: Sequence[ExecutableOption],
+        after: Optional[PageCursor],
+    ) -> list[T]:
+        if condition is None:
+            return await self._get_all_items(offset, limit, table, options, after)
+        return await self._get_all_meeting_condition(offset, limit, condition, table, options, after)
+
+    def _count_query(self, table: T, condition: Optional[ColumnElement[bool]]) -> Select:
+        query = select(func.count(table.id))
+        if condition is not None:
+            query = query.where(condition)
+        return query
+
+    async def _estimate_count(self, table: T, condition: Optional[ColumnElement[bool]]) -> Union[int, None]:
+        results = await self.db.execute(
+            text('SELECT reltuples FROM pg_class WHERE oid = CAST(:table_name AS regclass)'),
+            {'table_name': table.__tablename__},
+        )
+        reltuples = results.scalar_one()
+        # reltuples is -1 for tables that were never vacuumed or analyzed
+        if reltuples < self.exact_count_threshold:
+            return None
+        if condition is None:
+            return int(reltuples)
+        results = await self.db.execute(Explain(select(table.id).where(condition)))
+        # asyncpg dialect registers json codec, plan comes already decoded
+        plan = results.scalar_one()
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    async def _get_cached_count(self, key: str, table: T, condition: Optional[ColumnElement[bool]]) -> int:
+        """Count cached for a short while, exact count is used while redis is unavailable or the key is invalidated."""
+        # queued deletion means cached count is outdated, it is not cached again until redis accepts the deletion
+        cacheable = not cache_writer.is_pending(key)
+        try:
+            cached = await cache_writer.run(lambda redis: redis.get(key)) if cacheable else None
+        except CacheUnavailable:
+            cached, cacheable = None, False
+        if cached is not None:
+            return int(cached)
+        count = (await self.db.execute(self._count_query(table, condition))).scalar_one()
+        if cacheable:
+            with contextlib.suppress(CacheUnavailable):
+                await cache_writer.run(lambda redis: redis.set(key, count, ex=COUNT_CACHE_TTL_SECONDS))
+        return count
+
+    def _mark_count_stale(self, key: str) -> None:
+        """Cached count under the key is dropped after next successful commit."""
+        self._stale_count_keys.add(key)
+
+    async def _drop_stale_counts(self) -> None:
+        if not self._stale_count_keys:
+            return
+        keys, self._stale_count_keys = list(self._stale_count_keys), set()
+        # runs after the commit, a failing redis must not fail the request, deletion is queued instead
+        await cache_writer.delete(keys)
+
     async def _get_items_count(self, table: T) -> int:
         results = await self.db.execute(select(func.count(table.id)))
         return results.scalar_one()
@@ -46,6 +194,7 @@ class RepositoryBase:
         except Exception:
             await self.db.rollback()
             raise
+        await self._drop_stale_counts()
 
     @contextlib.asynccontextmanager
     async def unit(self) -> AsyncGenerator[None, None]:
@@ -1,15 +1,27 @@
-from typing import Union
+from collections.abc import Collection, Sequence
+from typing import Optional, Union
 from uuid import UUID
 
 from sqlalchemy import select
 
 from app.db.models import User
+from app.repositories.company_repository import PUBLIC_COMPANIES_COUNT_KEY
 from app.repositories.repository_base import RepositoryBase
+from app.utils.pagination import CountMode, PageCursor
+
+USERS_COUNT_KEY = 'count:users'
 
 
 class UserRepository(RepositoryBase):
-    async def get_all_users(self, offset: int, limit: int) -> list[User]:
-        return await self._get_all_items(offset, limit, User)
+    async def get_all_users(self, offset: int, limit: int, after: Optional[PageCursor] = None) -> list[User]:
+        return await self._get_all_items(offset, limit, User, after=after)
+
+    async def get_all_users_with_count(
+        self, offset: int, limit: int, after: Optional[PageCursor] = None, count_mode: CountMode = 'exact'
+    ) -> tuple[list[User], int, CountMode]:
+        return await self._get_page_with_count(
+            offset, limit, User, after=after, count_mode=count_mode, count_cache_key=USERS_COUNT_KEY
+        )
 
     async def get_users_count(self) -> int:
         return await self._get_items_count(User)
@@ -17,6 +29,10 @@ class UserRepository(RepositoryBase):
     async def get_user_by_id(self, user_id: UUID) -> User:
         return await self._get_item_by_id(user_id, User)
 
+    async def get_users_by_ids(self, user_ids: Collection[UUID]) -> Sequence[User]:
+        results = await self.db.execute(select(User).where(User.id.in_(user_ids)))
+        return results.scalars().all()
+
     async def get_user_by_email(self, email: str) -> User:
         results = await self.db.execute(select(User).where(User.email == email))
         return results.scalars().first()
@@ -31,11 +47,15 @@ class UserRepository(RepositoryBase):
         user.email = email
         user.hashed_password = hashed_password
         self.db.add(user)
+        self._mark_count_stale(USERS_COUNT_KEY)
 
         return user
 
     async def delete_user(self, user: User) -> None:
         await self.db.delete(user)
+        self._mark_count_stale(USERS_COUNT_KEY)
+        # owned companies are deleted by cascade
+        self._mark_count_stale(PUBLIC_COMPANIES_COUNT_KEY)
 
     def update_user(self, user: User, user_data: dict) -> None:
         for field, value in user_data.items():
@@ -43,5 +63,6 @@ class UserRepository(RepositoryBase):
 
     async def commit_me(self, user: User, refresh: bool = True) -> None:
         await self.db.commit()
+        await self._drop_stale_counts()
         if refresh:
             await self.db.refresh(user)
@@ -1,11 +1,13 @@
 import datetime
-from typing import Annotated, Literal
+from typing import Annotated, Literal, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.dependencies import get_company_service, get_quizz_service, get_user_service
 from app.core.security import get_current_user
+from app.db import get_db
 from app.schemas.company_action_schema import CompanyActionSchema
 from app.schemas.company_schema import (
     CompanyCreateSchema,
@@ -24,8 +26,11 @@ from app.schemas.user_shema import UserDetail, UserEmailSchema, UserIdSchema, Us
 from app.services.company_service.service import CompanyService
 from app.services.quizz_service.service import QuizzService
 from app.services.users_service.service import UserService
+from app.utils.csv_stream import csv_streaming_response
+from app.utils.instrumentation import TimedRoute
+from app.utils.pagination import CountMode
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get('/')
@@ -34,8 +39,10 @@ async def get_companies(
     _: Annotated[UserDetail, Depends(get_current_user)],  # requires authentication
     page: int = 1,
     limit: int = 10,
+    cursor: Optional[str] = None,  # takes precedence over page
+    count_mode: CountMode = 'estimate',
 ) -> CompanyListSchema:
-    return await company_service.get_all_companies(page, limit)
+    return await company_service.get_all_companies(page, limit, cursor, count_mode)
 
 
 @router.get('/my/')
@@ -207,9 +214,11 @@ async def get_company_quizzes(
     current_user: Annotated[UserDetail, Depends(get_current_user)],
     page: int = 1,
     limit: int = 10,
+    cursor: Optional[str] = None,  # takes precedence over page
+    count_mode: CountMode = 'cached',
 ) -> QuizzListSchema:
     await company_service.check_is_member(company_id, current_user.id)
-    return await quizz_service.get_company_quizzes(company_id, page, limit)
+    return await quizz_service.get_company_quizzes(company_id, page, limit, cursor, count_mode)
 
 
 @router.get('/{company_id}/quizzes/average/', tags=['quizzes', 'companies'])
@@ -230,13 +239,13 @@ async def get_user_responses_for_company_quizzes(
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
+    session: Annotated[AsyncSession, Depends(get_db)],
     format: Literal['json', 'csv'] = 'json',
 ) -> Response:
     await company_service.check_is_member(company_id, current_user.id)
     if format == 'csv':
-        return Response(
-            content=await quizz_service.get_user_responses_in_company_from_cache_csv(user_id, company_id),
-            media_type='text/csv',
+        return csv_streaming_response(
+            quizz_service.get_user_responses_in_company_from_cache_csv(user_id, company_id), session
         )
     data = await quizz_service.get_user_responses_in_company_from_cache_json(user_id, company_id)
     return Response(content=data.model_dump_json(), media_type='text/json')
@@ -248,14 +257,12 @@ async def get_all_members_responses_for_company_quizzes(
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
+    session: Annotated[AsyncSession, Depends(get_db)],
     format: Literal['json', 'csv'] = 'json',
 ) -> Response:
     await company_service.check_owner_or_admin(company_id, current_user.id)
     if format == 'csv':
-        return Response(
-            content=await quizz_service.get_company_members_responses_from_cache_csv(company_id),
-            media_type='text/csv',
-        )
+        return csv_streaming_response(quizz_service.get_company_members_responses_from_cache_csv(company_id), session)
     data = await quizz_service.get_company_members_responses_from_cache_json(company_id)
     return Response(content=data.model_dump_json(), media_type='text/json')
 
@@ -1,13 +1,15 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.db import get_db
 from app.schemas.health_check_schema import HealthCheckInfo, HealthCheckReport
 from app.services.health_check_service import check_db_health, check_redis_health
+from app.utils.instrumentation import TimedRoute
+from app.utils.metrics import registry
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get('/', description='Complete health check')
@@ -35,3 +37,8 @@ async def get_redis_health() -> HealthCheckInfo:
 @router.get('/db', description='Database health check')
 async def get_db_health(db: Annotated[AsyncSession, Depends(get_db)]) -> HealthCheckInfo:
     return await check_db_health(db)
+
+
+@router.get('/metrics', description='Request metrics in Prometheus text format')
+async def get_metrics() -> Response:
+    return Response(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
@@ -8,8 +8,9 @@ from app.core.security import get_current_user
 from app.schemas.notification_schema import NotificationSchema
 from app.schemas.user_shema import UserSchema
 from app.services.notification_service.service import NotificationService
+from app.utils.instrumentation import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get('/')
@@ -0,0 +1,25 @@
+import asyncio
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response
+
+from app.core.config import settings
+from app.utils.instrumentation import TimedRoute
+from app.utils.permissions import only_admin
+from app.utils.profiler import FOLDED_MEDIA_TYPE, SamplingProfiler
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.post(
+    '/',
+    dependencies=[Depends(only_admin)],
+    description='Samples stacks of the worker serving this request, folded for flamegraphs',
+)
+async def profile_worker(
+    seconds: Annotated[float, Query(gt=0, le=settings.PROFILER_MAX_SECONDS)] = 10,
+) -> Response:
+    with SamplingProfiler(settings.PROFILER_INTERVAL_SECONDS) as profiler:
+        # the event loop keeps serving other requests, those are what gets sampled
+        await asyncio.sleep(seconds)
+    return Response(profiler.folded(), media_type=FOLDED_MEDIA_TYPE)
@@ -2,15 +2,18 @@ import datetime
 from typing import Annotated, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, UploadFile
 from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.dependencies import get_company_service, get_quizz_service
 from app.core.security import get_current_user
+from app.db import get_db
 from app.schemas.quizz_schema import (
     AnswerCreateSchema,
     QuestionCreateSchema,
     QuestionUpdateSchema,
+    QuizzAnalyticsSchema,
     QuizzCompletionSchema,
     QuizzCreateSchema,
     QuizzResultSchema,
@@ -19,13 +22,17 @@ from app.schemas.quizz_schema import (
     QuizzUpdateSchema,
     QuizzWithCorrectAnswersSchema,
     QuizzWithNoQuestionsSchema,
+    RescoreProgressSchema,
 )
 from app.schemas.user_shema import UserDetail
 from app.services.company_service.service import CompanyService
+from app.services.quizz_service.rescoring import rescore_quizz
 from app.services.quizz_service.service import QuizzService
+from app.utils.csv_stream import csv_streaming_response
 from app.utils.excel_mime import is_excel_file
+from app.utils.instrumentation import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post('/')
@@ -141,10 +148,12 @@ async def add_answer_to_question(
     quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
 ) -> QuizzWithCorrectAnswersSchema:
     quizz = await quizz_service.get_quizz(quizz_id)
     await company_service.check_owner_or_admin(quizz.company_id, current_user.id)
-    await quizz_service.add_answer_to_question(quizz_id, question_id, answer_data)
+    if await quizz_service.add_answer_to_question(quizz_id, question_id, answer_data):
+        background_tasks.add_task(rescore_quizz, quizz_id)
     return await quizz_service.fetch_quizz_questions_with_correct_answers(quizz)
 
 
@@ -155,10 +164,12 @@ async def delete_answer(
     quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
 ) -> QuizzWithCorrectAnswersSchema:
     quizz = await quizz_service.get_quizz(quizz_id)
     await company_service.check_owner_or_admin(quizz.company_id, current_user.id)
-    await quizz_service.delete_answer(answer_id, quizz_id)
+    if await quizz_service.delete_answer(answer_id, quizz_id):
+        background_tasks.add_task(rescore_quizz, quizz_id)
     return await quizz_service.fetch_quizz_questions_with_correct_answers(quizz)
 
 
@@ -170,13 +181,27 @@ async def update_answer(
     quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
 ) -> QuizzWithCorrectAnswersSchema:
     quizz = await quizz_service.get_quizz(quizz_id)
     await company_service.check_owner_or_admin(quizz.company_id, current_user.id)
-    await quizz_service.update_answer(answer_id, quizz_id, answer_data)
+    if await quizz_service.update_answer(answer_id, quizz_id, answer_data):
+        background_tasks.add_task(rescore_quizz, quizz_id)
     return await quizz_service.fetch_quizz_questions_with_correct_answers(quizz)
 
 
+@router.get('/{quizz_id}/rescore/')
+async def get_rescore_progress(
+    quizz_id: UUID,
+    quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
+    company_service: Annotated[CompanyService, Depends(get_company_service)],
+    current_user: Annotated[UserDetail, Depends(get_current_user)],
+) -> RescoreProgressSchema:
+    quizz = await quizz_service.get_quizz(quizz_id)
+    await company_service.check_owner_or_admin(quizz.company_id, current_user.id)
+    return await quizz_service.get_rescore_progress(quizz_id)
+
+
 @router.post('/complete/')
 async def complete_quizz(
     quizz_completion_data: QuizzCompletionSchema,
@@ -201,6 +226,18 @@ async def get_quizz_average_score(
     return await quizz_service.get_average_score_by_quizz(quizz_id)
 
 
+@router.get('/{quizz_id}/analytics/', response_model=QuizzAnalyticsSchema)
+async def get_quizz_analytics(
+    quizz_id: UUID,
+    quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
+    company_service: Annotated[CompanyService, Depends(get_company_service)],
+    current_user: Annotated[UserDetail, Depends(get_current_user)],
+) -> Response:
+    quizz = await quizz_service.get_quizz(quizz_id)
+    await company_service.check_owner_or_admin(quizz.company_id, current_user.id)
+    return Response(content=await quizz_service.get_quizz_analytics_view(quizz_id), media_type='application/json')
+
+
 @router.get('/{quizz_id}/responses/my/')
 async def get_my_quizz_response(
     quizz_id: UUID,
@@ -209,8 +246,10 @@ async def get_my_quizz_response(
     format: Literal['json', 'csv'] = 'json',
 ) -> Response:
     if format == 'json':
-        cached_response = await quizz_service.get_cached_user_response_json(current_user.id, quizz_id)
-        return Response(content=cached_response.model_dump_json(), media_type='text/json')
+        cached_response = await quizz_service.get_cached_user_response_view(
+            current_user.id, quizz_id, current_user.email
+        )
+        return Response(content=cached_response, media_type='text/json')
 
     cached_response = await quizz_service.get_cached_user_response_csv(current_user.id, quizz_id)
     return Response(content=cached_response, media_type='text/csv')
@@ -225,13 +264,13 @@ async def get_user_quizz_response(
     current_user: Annotated[UserDetail, Depends(get_current_user)],
     format: Literal['json', 'csv'] = 'json',
 ) -> Response:
-    quizz = await quizz_service.get_quizz(quizz_id)
     if user_id != current_user.id:
+        quizz = await quizz_service.get_quizz(quizz_id)
         await company_service.check_owner_or_admin(quizz.company_id, current_user.id)
 
     if format == 'json':
-        cached_response = await quizz_service.get_cached_user_response_json(user_id, quizz_id)
-        return Response(content=cached_response.model_dump_json(), media_type='text/json')
+        cached_response = await quizz_service.get_cached_user_response_view(user_id, quizz_id)
+        return Response(content=cached_response, media_type='text/json')
 
     cached_response = await quizz_service.get_cached_user_response_csv(user_id, quizz_id)
     return Response(content=cached_response, media_type='text/csv')
@@ -243,6 +282,7 @@ async def get_quizz_responses(
     quizz_service: Annotated[QuizzService, Depends(get_quizz_service)],
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
+    session: Annotated[AsyncSession, Depends(get_db)],
     format: Literal['json', 'csv'] = 'json',
 ) -> Response:
     quizz = await quizz_service.get_quizz(quizz_id)
@@ -253,8 +293,7 @@ async def get_quizz_responses(
         cached_response = await quizz_service.get_cached_users_responses_json(members, quizz_id)
         return Response(content=cached_response.model_dump_json(), media_type='text/json')
 
-    cached_response = await quizz_service.get_cached_users_responses_csv(members, quizz_id)
-    return Response(content=cached_response, media_type='text/csv')
+    return csv_streaming_response(quizz_service.get_cached_users_responses_csv(members, quizz_id), session)
 
 
 @router.get('/{quizz_id}/completions/{user_id}/')
@@ -310,6 +349,7 @@ async def import_quizz_data_from_excel(
     company_service: Annotated[CompanyService, Depends(get_company_service)],
     current_user: Annotated[UserDetail, Depends(get_current_user)],
     excel_file: UploadFile,
+    background_tasks: BackgroundTasks,
 ) -> QuizzSchema:
     await company_service.check_owner_or_admin(company_id, current_user.id)
     if excel_file.size < 8 or not is_excel_file(await excel_file.read(8)):
@@ -319,7 +359,10 @@ async def import_quizz_data_from_excel(
     creation_schema = quizz_service.get_schema_from_excel(await excel_file.read(), company_id)
     await excel_file.close()
 
-    return await quizz_service.create_or_update_quizz(creation_schema)
+    quizz, key_changed = await quizz_service.create_or_update_quizz(creation_schema)
+    if key_changed:
+        background_tasks.add_task(rescore_quizz, quizz.id)
+    return quizz
 
 
 @router.get('/import/example/')
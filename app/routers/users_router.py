@@ -1,11 +1,13 @@
 import datetime
-from typing import Annotated, Literal
+from typing import Annotated, Literal, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.dependencies import get_authentication_service, get_company_service, get_quizz_service, get_user_service
 from app.core.security import get_current_user
+from app.db import get_db
 from app.schemas.company_action_schema import CompanyActionSchema
 from app.schemas.company_schema import CompanyListSchema
 from app.schemas.quizz_schema import (
@@ -26,9 +28,12 @@ from app.services.authentication_service.service import AuthenticationService
 from app.services.company_service.exceptions import CompanyActionException
 from app.services.company_service.service import CompanyService
 from app.services.quizz_service.service import QuizzService
+from app.utils.csv_stream import csv_streaming_response
+from app.utils.instrumentation import TimedRoute
+from app.utils.pagination import CountMode
 from app.utils.permissions import only_user_itself
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get('/', response_model=UserList, dependencies=[Depends(get_current_user)])
@@ -36,8 +41,10 @@ async def read_users(
     user_service: Annotated[UserService, Depends(get_user_service)],
     page: int = 1,
     limit: int = 10,
+    cursor: Optional[str] = None,  # takes precedence over page
+    count_mode: CountMode = 'estimate',
 ) -> UserList:
-    return await user_service.get_all_users(page, limit)
+    return await user_service.get_all_users(page, limit, cursor, count_mode)
 
 
 @router.post('/', response_model=UserSchema)
@@ -162,11 +169,11 @@ async def leave_company(
     company_id: UUID,
     user_service: Annotated[UserService, Depends(get_user_service)],
     company_service: Annotated[CompanyService, Depends(get_company_service)],
-) -> CompanyListSchema:
+) -> None:
     company = await company_service.check_company_exists(company_id)
     if company.owner_id == user_id:
         raise CompanyActionException('Owner cannot leave company')
-    return await user_service.leave_company(user_id, company_id)
+    await user_service.leave_company(user_id, company_id)
 
 
 @router.get('/{user_id}/quizzes/average/', tags=['quizzes', 'users'])
@@ -183,10 +190,11 @@ async def get_user_quizzes_average_score(
 async def get_user_quizz_responses(
     user_id: UUID,
     quiz_service: Annotated[QuizzService, Depends(get_quizz_service)],
+    session: Annotated[AsyncSession, Depends(get_db)],
     format: Literal['json', 'csv'] = 'json',
 ) -> Response:
     if format == 'csv':
-        return Response(content=await quiz_service.get_user_responses_from_cache_csv(user_id), media_type='text/csv')
+        return csv_streaming_response(quiz_service.get_user_responses_from_cache_csv(user_id), session)
     data = await quiz_service.get_user_responses_from_cache_json(user_id)
     return Response(content=data.model_dump_json(), media_type='text/json')
 
@@ -4,6 +4,7 @@ from uuid import UUID
 from pydantic import BaseModel, ConfigDict, Field
 
 from app.schemas.user_shema import UserSchema
+from app.utils.pagination import CountMode
 
 
 class CompanySchema(BaseModel):
@@ -26,6 +27,8 @@ class CompanyDetailWithIsMemberSchema(CompanyDetailSchema):
 class CompanyListSchema(BaseModel):
     companies: list[CompanySchema]
     total_count: int
+    next_cursor: Optional[str] = None
+    count_mode: CountMode = 'exact'
 
 
 class CompanyCreateSchema(BaseModel):
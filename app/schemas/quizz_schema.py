@@ -1,10 +1,12 @@
 import datetime
-from typing import Optional
+from typing import Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing_extensions import Self
 
+from app.utils.pagination import CountMode
+
 
 class AnswerCreateSchema(BaseModel):
     text: str = Field(max_length=250)
@@ -92,6 +94,8 @@ class QuizzWithCorrectAnswersSchema(QuizzSchema):
 class QuizzListSchema(BaseModel):
     quizzes: list[QuizzWithNoQuestionsSchema]
     total_count: int
+    next_cursor: Optional[str] = None
+    count_mode: CountMode = 'exact'
 
 
 class AnswerUpdateSchema(BaseModel):
@@ -192,6 +196,43 @@ class QuizzResultAnalyticsListSchema(BaseModel):
     date: datetime.datetime
 
 
+class AnswerDistributionSchema(BaseModel):
+    answer_id: UUID
+    text: str
+    is_correct: bool
+    count: int
+    # share of responses to the question which choose the answer
+    share: float
+
+
+class QuestionAnalyticsSchema(BaseModel):
+    question_id: UUID
+    text: str
+    responses: int
+    correct_rate: float
+    # correct rate among highest scores minus among lowest ones, None until both groups have attempts
+    discrimination_index: Optional[float]
+    last_edited_at: datetime.datetime
+    seconds_since_edit: float
+    answers: list[AnswerDistributionSchema]
+
+
+class QuizzAnalyticsSchema(BaseModel):
+    quizz_id: UUID
+    attempts: int
+    computed_at: datetime.datetime
+    questions: list[QuestionAnalyticsSchema]
+
+
+class RescoreProgressSchema(BaseModel):
+    status: Literal['running', 'done', 'failed', 'superseded']
+    total: int
+    processed: int
+    updated: int
+    started_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
+
+
 class CompletionInfoSchema(BaseModel):
     quizz_id: UUID
     quizz_title: str
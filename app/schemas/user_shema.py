@@ -5,6 +5,8 @@ from uuid import UUID
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
 from typing_extensions import Self
 
+from app.utils.pagination import CountMode
+
 
 class UserSchema(BaseModel):
     id: UUID
@@ -59,6 +61,8 @@ class UserDetail(UserSchema):
 class UserList(BaseModel):
     users: list[UserSchema] = []
     total_count: int
+    next_cursor: Optional[str] = None
+    count_mode: CountMode = 'exact'
 
 
 class UserIdSchema(BaseModel):
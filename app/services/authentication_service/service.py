@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.repositories.user_repository import UserRepository
 from app.schemas.user_shema import UserDetail, UserSchema, UserSignInSchema
+from app.utils.instrumentation import timing_span
 
 
 class AuthenticationService:
@@ -22,7 +23,9 @@ class AuthenticationService:
         if user is None:
             return None
 
-        if not argon2.verify(user_signin_request.password, user.hashed_password):
+        with timing_span('password'):
+            verified = argon2.verify(user_signin_request.password, user.hashed_password)
+        if not verified:
             return None
 
         return UserSchema.model_validate(user)
@@ -1,4 +1,4 @@
-from typing import Callable, Literal
+from typing import Callable, Literal, Optional
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,6 +17,7 @@ from app.schemas.company_schema import (
 )
 from app.schemas.user_shema import UserDetail, UserInCompanyList, UserInCompanySchema, UserList, UserSchema
 from app.services.notification_service import NotificationService
+from app.utils.pagination import CountMode, decode_cursor, next_page_cursor
 
 from .exceptions import (
     ActionNotFound,
@@ -67,32 +68,33 @@ class CompanyService:
 
     async def check_owner_or_admin(self, company_id: UUID, user_id: UUID) -> Company:
         company = await self.check_company_exists(company_id)
-        is_admin = await self._company_action_repository.get_by_company_user_and_type(
-            company_id=company_id, user_id=user_id, _type=CompanyActionType.ADMIN
-        )
-        if company.owner_id != user_id and is_admin is None:
+        if company.owner_id == user_id:
+            return company
+        role = await self._company_action_repository.get_cached_role(company_id, user_id)
+        if role != CompanyActionType.ADMIN:
             raise CompanyNotFoundException(company_id)
         return company
 
     async def check_is_member(self, company_id: UUID, user_id: UUID) -> Company:
         company = await self.check_company_exists(company_id)
-        is_member = await self._company_action_repository.get_by_company_user_and_type(
-            company_id=company_id, user_id=user_id, _type=CompanyActionType.MEMBERSHIP
-        )
-        is_admin = await self._company_action_repository.get_by_company_user_and_type(
-            company_id=company_id, user_id=user_id, _type=CompanyActionType.ADMIN
-        )
-        if is_member is None and is_admin is None:
+        role = await self._company_action_repository.get_cached_role(company_id, user_id)
+        if role not in [CompanyActionType.MEMBERSHIP, CompanyActionType.ADMIN]:
             raise CompanyNotFoundException(company_id)
         return company
 
-    async def get_all_companies(self, page: int, limit: int) -> CompanyListSchema:
+    async def get_all_companies(
+        self, page: int, limit: int, cursor: Optional[str] = None, count_mode: CountMode = 'exact'
+    ) -> CompanyListSchema:
         offset = (page - 1) * limit
-        companies, count = await self._company_repository.get_all_companies(offset, limit)
-        for company in companies:
-            company.owner = await company.awaitable_attrs.owner
+        after = decode_cursor(cursor) if cursor else None
+        companies, count, count_mode = await self._company_repository.get_all_companies(
+            offset, limit, after, count_mode
+        )
         return CompanyListSchema(
-            companies=[CompanySchema.model_validate(company) for company in companies], total_count=count
+            companies=[CompanySchema.model_validate(company) for company in companies],
+            total_count=count,
+            next_cursor=next_page_cursor(companies, limit),
+            count_mode=count_mode,
         )
 
     async def get_companies_by_owner_id(
@@ -102,30 +104,26 @@ class CompanyService:
         companies, count = await self._company_repository.get_companies_by_owner_id(
             owner_id, including_hidden, offset, limit
         )
-        for company in companies:
-            company.owner = await company.awaitable_attrs.owner
         return CompanyListSchema(
             companies=[CompanySchema.model_validate(company) for company in companies], total_count=count
         )
 
     async def get_company_by_id(self, company_id: UUID, current_user: UserDetail) -> CompanyDetailWithIsMemberSchema:
         company = await self._company_repository.get_company_by_id(company_id)
-        membership = await self._company_action_repository.get_by_company_and_user(
-            company_id=company_id, user_id=current_user.id
-        )
         if not company:
             raise CompanyNotFoundException(company_id)
-        if company.hidden and company.owner_id != current_user.id and membership is None:
+        role = await self._company_action_repository.get_cached_role(company_id, current_user.id)
+        if company.hidden and company.owner_id != current_user.id and role is None:
             raise CompanyNotFoundException(company_id)
-        if company.hidden and membership.type not in [CompanyActionType.MEMBERSHIP, CompanyActionType.ADMIN]:
+        if company.hidden and role not in [CompanyActionType.MEMBERSHIP, CompanyActionType.ADMIN]:
             raise CompanyNotFoundException(company_id)
         company.owner = await company.awaitable_attrs.owner
         status = 'yes'
-        if membership is None:
+        if role is None:
             status = 'no'
-        elif membership.type == CompanyActionType.REQUEST:
+        elif role == CompanyActionType.REQUEST:
             status = 'pending_request'
-        elif membership.type == CompanyActionType.INVITATION:
+        elif role == CompanyActionType.INVITATION:
             status = 'pending_invite'
         company_detail_with_is_member = CompanyDetailWithIsMemberSchema(
             **CompanyDetailSchema.model_validate(company).dict(), is_member=status
@@ -155,6 +153,7 @@ class CompanyService:
     async def delete_company(self, company_id: UUID, current_user: UserDetail) -> None:
         await self._company_exists_and_user_has_permission(company_id, current_user, self._user_has_delete_permission)
         await self._company_repository.delete_company_by_id_and_commit(company_id)
+        await self._company_action_repository.delete_cached_company_roles(company_id)
 
     async def get_user_role_in_company(
         self, company_id: UUID, user_id: UUID
@@ -162,14 +161,14 @@ class CompanyService:
         company = await self.check_company_exists(company_id)
         if company.owner_id == user_id:
             return 'owner'
-        action = await self._company_action_repository.get_by_company_and_user(company_id, user_id)
-        if action is None:
+        role = await self._company_action_repository.get_cached_role(company_id, user_id)
+        if role is None:
             if company.hidden:
                 raise CompanyNotFoundException(company_id)
             return 'none'
-        if action.type == CompanyActionType.MEMBERSHIP:
+        if role == CompanyActionType.MEMBERSHIP:
             return 'member'
-        if action.type == CompanyActionType.ADMIN:
+        if role == CompanyActionType.ADMIN:
             return 'admin'
         return 'none'
 
@@ -312,8 +311,6 @@ class CompanyService:
 
     async def get_companies_user_is_part_of(self, user_id: UUID) -> CompanyListSchema:
         companies = await self._company_action_repository.get_companies_user_is_part_of(user_id)
-        for company in companies:
-            company.owner = await company.awaitable_attrs.owner
         return CompanyListSchema(
             companies=[CompanySchema.model_validate(company) for company in companies], total_count=len(companies)
         )
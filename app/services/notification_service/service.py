@@ -33,8 +33,8 @@ class NotificationService:
         members = await self._company_action_respository.get_users_related_to_company(
             company_id, CompanyActionType.MEMBERSHIP
         )
-        for member in members:
-            await self.send_notification_to_user(member.id, title, body)
+        async with self._notification_repository.unit():
+            await self._notification_repository.create_notifications([member.id for member in members], title, body)
 
     async def read_notification(self, notification_id: UUID, user_id: UUID) -> NotificationSchema:
         notification = await self._notification_repository.get_notification_by_id(notification_id)
@@ -0,0 +1,63 @@
+import datetime
+from collections.abc import Sequence
+from uuid import UUID
+
+from sqlalchemy import Row
+
+from app.db.models import Answer, Question
+from app.schemas.quizz_schema import AnswerDistributionSchema, QuestionAnalyticsSchema, QuizzAnalyticsSchema
+
+
+def _rate(count: int, total: int) -> float:
+    return count / total if total else 0
+
+
+def build_quizz_analytics(
+    quizz_id: UUID,
+    questions: Sequence[Question],
+    answers: Sequence[Answer],
+    attempt_groups: Row,
+    question_stats: Sequence[Row],
+    choice_counts: Sequence[Row],
+    now: datetime.datetime,
+) -> QuizzAnalyticsSchema:
+    """Combines aggregates computed by the database, attempts which skipped a question count as incorrect."""
+    stats_by_question = {row.question_id: row for row in question_stats}
+    counts_by_answer = dict(choice_counts)
+    answers_by_question: dict[UUID, list[Answer]] = {question.id: [] for question in questions}
+    for answer in answers:
+        answers_by_question[answer.question_id].append(answer)
+
+    analytics = QuizzAnalyticsSchema(quizz_id=quizz_id, attempts=attempt_groups.total, computed_at=now, questions=[])
+    for question in questions:
+        stats = stats_by_question.get(question.id)
+        responses = stats.responses if stats else 0
+        discrimination_index = None
+        if attempt_groups.upper and attempt_groups.lower:
+            discrimination_index = _rate(stats.upper_correct if stats else 0, attempt_groups.upper) - _rate(
+                stats.lower_correct if stats else 0, attempt_groups.lower
+            )
+        # editing an answer changes the question as much as editing its text
+        last_edited_at = max([question.updated_at, *(answer.updated_at for answer in answers_by_question[question.id])])
+        analytics.questions.append(
+            QuestionAnalyticsSchema(
+                question_id=question.id,
+                text=question.text,
+                responses=responses,
+                correct_rate=_rate(stats.correct if stats else 0, attempt_groups.total),
+                discrimination_index=discrimination_index,
+                last_edited_at=last_edited_at,
+                seconds_since_edit=(now - last_edited_at).total_seconds(),
+                answers=[
+                    AnswerDistributionSchema(
+                        answer_id=answer.id,
+                        text=answer.text,
+                        is_correct=answer.is_correct,
+                        count=counts_by_answer.get(answer.id, 0),
+                        share=_rate(counts_by_answer.get(answer.id, 0), responses),
+                    )
+                    for answer in answers_by_question[question.id]
+                ],
+            )
+        )
+    return analytics
@@ -0,0 +1,92 @@
+"""Recomputes scores of past quizz results after the answer key of the quizz changed.
+
+Runs as a background task with its own session. Results are scored with ScoringEngine in chunks,
+each chunk is a short transaction followed by a pause, so live traffic keeps its share of the database.
+Progress is kept in redis and written under the lock of the chunk, a newer run for the same quizz supersedes
+the running one. Chunks also copy the new answer key to stored answer choices, analytics are computed from them.
+"""
+
+import asyncio
+import datetime
+from uuid import UUID, uuid4
+
+from app.core.config import settings
+from app.db.db import async_session
+from app.repositories.quizz_repository import QuizzRepository
+from app.services.quizz_service.scoring import ScoringEngine
+from app.utils.logging import logger
+
+
+async def rescore_quizz(
+    quizz_id: UUID,
+    chunk_size: int = settings.RESCORE_CHUNK_SIZE,
+    pause_seconds: float = settings.RESCORE_PAUSE_SECONDS,
+) -> None:
+    run_id = uuid4().hex
+    async with async_session() as session:
+        quizz_repository = QuizzRepository(session)
+        # run id is switched under the lock chunks are written with, so once a newer run starts
+        # no chunk of an older one can be committed after it
+        await quizz_repository.lock_quizz_rescoring(quizz_id)
+        engine = ScoringEngine(await quizz_repository.get_quizz_answers(quizz_id))
+        results = await quizz_repository.get_rescorable_results(quizz_id)
+        await quizz_repository.set_rescore_progress(
+            quizz_id,
+            run_id=run_id,
+            status='running',
+            total=len(results),
+            processed=0,
+            updated=0,
+            started_at=datetime.datetime.now().isoformat(),  # noqa: DTZ005
+            finished_at='',
+        )
+        await quizz_repository.commit()
+
+        updated = 0
+        try:
+            for start in range(0, len(results), chunk_size):
+                chunk = results[start : start + chunk_size]
+                if not await _is_current_run(quizz_repository, quizz_id, run_id):
+                    logger.info('Rescoring of quizz %s superseded by a newer run', quizz_id)
+                    await session.rollback()
+                    return
+                result_ids = [result.id for result in chunk]
+                answer_ids = await quizz_repository.get_results_answer_ids(result_ids)
+                scores = engine.score(engine.encode_answer_ids([answer_ids[result_id] for result_id in result_ids]))
+                changed = {result.id: score for result, score in zip(chunk, scores.tolist()) if score != result.score}
+                await quizz_repository.update_result_scores(changed)
+                await quizz_repository.update_answer_choices_correctness(result_ids)
+
+                updated += len(changed)
+                await quizz_repository.set_rescore_progress(quizz_id, processed=start + len(chunk), updated=updated)
+                await quizz_repository.commit()
+                await asyncio.sleep(pause_seconds)
+        except Exception:
+            logger.exception('Rescoring of quizz %s failed', quizz_id)
+            await session.rollback()
+            await _finish_run(quizz_repository, quizz_id, run_id, status='failed')
+            raise
+
+        # rendered responses and analytics embed scores
+        await quizz_repository.delete_cached_response_views(quizz_id)
+        await _finish_run(
+            quizz_repository,
+            quizz_id,
+            run_id,
+            status='done',
+            finished_at=datetime.datetime.now().isoformat(),  # noqa: DTZ005
+        )
+        logger.info('Rescored %s results of quizz %s, %s changed', len(results), quizz_id, updated)
+
+
+async def _is_current_run(quizz_repository: QuizzRepository, quizz_id: UUID, run_id: str) -> bool:
+    """Takes the rescoring lock, progress written before the commit can not overwrite one of a newer run."""
+    await quizz_repository.lock_quizz_rescoring(quizz_id)
+    progress = await quizz_repository.get_rescore_progress(quizz_id)
+    return progress.get(b'run_id') == run_id.encode()
+
+
+async def _finish_run(quizz_repository: QuizzRepository, quizz_id: UUID, run_id: str, **fields: str) -> None:
+    if await _is_current_run(quizz_repository, quizz_id, run_id):
+        await quizz_repository.set_rescore_progress(quizz_id, **fields)
+    await quizz_repository.commit()
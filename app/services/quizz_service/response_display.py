@@ -0,0 +1,65 @@
+import json
+from typing import NamedTuple, Union
+from uuid import UUID
+
+from app.schemas.quizz_schema import (
+    ChoosenAnswerDisplaySchema,
+    QuestionResultDisplaySchema,
+    QuizzDetailResultSchema,
+    QuizzResultDisplayWithUserSchema,
+    QuizzSchema,
+)
+
+
+class ResponseLookups(NamedTuple):
+    """Everything needed to display a batch of cached responses, fetched up front with batched queries."""
+
+    quizz_titles: dict[UUID, str]
+    question_texts: dict[UUID, str]
+    answer_texts: dict[UUID, str]
+    # latest score by (user_id, quizz_id)
+    scores: dict[tuple[UUID, UUID], int]
+    user_emails: dict[UUID, str]
+
+
+def lookups_from_quizz(
+    quizz: QuizzSchema, scores: dict[tuple[UUID, UUID], int], user_emails: dict[UUID, str]
+) -> ResponseLookups:
+    return ResponseLookups(
+        quizz_titles={quizz.id: quizz.title},
+        question_texts={question.id: question.text for question in quizz.questions},
+        answer_texts={answer.id: answer.text for question in quizz.questions for answer in question.answers},
+        scores=scores,
+        user_emails=user_emails,
+    )
+
+
+def render_response(
+    response: QuizzDetailResultSchema, lookups: ResponseLookups
+) -> Union[QuizzResultDisplayWithUserSchema, None]:
+    """Returns None when quizz, result or user no longer exist, cached responses outlive them until ttl expires."""
+    score = lookups.scores.get((response.user_id, response.quizz_id))
+    user_email = lookups.user_emails.get(response.user_id)
+    if score is None or user_email is None:
+        return None
+
+    result_display = QuizzResultDisplayWithUserSchema(score=score, user_email=user_email, questions=[])
+    for question in response.questions:
+        if question.question_id not in lookups.question_texts:
+            continue
+        choosen_answers = [
+            ChoosenAnswerDisplaySchema(text=lookups.answer_texts[answer.answer_id], is_correct=answer.is_correct)
+            for answer in question.choosen_answers
+            if answer.answer_id in lookups.answer_texts
+        ]
+        result_display.questions.append(
+            QuestionResultDisplaySchema(
+                text=lookups.question_texts[question.question_id], choosen_answers=choosen_answers
+            )
+        )
+    return result_display
+
+
+def with_user_email(view: bytes, user_email: str) -> bytes:
+    """Adds email to a response rendered without it, emails are not cached since users can change them."""
+    return b'{"user_email":' + json.dumps(user_email).encode() + b',' + view[1:]
@@ -0,0 +1,95 @@
+"""Batch scoring of quizz submissions with boolean matrices.
+
+Applies the same rules as QuizzService.evaluate_quizz to many submissions at once:
+a question gives choosen correct answers / all correct answers, nothing when any wrong answer was choosen,
+quizz score is floor of average question credit in percent, questions left out count as 0.
+"""
+
+from collections.abc import Iterable, Sequence
+from uuid import UUID
+
+import numpy as np
+
+from app.db.models import Answer
+from app.schemas.quizz_schema import QuizzCompletionSchema, QuizzDetailResultSchema
+from app.services.quizz_service.exceptions import QuizzNotFound
+
+
+class ScoringEngine:
+    """Answer key of a quizz, columns of submission matrices are its answers in the order they were given."""
+
+    def __init__(self, answers: Sequence[Answer]) -> None:
+        self._column_by_answer = {answer.id: column for column, answer in enumerate(answers)}
+        question_ids = list(dict.fromkeys(answer.question_id for answer in answers))
+        self._row_by_question = {question_id: row for row, question_id in enumerate(question_ids)}
+        self.is_correct = np.array([answer.is_correct for answer in answers], dtype=bool)
+        # answers x questions, sums choices of each question with one matrix product
+        self.question_of_answer = np.zeros((len(answers), len(question_ids)), dtype=np.int32)
+        self.question_of_answer[
+            np.arange(len(answers)), [self._row_by_question[answer.question_id] for answer in answers]
+        ] = 1
+        self.correct_counts = self.is_correct.astype(np.int32) @ self.question_of_answer
+
+    @property
+    def question_count(self) -> int:
+        return len(self._row_by_question)
+
+    def encode_completions(self, completions: Sequence[QuizzCompletionSchema]) -> np.ndarray:
+        """Submissions x answers matrix of choices, raises QuizzNotFound like QuizzService.evaluate_quizz does."""
+        choices = np.zeros((len(completions), len(self._column_by_answer)), dtype=bool)
+        for row, completion in enumerate(completions):
+            for question in completion.questions:
+                if question.question_id not in self._row_by_question:
+                    raise QuizzNotFound('Question')
+                columns = [self._column_by_answer.get(answer_id) for answer_id in question.answer_ids]
+                if None in columns or any(
+                    not self.question_of_answer[column, self._row_by_question[question.question_id]]
+                    for column in columns
+                ):
+                    raise QuizzNotFound('Answer')
+                choices[row, columns] = True
+        return choices
+
+    def encode_responses(self, responses: Sequence[QuizzDetailResultSchema]) -> np.ndarray:
+        """Submissions x answers matrix of stored attempts, answers deleted since then are left out."""
+        return self.encode_answer_ids(
+            [
+                [answer.answer_id for question in response.questions for answer in question.choosen_answers]
+                for response in responses
+            ]
+        )
+
+    def encode_answer_ids(self, submissions: Sequence[Iterable[UUID]]) -> np.ndarray:
+        """Submissions x answers matrix from choosen answer ids, unknown ids are left out."""
+        choices = np.zeros((len(submissions), len(self._column_by_answer)), dtype=bool)
+        for row, answer_ids in enumerate(submissions):
+            columns = [
+                self._column_by_answer[answer_id] for answer_id in answer_ids if answer_id in self._column_by_answer
+            ]
+            choices[row, columns] = True
+        return choices
+
+    def question_credits(self, choices: np.ndarray) -> np.ndarray:
+        """Submissions x questions matrix of credit between 0 and 1."""
+        correct = (choices & self.is_correct).astype(np.int32) @ self.question_of_answer
+        wrong = (choices & ~self.is_correct).astype(np.int32) @ self.question_of_answer
+        # every question has a correct answer, maximum only keeps division defined for broken data
+        return np.where(wrong > 0, 0.0, correct / np.maximum(self.correct_counts, 1))
+
+    def score(self, choices: np.ndarray) -> np.ndarray:
+        """Score in percent for each submission."""
+        if not self.question_count:
+            return np.zeros(len(choices), dtype=np.int64)
+        # credits are added one question after another like evaluate_quizz does, so rounding matches it
+        totals = np.cumsum(self.question_credits(choices) / self.question_count, axis=1)[:, -1]
+        return np.floor(totals * 100).astype(np.int64)
+
+
+def score_completions(answers: Sequence[Answer], completions: Iterable[QuizzCompletionSchema]) -> list[int]:
+    engine = ScoringEngine(answers)
+    return engine.score(engine.encode_completions(list(completions))).tolist()
+
+
+def score_responses(answers: Sequence[Answer], responses: Iterable[QuizzDetailResultSchema]) -> list[int]:
+    engine = ScoringEngine(answers)
+    return engine.score(engine.encode_responses(list(responses))).tolist()
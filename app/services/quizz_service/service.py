@@ -1,15 +1,19 @@
 import csv
 import datetime
 import io
+from collections import defaultdict
+from collections.abc import AsyncIterator, Sequence
 from math import floor
+from typing import Optional
 from uuid import UUID
 
 import openpyxl
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.models import Answer, Question
 from app.repositories.company_repository import CompanyRepository
-from app.repositories.quizz_repository import QuizzRepository
+from app.repositories.quizz_repository import RESPONSES_CHUNK_SIZE, QuizzRepository
 from app.repositories.user_repository import UserRepository
 from app.schemas.quizz_schema import (
     AnswerCreateSchema,
@@ -26,12 +30,12 @@ from app.schemas.quizz_schema import (
     QuestionSchema,
     QuestionUpdateSchema,
     QuestionWithCorrectAnswerSchema,
+    QuizzAnalyticsSchema,
     QuizzCompletionSchema,
     QuizzCreateSchema,
     QuizzDetailResultSchema,
     QuizzListSchema,
     QuizzResultAnalyticsListSchema,
-    QuizzResultDisplaySchema,
     QuizzResultDisplayWithUserSchema,
     QuizzResultListDisplaySchema,
     QuizzResultSchema,
@@ -43,10 +47,21 @@ from app.schemas.quizz_schema import (
     QuizzUpdateSchema,
     QuizzWithCorrectAnswersSchema,
     QuizzWithNoQuestionsSchema,
+    RescoreProgressSchema,
 )
 from app.schemas.user_shema import UserDetail, UserSchema
 from app.services.notification_service import NotificationService
+from app.services.quizz_service.analytics import build_quizz_analytics
 from app.services.quizz_service.exceptions import QuizzError, QuizzNotFound
+from app.services.quizz_service.response_display import (
+    ResponseLookups,
+    lookups_from_quizz,
+    render_response,
+    with_user_email,
+)
+from app.utils.csv_stream import CsvChunkWriter
+from app.utils.instrumentation import timing_span
+from app.utils.pagination import CountMode, decode_cursor, next_page_cursor
 
 
 class QuizzService:
@@ -105,7 +120,8 @@ class QuizzService:
             for answer_data in question_data.answers:
                 await self._quizz_repository.create_answer(**answer_data.model_dump(), question_id=question.id)
 
-    async def add_answer_to_question(self, quizz_id: UUID, question_id: UUID, answer_data: AnswerCreateSchema) -> None:
+    async def add_answer_to_question(self, quizz_id: UUID, question_id: UUID, answer_data: AnswerCreateSchema) -> bool:
+        """Returns whether the answer key changed, a new correct answer changes the credit of the question."""
         question = await self._quizz_repository.get_question(question_id)
         if question.quizz_id != quizz_id:
             raise QuizzNotFound('Question')
@@ -113,6 +129,7 @@ class QuizzService:
             raise QuizzError('Question can have max 4 answers')
         async with self._quizz_repository.unit():
             await self._quizz_repository.create_answer(**answer_data.model_dump(), question_id=question_id)
+        return answer_data.is_correct
 
     async def get_quizz(self, quizz_id: UUID) -> QuizzWithNoQuestionsSchema:
         quizz = await self._quizz_repository.get_quizz(quizz_id)
@@ -121,11 +138,20 @@ class QuizzService:
         return QuizzWithNoQuestionsSchema.model_validate(quizz)
 
     async def fetch_quizz_questions(self, quizz_without_questions: QuizzWithNoQuestionsSchema) -> QuizzSchema:
-        quizz = QuizzSchema(**quizz_without_questions.model_dump(), questions=[])
-        questions = await self._quizz_repository.get_quizz_questions(quizz.id)
+        questions = await self._quizz_repository.get_quizz_questions(quizz_without_questions.id)
+        answers_by_question = await self._get_quizz_answers_by_question(quizz_without_questions.id)
+        return self._build_quizz_questions(quizz_without_questions, questions, answers_by_question)
+
+    def _build_quizz_questions(
+        self,
+        quizz_without_questions: QuizzWithNoQuestionsSchema,
+        questions: Sequence[Question],
+        answers_by_question: dict[UUID, list[Answer]],
+    ) -> QuizzSchema:
+        quizz = QuizzSchema(**quizz_without_questions.model_dump(exclude={'questions'}), questions=[])
         for question in questions:
             question_schema = QuestionSchema(id=question.id, text=question.text, answers=[], multiple=False)
-            answers = await self._quizz_repository.get_question_answers(question.id)
+            answers = answers_by_question[question.id]
             if len(list(filter(lambda answer: answer.is_correct, answers))) > 1:
                 question_schema.multiple = True
             question_schema.answers = [AnswerSchema.model_validate(answer) for answer in answers]
@@ -135,37 +161,54 @@ class QuizzService:
     async def fetch_quizz_questions_with_correct_answers(
         self, quizz_without_questions: QuizzWithNoQuestionsSchema
     ) -> QuizzWithCorrectAnswersSchema:
-        quizz = QuizzSchema(**quizz_without_questions.model_dump(), questions=[])
+        quizz = QuizzSchema(**quizz_without_questions.model_dump(exclude={'questions'}), questions=[])
         questions = await self._quizz_repository.get_quizz_questions(quizz.id)
+        answers_by_question = await self._get_quizz_answers_by_question(quizz.id)
         for question in questions:
             question_schema = QuestionWithCorrectAnswerSchema(id=question.id, text=question.text, answers=[])
-            answers = await self._quizz_repository.get_question_answers(question.id)
+            answers = answers_by_question[question.id]
             question_schema.answers = [AnswerWithCorrectSchema.model_validate(answer) for answer in answers]
             quizz.questions.append(question_schema)
         return quizz
 
-    async def get_company_quizzes(self, company_id: UUID, page: int, limit: int) -> QuizzListSchema:
+    async def _get_quizz_answers_by_question(self, quizz_id: UUID) -> dict[UUID, list[Answer]]:
+        answers_by_question: dict[UUID, list[Answer]] = defaultdict(list)
+        for answer in await self._quizz_repository.get_quizz_answers(quizz_id):
+            answers_by_question[answer.question_id].append(answer)
+        return answers_by_question
+
+    async def get_company_quizzes(
+        self, company_id: UUID, page: int, limit: int, cursor: Optional[str] = None, count_mode: CountMode = 'exact'
+    ) -> QuizzListSchema:
         offset = (page - 1) * limit
-        quizzes = await self._quizz_repository.get_company_quizzes(company_id, offset, limit)
+        after = decode_cursor(cursor) if cursor else None
+        quizzes, count, count_mode = await self._quizz_repository.get_company_quizzes_with_count(
+            company_id, offset, limit, after, count_mode
+        )
         return QuizzListSchema(
             quizzes=[QuizzWithNoQuestionsSchema.model_validate(quizz) for quizz in quizzes],
-            total_count=await self._quizz_repository.get_company_quizzes_count(company_id),
+            total_count=count,
+            next_cursor=next_page_cursor(quizzes, limit),
+            count_mode=count_mode,
         )
 
     async def delete_quizz(self, quizz_id: UUID) -> None:
         await self._quizz_repository.delete_quizz_and_commit(quizz_id)
+        await self._quizz_repository.delete_cached_response_views(quizz_id)
 
     async def delete_question(self, question_id: UUID, quizz_id: UUID) -> None:
         if await self._quizz_repository.get_quizz_questions_count(quizz_id) < 2:
             raise QuizzError('Cannot delete last question')
-        question = await self._quizz_repository.delete_question_and_commit(question_id)
+        question = await self._quizz_repository.get_question(question_id)
         if not question:
             raise QuizzNotFound('Question')
         if question.quizz_id != quizz_id:
             raise QuizzNotFound()
         await self._quizz_repository.delete_question_and_commit(question_id)
+        await self._quizz_repository.delete_cached_response_views(quizz_id)
 
-    async def delete_answer(self, answer_id: UUID, quizz_id: UUID) -> None:
+    async def delete_answer(self, answer_id: UUID, quizz_id: UUID) -> bool:
+        """Returns whether the answer key changed, which is always the case as choices of the answer stop counting."""
         answer = await self._quizz_repository.get_answer(answer_id)
         if not answer:
             raise QuizzNotFound('Answer')
@@ -180,6 +223,8 @@ class QuizzService:
         if question.quizz_id != quizz_id:
             raise QuizzNotFound()
         await self._quizz_repository.delete_answer_and_commit(answer_id)
+        await self._quizz_repository.delete_cached_response_views(quizz_id)
+        return True
 
     async def update_quizz(self, quizz_id: UUID, quizz_data: QuizzUpdateSchema) -> QuizzWithNoQuestionsSchema:
         quizz = await self._quizz_repository.get_quizz(quizz_id)
@@ -197,8 +242,10 @@ class QuizzService:
             raise QuizzNotFound('Question')
         async with self._quizz_repository.unit():
             await self._quizz_repository.update_question(question, question_data)
+        await self._quizz_repository.delete_cached_response_views(quizz_id)
 
-    async def update_answer(self, answer_id: UUID, quizz_id: UUID, answer_data: AnswerUpdateSchema) -> None:
+    async def update_answer(self, answer_id: UUID, quizz_id: UUID, answer_data: AnswerUpdateSchema) -> bool:
+        """Returns whether the answer key changed, scores of past results then need rescoring."""
         answer = await self._quizz_repository.get_answer(answer_id)
         if not answer:
             raise QuizzNotFound('Answer')
@@ -210,27 +257,23 @@ class QuizzService:
             correct_answers = [answer for answer in answers if answer.is_correct]
             if len(correct_answers) < 2:
                 raise QuizzError('Question must have at least one correct answers')
+        key_changed = answer.is_correct != answer_data.is_correct
         async with self._quizz_repository.unit():
             await self._quizz_repository.update_answer(answer, answer_data)
+        await self._quizz_repository.delete_cached_response_views(quizz_id)
+        return key_changed
 
-    async def evaluate_question(
-        self, quizz_id: UUID, question_data: QuestionCompletionSchema
+    def _score_question(
+        self, answers: list[Answer], question_data: QuestionCompletionSchema
     ) -> tuple[float, QuestionResultSchema]:
-        question = await self._quizz_repository.get_question(question_data.question_id)
-        if not question:
-            raise QuizzNotFound('Question')
-        if question.quizz_id != quizz_id:
-            raise QuizzNotFound('Question')
-        answers = await self._quizz_repository.get_question_answers(question.id)
+        answers_by_ids = {answer.id: answer for answer in answers}
         correct_answers_count = len([answer for answer in answers if answer.is_correct])
         correct_responses = 0
-        result = QuestionResultSchema(question_id=question.id, choosen_answers=[])
+        result = QuestionResultSchema(question_id=question_data.question_id, choosen_answers=[])
         for answer_id in question_data.answer_ids:
-            answer = await self._quizz_repository.get_answer(answer_id)
+            answer = answers_by_ids.get(answer_id)
             if not answer:
                 raise QuizzNotFound('Answer')
-            if answer.question_id != question.id:
-                raise QuizzNotFound('Answer')
             if answer.is_correct:
                 result.choosen_answers.append(ChoosenAnswerSchema(is_correct=True, answer_id=answer.id))
                 correct_responses += 1
@@ -246,12 +289,17 @@ class QuizzService:
     async def evaluate_quizz(
         self, quizz: QuizzWithNoQuestionsSchema, data: QuizzCompletionSchema, user: UserDetail
     ) -> QuizzResultSchema:
-        question_count = await self._quizz_repository.get_quizz_questions_count(data.quizz_id)
+        # questions and answers are loaded once, for scoring and for rendering the cached view
+        questions = await self._quizz_repository.get_quizz_questions(data.quizz_id)
         score = 0
         asssesment = QuizzDetailResultSchema(quizz_id=quizz.id, user_id=user.id, questions=[])
+        # answers of all questions in one query, questions of other quizzes have none here
+        answers_by_question = await self._get_quizz_answers_by_question(data.quizz_id)
         for question in data.questions:
-            question_score, question_result = await self.evaluate_question(data.quizz_id, question)
-            score += question_score / question_count
+            if question.question_id not in answers_by_question:
+                raise QuizzNotFound('Question')
+            question_score, question_result = self._score_question(answers_by_question[question.question_id], question)
+            score += question_score / len(questions)
             asssesment.questions.append(question_result)
         result = await self._quizz_repository.create_quizz_result(
             user_id=user.id,
@@ -259,13 +307,25 @@ class QuizzService:
             company_id=quizz.company_id,
             score=floor(score * 100),
         )
+        await self._quizz_repository.create_answer_choices(result.id, asssesment)
         await self._quizz_repository.commit()
-        await self._quizz_repository.delete_cached_quizz_for_user(user.id, data.quizz_id)
-        await self._quizz_repository.cache_quizz_result(
-            user_id=user.id, company_id=quizz.company_id, quizz_id=data.quizz_id, data=asssesment
+        quizz_with_questions = self._build_quizz_questions(quizz, questions, answers_by_question)
+        view = self._render_response_view(quizz_with_questions, asssesment, result.score, user.email)
+        await self._quizz_repository.replace_cached_attempt(
+            user_id=user.id, company_id=quizz.company_id, quizz_id=data.quizz_id, data=asssesment, view=view
         )
         return QuizzResultSchema(score=result.score)
 
+    def _render_response_view(
+        self, quizz: QuizzSchema, response: QuizzDetailResultSchema, score: int, user_email: str
+    ) -> bytes:
+        lookups = lookups_from_quizz(
+            quizz,
+            scores={(response.user_id, quizz.id): score},
+            user_emails={response.user_id: user_email},
+        )
+        return render_response(response, lookups).model_dump_json(exclude={'user_email'}).encode()
+
     async def get_average_score_by_company(self, company_id: UUID) -> QuizzResultSchema:
         return QuizzResultSchema(score=await self._quizz_repository.get_average_score_by_company(company_id))
 
@@ -364,6 +424,34 @@ class QuizzService:
     async def get_average_score_by_quizz(self, quizz_id: UUID) -> QuizzResultSchema:
         return QuizzResultSchema(score=await self._quizz_repository.get_average_score_by_quizz(quizz_id))
 
+    async def get_quizz_analytics(self, quizz_id: UUID) -> QuizzAnalyticsSchema:
+        """Per question statistics, aggregated by the database from stored answer choices."""
+        return build_quizz_analytics(
+            quizz_id,
+            questions=await self._quizz_repository.get_quizz_questions(quizz_id),
+            answers=await self._quizz_repository.get_quizz_answers(quizz_id),
+            attempt_groups=await self._quizz_repository.get_quizz_attempt_groups(quizz_id),
+            question_stats=await self._quizz_repository.get_quizz_question_stats(quizz_id),
+            choice_counts=await self._quizz_repository.get_quizz_answer_choice_counts(quizz_id),
+            now=datetime.datetime.now(),  # noqa: DTZ005
+        )
+
+    async def get_quizz_analytics_view(self, quizz_id: UUID) -> bytes:
+        """Analytics as JSON, recomputed once cached ones expire so frequent refreshes stay cheap."""
+        view = await self._quizz_repository.get_cached_analytics(quizz_id)
+        if view is None:
+            view = (await self.get_quizz_analytics(quizz_id)).model_dump_json().encode()
+            await self._quizz_repository.cache_analytics(quizz_id, view)
+        return view
+
+    async def get_rescore_progress(self, quizz_id: UUID) -> RescoreProgressSchema:
+        progress = await self._quizz_repository.get_rescore_progress(quizz_id)
+        if not progress:
+            raise QuizzNotFound('Rescoring')
+        return RescoreProgressSchema.model_validate(
+            {field.decode(): value.decode() or None for field, value in progress.items()}
+        )
+
     async def get_quizz_response_displayed(self, response: QuizzDetailResultSchema) -> QuizzResultDisplayWithUserSchema:
         quizz = await self.get_quizz(response.quizz_id)
         quizz = await self.fetch_quizz_questions(quizz)
@@ -390,14 +478,34 @@ class QuizzService:
 
         return result_display
 
-    async def get_cached_user_response_json(self, user_id: UUID, quizz_id: UUID) -> QuizzResultDisplaySchema:
-        result = await self._quizz_repository.get_user_quizz_response_from_cache(user_id, quizz_id)
+    async def get_cached_user_response_json(self, user_id: UUID, quizz_id: UUID) -> QuizzResultDisplayWithUserSchema:
+        result = await self._quizz_repository.get_user_quizz_response(user_id, quizz_id)
         if result is None:
             raise QuizzNotFound('User response')
         return await self.get_quizz_response_displayed(result)
 
+    async def get_cached_user_response_view(
+        self, user_id: UUID, quizz_id: UUID, user_email: Optional[str] = None
+    ) -> bytes:
+        """Rendered response as JSON, rendered from cached answers and stored on miss.
+
+        Stored view has no email, the current one is added on every read. Pass it when the user is already loaded.
+        """
+        view = await self._quizz_repository.get_cached_response_view(user_id, quizz_id)
+        if view is None:
+            response = await self.get_cached_user_response_json(user_id, quizz_id)
+            view = response.model_dump_json(exclude={'user_email'}).encode()
+            await self._quizz_repository.cache_response_view(user_id, quizz_id, view)
+            return with_user_email(view, response.user_email)
+        if user_email is None:
+            user = await self._user_repository.get_user_by_id(user_id)
+            if user is None:
+                raise QuizzNotFound('User response')
+            user_email = user.email
+        return with_user_email(view, user_email)
+
     async def get_cached_user_response_csv(self, user_id: UUID, quizz_id: UUID) -> str:
-        response = await self._quizz_repository.get_user_quizz_response_from_cache(user_id, quizz_id)
+        response = await self._quizz_repository.get_user_quizz_response(user_id, quizz_id)
         if response is None:
             raise QuizzNotFound('User response')
 
@@ -420,95 +528,137 @@ class QuizzService:
     async def get_cached_users_responses_json(
         self, users: list[UserSchema], quizz_id: UUID
     ) -> QuizzResultListDisplaySchema:
-        list_ = QuizzResultListDisplaySchema(responses=[])
-        for user in users:
-            try:
-                response = await self.get_cached_user_response_json(user.id, quizz_id)
-                list_.responses.append(
-                    QuizzResultDisplayWithUserSchema(
-                        score=response.score, questions=response.questions, user_email=user.email
-                    )
-                )
-            except QuizzNotFound:
-                continue
-        return list_
-
-    async def get_cached_users_responses_csv(self, users: list[UserSchema], quizz_id: UUID) -> str:
-        output = io.StringIO()
-        writter = csv.DictWriter(output, fieldnames=['User', 'Question', 'Answer', 'Is Correct'])
-        writter.writeheader()
-        for user in users:
-            try:
-                response = await self.get_cached_user_response_json(user.id, quizz_id)
+        quizz = await self.fetch_quizz_questions(await self.get_quizz(quizz_id))
+        return QuizzResultListDisplaySchema(responses=await self._render_users_responses(quizz, users))
+
+    async def get_cached_users_responses_csv(
+        self, users: list[UserSchema], quizz_id: UUID, chunk_size: int = RESPONSES_CHUNK_SIZE
+    ) -> AsyncIterator[str]:
+        writter = CsvChunkWriter(['User', 'Question', 'Answer', 'Is Correct'])
+        yield writter.header()
+        quizz = await self.fetch_quizz_questions(await self.get_quizz(quizz_id))
+        # rows of a chunk of users are sent before responses of the next chunk are loaded
+        for start in range(0, len(users), chunk_size):
+            for response in await self._render_users_responses(quizz, users[start : start + chunk_size]):
                 for question in response.questions:
                     for choosen_answer in question.choosen_answers:
                         writter.writerow(
                             {
-                                'User': user.email,
+                                'User': response.user_email,
                                 'Question': question.text,
                                 'Answer': choosen_answer.text,
                                 'Is Correct': choosen_answer.is_correct,
                             }
                         )
-            except QuizzNotFound:
-                continue
-        return output.getvalue()
+            yield writter.drain()
+
+    async def _render_users_responses(
+        self, quizz: QuizzSchema, users: list[UserSchema]
+    ) -> list[QuizzResultDisplayWithUserSchema]:
+        # fixed number of round trips whatever the number of users: one MGET and latest results
+        responses = await self._quizz_repository.get_users_quizz_responses(
+            [user.id for user in users], quizz.company_id, quizz.id
+        )
+        results = await self._quizz_repository.get_latest_quizz_results(
+            {(response.user_id, quizz.id) for response in responses}
+        )
+        lookups = lookups_from_quizz(
+            quizz,
+            scores={(result.user_id, result.quizz_id): result.score for result in results},
+            user_emails={user.id: user.email for user in users},
+        )
+        rendered = (render_response(response, lookups) for response in responses)
+        return [response_displayed for response_displayed in rendered if response_displayed is not None]
 
     async def _user_responses_to_displayed_json(
         self, responses: list[QuizzDetailResultSchema]
     ) -> QuizzResultListDisplaySchema:
+        lookups = await self._get_response_lookups(responses)
         list_ = QuizzResultListDisplaySchema(responses=[])
         for response in responses:
-            list_.responses.append(await self.get_quizz_response_displayed(response))
+            response_displayed = render_response(response, lookups)
+            if response_displayed is not None:
+                list_.responses.append(response_displayed)
         return list_
 
     async def get_user_responses_from_cache_json(self, user_id: UUID) -> QuizzResultListDisplaySchema:
-        responses = await self._quizz_repository.get_user_cached_responses(user_id)
+        responses = await self._quizz_repository.get_user_responses(user_id)
         return await self._user_responses_to_displayed_json(responses)
 
     async def get_user_responses_in_company_from_cache_json(
         self, user_id: UUID, company_id: UUID
     ) -> QuizzResultListDisplaySchema:
-        responses = await self._quizz_repository.get_user_cached_responses_in_company(user_id, company_id)
+        responses = await self._quizz_repository.get_user_responses_in_company(user_id, company_id)
         return await self._user_responses_to_displayed_json(responses)
 
-    async def _user_responses_to_displayed_csv(self, responses: list[QuizzDetailResultSchema]) -> str:
-        output = io.StringIO()
-        writter = csv.DictWriter(output, fieldnames=['Quizz', 'User', 'Question', 'Answer', 'Is Correct'])
-        writter.writeheader()
-        for response in responses:
-            response_displayed = await self.get_quizz_response_displayed(response)
-            for question in response_displayed.questions:
-                for choosen_answer in question.choosen_answers:
-                    writter.writerow(
-                        {
-                            'Quizz': (await self._quizz_repository.get_quizz(response.quizz_id)).title,
-                            'User': response_displayed.user_email,
-                            'Question': question.text,
-                            'Answer': choosen_answer.text,
-                            'Is Correct': choosen_answer.is_correct,
-                        }
-                    )
-        return output.getvalue()
+    async def _get_response_lookups(self, responses: list[QuizzDetailResultSchema]) -> ResponseLookups:
+        quizz_ids = {response.quizz_id for response in responses}
+        question_ids = {question.question_id for response in responses for question in response.questions}
+        answer_ids = {
+            answer.answer_id
+            for response in responses
+            for question in response.questions
+            for answer in question.choosen_answers
+        }
+        user_ids = {response.user_id for response in responses}
+        user_quizz_pairs = {(response.user_id, response.quizz_id) for response in responses}
+
+        quizz_titles = await self._quizz_repository.get_quizz_titles(quizz_ids)
+        question_texts = await self._quizz_repository.get_question_texts(question_ids)
+        answer_texts = await self._quizz_repository.get_answer_texts(answer_ids)
+        results = await self._quizz_repository.get_latest_quizz_results(user_quizz_pairs)
+        users = await self._user_repository.get_users_by_ids(user_ids)
+        return ResponseLookups(
+            quizz_titles=dict(quizz_titles),
+            question_texts=dict(question_texts),
+            answer_texts=dict(answer_texts),
+            scores={(result.user_id, result.quizz_id): result.score for result in results},
+            user_emails={user.id: user.email for user in users},
+        )
+
+    async def _user_responses_to_displayed_csv(
+        self, response_chunks: AsyncIterator[list[QuizzDetailResultSchema]]
+    ) -> AsyncIterator[str]:
+        writter = CsvChunkWriter(['Quizz', 'User', 'Question', 'Answer', 'Is Correct'])
+        yield writter.header()
+        async for responses in response_chunks:
+            lookups = await self._get_response_lookups(responses)
+            for response in responses:
+                response_displayed = render_response(response, lookups)
+                if response_displayed is None:
+                    continue
+                for question in response_displayed.questions:
+                    for choosen_answer in question.choosen_answers:
+                        writter.writerow(
+                            {
+                                'Quizz': lookups.quizz_titles[response.quizz_id],
+                                'User': response_displayed.user_email,
+                                'Question': question.text,
+                                'Answer': choosen_answer.text,
+                                'Is Correct': choosen_answer.is_correct,
+                            }
+                        )
+            yield writter.drain()
 
-    async def get_user_responses_from_cache_csv(self, user_id: UUID) -> str:
-        responses = await self._quizz_repository.get_user_cached_responses(user_id)
-        return await self._user_responses_to_displayed_csv(responses)
+    def get_user_responses_from_cache_csv(self, user_id: UUID) -> AsyncIterator[str]:
+        responses = self._quizz_repository.iter_user_responses(user_id)
+        return self._user_responses_to_displayed_csv(responses)
 
-    async def get_user_responses_in_company_from_cache_csv(self, user_id: UUID, company_id: UUID) -> str:
-        responses = await self._quizz_repository.get_user_cached_responses_in_company(user_id, company_id)
-        return await self._user_responses_to_displayed_csv(responses)
+    def get_user_responses_in_company_from_cache_csv(self, user_id: UUID, company_id: UUID) -> AsyncIterator[str]:
+        responses = self._quizz_repository.iter_user_responses_in_company(user_id, company_id)
+        return self._user_responses_to_displayed_csv(responses)
 
     async def get_company_members_responses_from_cache_json(self, company_id: UUID) -> QuizzResultListDisplaySchema:
         responses = await self._quizz_repository.get_company_members_responses(company_id)
         return await self._user_responses_to_displayed_json(responses)
 
-    async def get_company_members_responses_from_cache_csv(self, company_id: UUID) -> str:
-        responses = await self._quizz_repository.get_company_members_responses(company_id)
-        return await self._user_responses_to_displayed_csv(responses)
+    def get_company_members_responses_from_cache_csv(self, company_id: UUID) -> AsyncIterator[str]:
+        responses = self._quizz_repository.iter_company_members_responses(company_id)
+        return self._user_responses_to_displayed_csv(responses)
 
     def get_schema_from_excel(self, file: bytes, company_id: UUID) -> QuizzCreateSchema:
-        workbook = openpyxl.load_workbook(io.BytesIO(file))
+        with timing_span('excel'):
+            workbook = openpyxl.load_workbook(io.BytesIO(file))
         ws = workbook.active
 
         excel_quizz_prolog = ['QUIZZ TITLE:', 'QUIZZ DESCRIPTION:', 'QUIZZ FREQUENCY:', 'QUESTION:']
@@ -553,11 +703,14 @@ class QuizzService:
         except ValidationError as e:
             raise QuizzError(e.errors()[0]['msg'])
 
-    async def create_or_update_quizz(self, quizz_schema: QuizzCreateSchema) -> QuizzSchema:
+    async def create_or_update_quizz(self, quizz_schema: QuizzCreateSchema) -> tuple[QuizzSchema, bool]:
+        """Returns the quizz and whether the answer key of an existing one changed, like update_answer does."""
         quizz = await self._quizz_repository.get_quizz_by_company_and_title(quizz_schema.company_id, quizz_schema.title)
 
         if not quizz:
-            return await self.create_quizz(quizz_schema, quizz_schema.company_id)
+            return await self.create_quizz(quizz_schema, quizz_schema.company_id), False
+
+        key_changed = False
 
         async with self._quizz_repository.unit():
             await self._quizz_repository.update_quizz(
@@ -566,40 +719,40 @@ class QuizzService:
                     title=quizz_schema.title, description=quizz_schema.description, frequency=quizz_schema.frequency
                 ),
             )
-            quizz_questions = await self._quizz_repository.get_quizz_questions(quizz.id)
-            new_questions_text = [question.text for question in quizz_schema.questions]
-
-            for question in quizz_questions:
-                if question.text not in new_questions_text:
-                    await self.delete_question(question.id)
+            # whole quizz is loaded and changed in a fixed number of statements, whatever its size
+            questions = await self._quizz_repository.get_quizz_questions(quizz.id)
+            answers_by_question = await self._get_quizz_answers_by_question(quizz.id)
+            imported_questions_text = {question.text for question in quizz_schema.questions}
+            await self._quizz_repository.delete_questions(
+                [question.id for question in questions if question.text not in imported_questions_text]
+            )
 
+            questions_by_text = {question.text: question for question in questions}
+            new_questions, new_answers, removed_answer_ids = [], [], []
             for question_schema in quizz_schema.questions:
-                question = await self._quizz_repository.get_question_by_quizz_and_text(quizz.id, question_schema.text)
-                if not question:
-                    await self.add_question_to_quizz(quizz.id, question_schema)
+                question = questions_by_text.get(question_schema.text)
+                if question is None:
+                    new_questions.append(question_schema)
                     continue
-
-                await self.update_question(question.id, quizz.id, QuestionUpdateSchema(text=question_schema.text))
-
-                new_answers_text = [answer.text for answer in question_schema.answers]
-                current_answers = await self._quizz_repository.get_question_answers(question.id)
-                current_answers_text = [answer.text for answer in current_answers]
-
-                for answer in current_answers:
-                    if answer.text not in new_answers_text:
-                        current_answers_text.remove(answer.text)
-                        await self._quizz_repository.delete_answer(answer.id)
-
+                answers_by_text = {answer.text: answer for answer in answers_by_question[question.id]}
+                imported_answers_text = {answer.text for answer in question_schema.answers}
+                removed_answer_ids.extend(
+                    answer.id for answer in answers_by_text.values() if answer.text not in imported_answers_text
+                )
                 for answer_schema in question_schema.answers:
-                    if answer_schema.text not in current_answers_text:
-                        await self.add_answer_to_question(quizz.id, question.id, answer_schema)
-                        continue
-                    answer = await self._quizz_repository.get_answer_by_question_and_text(
-                        question.id, answer_schema.text
-                    )
-                    await self.update_answer(
-                        answer.id,
-                        quizz.id,
-                        AnswerUpdateSchema(text=answer_schema.text, is_correct=answer_schema.is_correct),
-                    )
-        return await self.fetch_quizz_questions(await self.get_quizz(quizz.id))
+                    answer = answers_by_text.get(answer_schema.text)
+                    if answer is None:
+                        new_answers.append((question.id, answer_schema))
+                        key_changed |= answer_schema.is_correct
+                    elif answer.is_correct != answer_schema.is_correct:
+                        # flushed with the commit, as one batch of updates
+                        answer.is_correct = answer_schema.is_correct
+                        key_changed = True
+
+            # choices of deleted answers stop counting
+            key_changed |= bool(removed_answer_ids)
+            await self._quizz_repository.delete_answers(removed_answer_ids)
+            await self._quizz_repository.create_questions(quizz.id, new_questions)
+            await self._quizz_repository.create_answers(new_answers)
+        await self._quizz_repository.delete_cached_response_views(quizz.id)
+        return await self.fetch_quizz_questions(await self.get_quizz(quizz.id)), key_changed
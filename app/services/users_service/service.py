@@ -1,3 +1,4 @@
+from typing import Optional
 from uuid import UUID
 
 from passlib.hash import argon2
@@ -17,7 +18,9 @@ from app.services.users_service.exceptions import (
     UserNotFoundException,
 )
 from app.utils.error_parser import get_conflicting_field
+from app.utils.instrumentation import timing_span
 from app.utils.logging import logger
+from app.utils.pagination import CountMode, decode_cursor, next_page_cursor
 
 
 class UserService:
@@ -26,16 +29,24 @@ class UserService:
         self._company_action_repository = CompanyActionRepository(session)
         self._notification_service = NotificationService(session)
 
-    async def get_all_users(self, page: int, limit: int) -> UserList:
+    async def get_all_users(
+        self, page: int, limit: int, cursor: Optional[str] = None, count_mode: CountMode = 'exact'
+    ) -> UserList:
         offset = (page - 1) * limit
-        users = await self._user_repository.get_all_users(offset, limit)
+        after = decode_cursor(cursor) if cursor else None
+        users, count, count_mode = await self._user_repository.get_all_users_with_count(
+            offset, limit, after, count_mode
+        )
         return UserList(
             users=[UserSchema.model_validate(user) for user in users],
-            total_count=await self._user_repository.get_users_count(),
+            total_count=count,
+            next_cursor=next_page_cursor(users, limit),
+            count_mode=count_mode,
         )
 
     async def create_user(self, user_data: UserSignUpSchema) -> UserSchema:
-        hashed_password = argon2.hash(user_data.password)
+        with timing_span('password'):
+            hashed_password = argon2.hash(user_data.password)
 
         created_user = self._user_repository.create_user_with_hashed_password(
             username=user_data.username,
@@ -46,10 +57,10 @@ class UserService:
         )
         try:
             await self._user_repository.commit_me(created_user)
-            logger.info(f'User with id: {created_user.id} created successfully!')
+            logger.info('User with id: %s created successfully!', created_user.id)
         except IntegrityError as e:
             conflicting_field, value = get_conflicting_field(e)
-            logger.error(f"User with {conflicting_field}: '{value}' already exists!")
+            logger.error("User with %s: '%s' already exists!", conflicting_field, value)
             raise UserAlreadyExistsException(conflicting_field, value)
         return UserSchema.model_validate(created_user)
 
@@ -75,16 +86,17 @@ class UserService:
 
         new_user_data = user_data.model_dump(exclude_unset=True, exclude={'password'})
         if user_data.new_password:
-            logger.info(f'Updated password for user with id: {user.id}')
-            new_user_data['hashed_password'] = argon2.hash(user_data.new_password)
+            logger.info('Updated password for user with id: %s', user.id)
+            with timing_span('password'):
+                new_user_data['hashed_password'] = argon2.hash(user_data.new_password)
 
         self._user_repository.update_user(user, new_user_data)
         try:
             await self._user_repository.commit_me(user)
-            logger.info(f'User with id: {user.id} updated successfully!')
+            logger.info('User with id: %s updated successfully!', user.id)
         except IntegrityError as e:
             conflicting_field, value = get_conflicting_field(e)
-            logger.error(f"Cannot update user to {conflicting_field}: '{value}'!")
+            logger.error("Cannot update user to %s: '%s'!", conflicting_field, value)
             raise UserAlreadyExistsException(conflicting_field, value)
 
         return UserDetail.model_validate(user)
@@ -96,14 +108,12 @@ class UserService:
 
         await self._user_repository.delete_user(user)
         await self._user_repository.commit_me(user, refresh=False)
-        logger.info(f'User with id: {user.id} deleted successfully!')
+        logger.info('User with id: %s deleted successfully!', user.id)
 
     async def get_user_invites(self, user_id: UUID) -> CompanyListSchema:
         companies = await self._company_action_repository.get_companies_related_to_user(
             user_id, CompanyActionType.INVITATION
         )
-        for company in companies:
-            company.owner = await company.awaitable_attrs.owner
         return CompanyListSchema(
             companies=[CompanySchema.model_validate(company) for company in companies], total_count=len(companies)
         )
@@ -129,8 +139,6 @@ class UserService:
         companies = await self._company_action_repository.get_companies_related_to_user(
             user_id, CompanyActionType.REQUEST
         )
-        for company in companies:
-            company.owner = await company.awaitable_attrs.owner
         return CompanyListSchema(
             companies=[CompanySchema.model_validate(company) for company in companies], total_count=len(companies)
         )
@@ -156,11 +164,10 @@ class UserService:
         companies = await self._company_action_repository.get_companies_related_to_user(
             user_id, CompanyActionType.MEMBERSHIP
         )
-        for company in companies:
-            company.owner = await company.awaitable_attrs.owner
         return CompanyListSchema(
             companies=[CompanySchema.model_validate(company) for company in companies], total_count=len(companies)
         )
 
     async def leave_company(self, user_id: UUID, company_id: UUID) -> None:
-        await self._company_action_repository.delete(company_id, user_id, CompanyActionType.INVITATION)
+        await self._company_action_repository.delete(company_id, user_id, CompanyActionType.MEMBERSHIP)
+        await self._company_action_repository.delete(company_id, user_id, CompanyActionType.ADMIN)
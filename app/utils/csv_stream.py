@@ -0,0 +1,34 @@
+import csv
+import io
+from collections.abc import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+
+class CsvChunkWriter:
+    """csv.DictWriter over a reusable buffer, written rows are taken out with drain()."""
+
+    def __init__(self, fieldnames: list[str]) -> None:
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=fieldnames)
+
+    def header(self) -> str:
+        self._writer.writeheader()
+        return self.drain()
+
+    def writerow(self, row: dict) -> None:
+        self._writer.writerow(row)
+
+    def drain(self) -> str:
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk
+
+
+def csv_streaming_response(chunks: AsyncIterator[str], session: AsyncSession) -> StreamingResponse:
+    # request scoped session is closed before streamed body is sent,
+    # queries made while streaming check out a new connection which is released when streaming ends
+    return StreamingResponse(chunks, media_type='text/csv', background=BackgroundTask(session.close))
@@ -0,0 +1,336 @@
+"""Per request performance data: latency, response size and time spent waiting for database and redis.
+
+RequestMetricsMiddleware keeps a RequestStats object in a context variable for the duration of each request,
+database cursor events and redis commands add their time to it. Whatever remains of the request duration
+is accounted as app time: python work and waiting for the event loop.
+
+Every statement is also counted by its fingerprint, requests running more statements than QUERY_BUDGET
+or repeating one more than QUERY_REPEAT_THRESHOLD times, usually an N+1 pattern, are logged.
+With QUERY_BUDGET_STRICT, which tests enable, QueryBudgetExceeded is raised instead.
+
+Responses carry a Server-Timing header with the time spent so far in database, redis, serialization
+of the returned value by TimedRoute and the app, by default in the local environment only. With SERVER_TIMING
+set to debug it also lists statement and round trip counts and the spans recorded with timing_span, e.g. around
+argon2 hashing. Streamed bodies are produced after the headers were sent, their time is only part of the metrics
+and the access log.
+"""
+
+import asyncio
+import functools
+import re
+import time
+from collections import Counter as CounterDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Optional
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.utils.logging import logger, request_id
+from app.utils.metrics import SIZE_BUCKETS, Counter, Gauge, Histogram, registry
+
+UNMATCHED_ROUTE = '<unmatched>'
+REQUEST_ID_HEADER = 'x-request-id'
+MAX_REQUEST_ID_LENGTH = 64
+SERIALIZE_SPAN = 'serialize'
+
+REQUESTS = registry.register(
+    Counter('http_requests_total', 'Requests by route and status code', ('method', 'route', 'status'))
+)
+REQUEST_DURATION = registry.register(
+    Histogram('http_request_duration_seconds', 'Request latency, streamed bodies included', ('method', 'route'))
+)
+RESPONSE_SIZE = registry.register(
+    Histogram('http_response_size_bytes', 'Response body size', ('method', 'route'), buckets=SIZE_BUCKETS)
+)
+REQUESTS_IN_FLIGHT = registry.register(Gauge('http_requests_in_flight', 'Requests being handled', ('method',)))
+REQUEST_QUERIES = registry.register(
+    Histogram(
+        'http_request_queries',
+        'Database statements executed per request',
+        ('method', 'route'),
+        buckets=(1, 2, 5, 10, 20, 50, 100),
+    )
+)
+REQUEST_REDIS_COMMANDS = registry.register(
+    Histogram(
+        'http_request_redis_commands',
+        'Redis round trips per request, a pipeline counts once',
+        ('method', 'route'),
+        buckets=(1, 2, 5, 10, 20, 50, 100),
+    )
+)
+REQUEST_COMPONENT_SECONDS = registry.register(
+    Counter(
+        'http_request_component_seconds_total',
+        'Request time spent in database, redis and the app itself',
+        ('method', 'route', 'component'),
+    )
+)
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'\$\d+|%\(\w+\)s|%s|(?<![:\w]):[a-zA-Z_]\w*')
+_VALUE_LIST = re.compile(r'\(\?(?:\s*,\s*\?)*\)')
+_EXTRA_VALUE_ROWS = re.compile(r'(?:\s*,\s*\(\?, \.\.\.\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Statement with literals and parameters replaced by ?, so executions differing only in values match."""
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _VALUE_LIST.sub('(?, ...)', statement)
+    statement = _EXTRA_VALUE_ROWS.sub('', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+@dataclass
+class RequestStats:
+    db_seconds: float = 0
+    redis_seconds: float = 0
+    query_count: int = 0
+    redis_commands: int = 0
+    fingerprints: CounterDict[str] = field(default_factory=CounterDict)
+    # seconds by span name, see timing_span
+    spans: dict[str, float] = field(default_factory=dict)
+    endpoint_returned: Optional[float] = None
+
+    def copy(self) -> 'RequestStats':
+        return replace(self, fingerprints=self.fingerprints.copy(), spans=self.spans.copy())
+
+    def add_span(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self, elapsed: float) -> str:
+        serialize = self.spans.get(SERIALIZE_SPAN, 0.0)
+        debug = settings.server_timing == 'debug'
+        metrics = [
+            ('db', self.db_seconds, f'{self.query_count} queries' if debug else None),
+            ('redis', self.redis_seconds, f'{self.redis_commands} round trips' if debug else None),
+            (SERIALIZE_SPAN, serialize, None),
+            ('app', max(0.0, elapsed - self.db_seconds - self.redis_seconds - serialize), None),
+            ('total', elapsed, None),
+        ]
+        if debug:
+            # spans overlap the components above, e.g. database time within a service call
+            metrics.extend((name, seconds, None) for name, seconds in self.spans.items() if name != SERIALIZE_SPAN)
+        return ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' + (f';desc="{description}"' if description else '')
+            for name, seconds, description in metrics
+        )
+
+    def query_budget_violations(self) -> list[str]:
+        violations = []
+        if self.query_count > settings.QUERY_BUDGET:
+            violations.append(f'{self.query_count} queries, budget is {settings.QUERY_BUDGET}')
+        violations.extend(
+            f'{count} times: {statement}'
+            for statement, count in self.fingerprints.most_common()
+            if count > settings.QUERY_REPEAT_THRESHOLD
+        )
+        return violations
+
+
+def check_query_budget(stats: RequestStats, description: str) -> None:
+    violations = stats.query_budget_violations()
+    if not violations:
+        return
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(f'{description} exceeded query budget: ' + '; '.join(violations))
+    logger.warning('%s exceeded query budget: %s', description, '; '.join(violations))
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar('request_stats', default=None)
+
+
+def record_redis_time(seconds: float) -> None:
+    """Adds one round trip to redis, a command or a pipeline, to the current request."""
+    stats = request_stats.get()
+    if stats is not None:
+        stats.redis_seconds += seconds
+        stats.redis_commands += 1
+
+
+@contextmanager
+def timing_span(name: str) -> Iterator[None]:
+    """Adds the time spent in the block to span `name` of the current request, names must be HTTP tokens."""
+    stats = request_stats.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.add_span(name, time.perf_counter() - started)
+
+
+def _mark_endpoint_return(call: Callable[..., Any]) -> Callable[..., Any]:
+    def mark() -> None:
+        stats = request_stats.get()
+        if stats is not None:
+            stats.endpoint_returned = time.perf_counter()
+
+    # fastapi awaits coroutine functions and runs others in a thread pool, so the kind must be kept
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def async_endpoint(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                mark()
+
+        return async_endpoint
+
+    @functools.wraps(call)
+    def endpoint(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return call(*args, **kwargs)
+        finally:
+            mark()
+
+    return endpoint
+
+
+class TimedRoute(APIRoute):
+    """Records the time the endpoint returned, so TimedJSONResponse can report serialization of its value."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        # the request handler built above looks the call up on every request
+        self.dependant.call = _mark_endpoint_return(self.dependant.call)
+
+
+class TimedJSONResponse(JSONResponse):
+    """Accounts validation against the response model, conversion and rendering to JSON as span serialize."""
+
+    def render(self, content: Any) -> bytes:
+        body = super().render(content)
+        stats = request_stats.get()
+        if stats is not None and stats.endpoint_returned is not None:
+            stats.add_span(SERIALIZE_SPAN, time.perf_counter() - stats.endpoint_returned)
+            stats.endpoint_returned = None
+        return body
+
+
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    started = conn.info['query_started'].pop()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.db_seconds += time.perf_counter() - started
+        stats.query_count += 1
+        stats.fingerprints[fingerprint(statement)] += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, unlike BaseHTTPMiddleware it keeps context variables and streaming intact.
+
+    Also assigns the request id, taken from the X-Request-ID header when the client sent one,
+    which is returned in the same header and attached to every line logged during the request.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status = 500
+        response_size = 0
+        stats = RequestStats()
+        # background tasks run after the body is sent, they are not part of the request
+        sent: Optional[tuple[float, RequestStats]] = None
+        current_request_id = Headers(scope=scope).get(REQUEST_ID_HEADER, '')[:MAX_REQUEST_ID_LENGTH] or uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_size, sent
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append(REQUEST_ID_HEADER, current_request_id)
+                if settings.server_timing != 'off':
+                    headers.append('server-timing', stats.server_timing(time.perf_counter() - started))
+            elif message['type'] == 'http.response.body':
+                response_size += len(message.get('body', b''))
+                if not message.get('more_body', False):
+                    sent = (time.perf_counter(), stats.copy())
+            await send(message)
+
+        request_id_token = request_id.set(current_request_id)
+        stats_token = request_stats.set(stats)
+        REQUESTS_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method)
+            request_stats.reset(stats_token)
+            finished, stats = sent or (time.perf_counter(), stats)
+            try:
+                self._record(scope, status, finished - started, response_size, stats)
+            finally:
+                request_id.reset(request_id_token)
+
+    def _record(self, scope: Scope, status: int, duration: float, response_size: int, stats: RequestStats) -> None:
+        method = scope['method']
+        # routing stores matched route in the scope, its path is the template with prefix
+        route = getattr(scope.get('route'), 'path', UNMATCHED_ROUTE)
+        REQUESTS.inc(method, route, str(status))
+        REQUEST_DURATION.observe(duration, method, route)
+        RESPONSE_SIZE.observe(response_size, method, route)
+        REQUEST_COMPONENT_SECONDS.inc(method, route, 'db', amount=stats.db_seconds)
+        REQUEST_COMPONENT_SECONDS.inc(method, route, 'redis', amount=stats.redis_seconds)
+        REQUEST_COMPONENT_SECONDS.inc(
+            method, route, 'app', amount=max(0.0, duration - stats.db_seconds - stats.redis_seconds)
+        )
+        REQUEST_QUERIES.observe(stats.query_count, method, route)
+        REQUEST_REDIS_COMMANDS.observe(stats.redis_commands, method, route)
+        logger.info(
+            '%s %s %s',
+            method,
+            scope['path'],
+            status,
+            extra={
+                'route': route,
+                'status': status,
+                'duration_ms': round(duration * 1000, 1),
+                'db_ms': round(stats.db_seconds * 1000, 1),
+                'redis_ms': round(stats.redis_seconds * 1000, 1),
+                'queries': stats.query_count,
+                'redis_commands': stats.redis_commands,
+                'response_bytes': response_size,
+            },
+        )
+        check_query_budget(stats, f'{method} {route}')
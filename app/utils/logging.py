@@ -1,16 +1,96 @@
+"""Logging of the app, records are handed over to a queue and written by a background thread.
+
+Handlers run in the thread of QueueListener, so neither disk nor stdout writes block the event loop.
+Lines are JSON objects with the id of the request they were logged in and any fields passed in `extra`.
+Records below WARNING are kept with probability LOG_SAMPLE_RATE. Use lazy formatting:
+logger.info('Rescored quizz %s', quizz_id), the message is only rendered for records which are kept.
+"""
+
+import atexit
+import copy
+import datetime
+import json
 import logging
+import queue
+import random
 import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Optional
+
+from app.core.config import settings
+
+# set by RequestMetricsMiddleware for the duration of a request
+request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
+# attributes every LogRecord has, everything else was passed in `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'request_id'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line: dict[str, Any] = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        line.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line['exception'] = record.exc_text
+        return json.dumps(line, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate  # noqa: S311
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class RenderingQueueHandler(QueueHandler):
+    """Renders message arguments and traceback before the record leaves the logging task."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # arguments may be mutated or lazy objects, they are rendered before leaving the task,
+        # on a copy since handlers of parent loggers get the same record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 logger = logging.getLogger('fastapi')
+logger.setLevel(settings.LOG_LEVEL)
+logger.addFilter(RequestIdFilter())
 
-formatter = logging.Formatter(fmt='%(asctime)s - %(levelname)s - %(message)s')
+formatter = JsonFormatter()
 
-# hangders
 stream_handler = logging.StreamHandler(sys.stdout)
-file_handler = logging.FileHandler('app.log')
+file_handler = RotatingFileHandler('app.log', maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT)
 
 stream_handler.setFormatter(formatter)
 file_handler.setFormatter(formatter)
 
-logger.addHandler(stream_handler)
-logger.addHandler(file_handler)
+log_queue: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+queue_handler = RenderingQueueHandler(log_queue)
+queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+logger.addHandler(queue_handler)
+
+listener = QueueListener(log_queue, stream_handler, file_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
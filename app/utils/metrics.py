@@ -0,0 +1,125 @@
+"""In-process metrics rendered in Prometheus text exposition format (version 0.0.4).
+
+Only what the app needs: counters, gauges and histograms with labels. Values live in a single event loop,
+so no locking is done. With several worker processes every process exposes its own values.
+"""
+
+import math
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import TypeVar, Union
+
+LabelValues = tuple[str, ...]
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    pairs = [
+        '{}="{}"'.format(name, value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    ]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], Union[int, float]]]:
+        """(sample name suffix, labels, value)"""
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], Union[int, float]]]:
+        for values, value in self._values.items():
+            yield '', dict(zip(self.labels, values)), value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(
+        self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DURATION_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = (*buckets, math.inf)
+        # per label values: count in each bucket (not cumulative), sum
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        counts = self._counts.setdefault(label_values, [0] * len(self.buckets))
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[label_values] = self._sums.get(label_values, 0) + value
+
+    def count(self, *label_values: str) -> int:
+        return sum(self._counts.get(label_values, ()))
+
+    def sum(self, *label_values: str) -> float:
+        return self._sums.get(label_values, 0)
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], Union[int, float]]]:
+        for values, counts in self._counts.items():
+            labels = dict(zip(self.labels, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield '_sum', labels, self._sums[values]
+            yield '_count', labels, cumulative
+
+
+M = TypeVar('M', bound=Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self._metrics.values() for line in metric.render()) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,46 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Literal, NamedTuple, Protocol, Union
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+CountMode = Literal['exact', 'estimate', 'cached']
+
+
+class PageCursor(NamedTuple):
+    """Position in listing ordered by (created_at, id), next page starts strictly after it."""
+
+    created_at: datetime
+    id: UUID
+
+
+class _Timestamped(Protocol):
+    created_at: datetime
+    id: UUID
+
+
+class InvalidCursorException(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid pagination cursor')
+
+
+def encode_cursor(item: _Timestamped) -> str:
+    raw = f'{item.created_at.isoformat()}|{item.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> PageCursor:
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return PageCursor(created_at=datetime.fromisoformat(created_at), id=UUID(item_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorException()
+
+
+def next_page_cursor(items: list[_Timestamped], limit: int) -> Union[str, None]:
+    """Cursor of the last item if the page is full, otherwise there is nothing more to fetch."""
+    if len(items) < limit or not items:
+        return None
+    return encode_cursor(items[-1])
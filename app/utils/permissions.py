@@ -4,6 +4,7 @@ from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from typing_extensions import ParamSpec
 
+from app.core.config import settings
 from app.core.security import get_current_user
 from app.schemas.user_shema import UserDetail
 
@@ -11,6 +12,15 @@ Param = ParamSpec('Param')
 RetType = TypeVar('RetType')
 
 
+def is_admin(user: UserDetail) -> bool:
+    return user.id in settings.ADMIN_USER_IDS
+
+
+def only_admin(current_user: Annotated[UserDetail, Depends(get_current_user)]) -> None:
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+
 def only_user_itself(user_id: UUID, current_user: Annotated[UserDetail, Depends(get_current_user)]) -> None:
     if user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,119 @@
+"""Statistical profiler for live workers, stacks of all threads are sampled from a background thread.
+
+Output is in the folded format of flamegraph.pl, also read by speedscope: one line per distinct stack,
+frames from the thread name down to the innermost function separated by ';', followed by the number of
+samples it was seen in. The event loop thread runs every request of the worker, so a profile of a single
+request also contains whatever other requests did meanwhile.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter as CounterDict
+from types import FrameType, TracebackType
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.db import async_session
+from app.services.authentication_service.service import AuthenticationService
+from app.utils.logging import logger
+from app.utils.permissions import is_admin
+
+PROFILE_HEADER = 'x-profile'
+PROFILE_STATUS_HEADER = 'x-profile-status'
+FOLDED_MEDIA_TYPE = 'text/plain; charset=utf-8'
+
+
+def _fold(thread_name: str, frame: Optional[FrameType]) -> str:
+    frames = []
+    while frame is not None:
+        frames.append(f'{frame.f_globals.get("__name__", "?")}.{frame.f_code.co_name}')
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Use as a context manager, stacks are sampled every `interval` seconds while the block runs."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: CounterDict[str] = CounterDict()
+        self.samples = 0
+        self._started = 0.0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self._stopped.set()
+        self._thread.join()
+        logger.info('Profiled %s samples in %.1f s', self.samples, time.perf_counter() - self._started)
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self.stacks[_fold(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+async def _is_admin_request(scope: Scope) -> bool:
+    scheme, _, token = Headers(scope=scope).get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    async with async_session() as session:
+        user = await AuthenticationService(session).get_user_by_token(token)
+    return user is not None and is_admin(user)
+
+
+class ProfilerMiddleware:
+    """Profiles requests of admins sending the X-Profile header, the response is replaced by the profile.
+
+    Status of the profiled response is returned in the X-Profile-Status header. Requests without the header
+    pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or PROFILE_HEADER not in Headers(scope=scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not await _is_admin_request(scope):
+            await JSONResponse({'detail': 'Profiling is allowed to admins only'}, status_code=403)(scope, receive, send)
+            return
+
+        status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        with SamplingProfiler(settings.PROFILER_INTERVAL_SECONDS) as profiler:
+            await self.app(scope, receive, discard)
+        response = Response(
+            profiler.folded(), media_type=FOLDED_MEDIA_TYPE, headers={PROFILE_STATUS_HEADER: str(status)}
+        )
+        await response(scope, receive, send)
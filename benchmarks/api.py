@@ -0,0 +1,365 @@
+"""Throughput and latency of the API hot paths on the dataset of benchmarks.seed.
+
+    python -m benchmarks.seed
+    python -m benchmarks.api [--requests 200] [--concurrency 10] [--output results.json] [--compare baseline.json]
+
+Requests go through the whole ASGI app in process, authentication is replaced by a header naming the seeded user.
+Postgres and redis are the configured ones, so numbers are only comparable between runs on the same machine
+and dataset. Database statements per request are taken from the request metrics, unlike latency they should
+not change between runs at all. Attempts and notifications created by the run are deleted at the end,
+so repeated runs work on the same data.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from uuid import UUID
+
+import httpx
+from fastapi import Request
+from sqlalchemy import delete, select
+
+from app.core.security import get_current_user
+from app.db.db import async_session
+from app.db.models import Answer, Company, CompanyAction, Notification, Question, Quizz, QuizzResult, User
+from app.main import app
+from app.schemas.user_shema import UserDetail
+from app.utils.instrumentation import REQUEST_QUERIES
+from app.utils.logging import logger
+from app.utils.scheduler import check_quizz_completions
+from benchmarks.seed import SEED_EMAIL_DOMAIN, drop_cached_keys
+
+USER_HEADER = 'x-benchmark-user'
+
+
+@dataclass
+class SeededCompany:
+    id: UUID
+    owner: UserDetail
+    members: list[UserDetail]
+    # quizz id -> question id -> answer ids
+    quizzes: dict[UUID, dict[UUID, list[UUID]]]
+
+
+@dataclass
+class Fixture:
+    companies: list[SeededCompany]
+    users: dict[str, UserDetail] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        for company in self.companies:
+            for user in [company.owner, *company.members]:
+                self.users[str(user.id)] = user
+
+
+@dataclass
+class Call:
+    user: UserDetail
+    path_params: dict[str, Any]
+    params: dict[str, str] = field(default_factory=dict)
+    json: Optional[Any] = None
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # route template, as the request metrics label it
+    route: str
+    build: Callable[[Fixture, random.Random], Call]
+
+
+def _member_quizz(fixture: Fixture, rng: random.Random) -> tuple[SeededCompany, UserDetail, UUID]:
+    company = rng.choice(fixture.companies)
+    return company, rng.choice(company.members), rng.choice(list(company.quizzes))
+
+
+def fetch_quizz(fixture: Fixture, rng: random.Random) -> Call:
+    _, member, quizz_id = _member_quizz(fixture, rng)
+    return Call(member, {'quizz_id': quizz_id})
+
+
+def complete_quizz(fixture: Fixture, rng: random.Random) -> Call:
+    company, member, quizz_id = _member_quizz(fixture, rng)
+    questions = [
+        {'question_id': str(question_id), 'answer_ids': [str(answer_id) for answer_id in rng.sample(answer_ids, 1)]}
+        for question_id, answer_ids in company.quizzes[quizz_id].items()
+    ]
+    return Call(member, {}, json={'quizz_id': str(quizz_id), 'questions': questions})
+
+
+def user_response(fixture: Fixture, rng: random.Random) -> Call:
+    company, member, quizz_id = _member_quizz(fixture, rng)
+    return Call(company.owner, {'quizz_id': quizz_id, 'user_id': member.id})
+
+
+def owner_quizz(**params: str) -> Callable[[Fixture, random.Random], Call]:
+    def build(fixture: Fixture, rng: random.Random) -> Call:
+        company, _, quizz_id = _member_quizz(fixture, rng)
+        return Call(company.owner, {'quizz_id': quizz_id}, params)
+
+    return build
+
+
+def company_call(as_owner: bool, **params: str) -> Callable[[Fixture, random.Random], Call]:
+    def build(fixture: Fixture, rng: random.Random) -> Call:
+        company = rng.choice(fixture.companies)
+        return Call(company.owner if as_owner else rng.choice(company.members), {'company_id': company.id}, params)
+
+    return build
+
+
+def any_user(**params: str) -> Callable[[Fixture, random.Random], Call]:
+    def build(fixture: Fixture, rng: random.Random) -> Call:
+        return Call(rng.choice(rng.choice(fixture.companies).members), {}, params)
+
+    return build
+
+
+SCENARIOS = [
+    Scenario('quizz fetch', 'GET', '/quizzes/{quizz_id}/', fetch_quizz),
+    Scenario('quizz completion', 'POST', '/quizzes/complete/', complete_quizz),
+    Scenario('user response', 'GET', '/quizzes/{quizz_id}/responses/{user_id}/', user_response),
+    Scenario('quizz responses json', 'GET', '/quizzes/{quizz_id}/responses/', owner_quizz(format='json')),
+    Scenario('quizz responses csv', 'GET', '/quizzes/{quizz_id}/responses/', owner_quizz(format='csv')),
+    Scenario(
+        'company responses csv',
+        'GET',
+        '/companies/{company_id}/quizzes/responses/',
+        company_call(as_owner=True, format='csv'),
+    ),
+    Scenario('quizz analytics', 'GET', '/quizzes/{quizz_id}/analytics/', owner_quizz()),
+    Scenario('company quizzes', 'GET', '/companies/{company_id}/quizzes/', company_call(as_owner=False)),
+    Scenario('company members', 'GET', '/companies/{company_id}/members/', company_call(as_owner=False)),
+    Scenario('companies', 'GET', '/companies/', any_user(limit='50')),
+    Scenario('users', 'GET', '/users/', any_user(limit='50')),
+]
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark API hot paths')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests of each scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='requests of each scenario sent before measuring')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--scheduler-runs', type=int, default=3)
+    parser.add_argument('--only', action='append', help='run only scenarios with this name, may be repeated')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as json to this file')
+    parser.add_argument('--compare', help='results json of an earlier run to compare with')
+    return parser.parse_args(args)
+
+
+async def load_fixture() -> Fixture:
+    async with async_session() as session:
+        companies = (
+            await session.scalars(
+                select(Company)
+                .join(User, Company.owner_id == User.id)
+                .where(User.email.like(f'%@{SEED_EMAIL_DOMAIN}'))
+                .order_by(Company.name)
+            )
+        ).all()
+        if not companies:
+            sys.exit('No seeded data, run python -m benchmarks.seed first')
+
+        seeded = []
+        for company in companies:
+            owner = await session.get(User, company.owner_id)
+            members = (
+                await session.scalars(
+                    select(User)
+                    .join(CompanyAction, CompanyAction.user_id == User.id)
+                    .where(CompanyAction.company_id == company.id)
+                    .order_by(User.username)
+                )
+            ).all()
+            rows = await session.execute(
+                select(Quizz.id, Question.id, Answer.id)
+                .join(Question, Question.quizz_id == Quizz.id)
+                .join(Answer, Answer.question_id == Question.id)
+                .where(Quizz.company_id == company.id)
+                .order_by(Quizz.title, Question.text, Answer.text)
+            )
+            quizzes: dict[UUID, dict[UUID, list[UUID]]] = {}
+            for quizz_id, question_id, answer_id in rows:
+                quizzes.setdefault(quizz_id, {}).setdefault(question_id, []).append(answer_id)
+            seeded.append(
+                SeededCompany(
+                    company.id,
+                    UserDetail.model_validate(owner),
+                    [UserDetail.model_validate(member) for member in members],
+                    quizzes,
+                )
+            )
+        return Fixture(seeded)
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, call: Call) -> tuple[float, bool]:
+    started = time.perf_counter()
+    response = await client.request(
+        scenario.method,
+        scenario.route.format(**call.path_params),
+        params=call.params,
+        json=call.json,
+        headers={USER_HEADER: str(call.user.id)},
+    )
+    return time.perf_counter() - started, response.is_success
+
+
+def summarize(latencies: list[float], seconds: float, errors: int, queries: float) -> dict[str, float]:
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / seconds,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': cuts[49] * 1000,
+        'p95_ms': cuts[94] * 1000,
+        'p99_ms': cuts[98] * 1000,
+        'queries': queries,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, fixture: Fixture, args: argparse.Namespace
+) -> dict[str, float]:
+    rng = random.Random(f'{args.seed}:{scenario.name}')  # noqa: S311
+    for _ in range(args.warmup):
+        await send(client, scenario, scenario.build(fixture, rng))
+
+    calls = [scenario.build(fixture, rng) for _ in range(args.requests)]
+    latencies: list[float] = []
+    errors = 0
+    queries_count = REQUEST_QUERIES.count(scenario.method, scenario.route)
+    queries_sum = REQUEST_QUERIES.sum(scenario.method, scenario.route)
+
+    async def worker() -> None:
+        nonlocal errors
+        while calls:
+            latency, success = await send(client, scenario, calls.pop())
+            latencies.append(latency)
+            errors += not success
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    seconds = time.perf_counter() - started
+
+    measured = REQUEST_QUERIES.count(scenario.method, scenario.route) - queries_count
+    queries = (REQUEST_QUERIES.sum(scenario.method, scenario.route) - queries_sum) / max(measured, 1)
+    return summarize(latencies, seconds, errors, queries)
+
+
+async def run_scheduler(runs: int) -> dict[str, float]:
+    latencies = []
+    for _ in range(runs):
+        async with async_session() as session:
+            started = time.perf_counter()
+            await check_quizz_completions(session)
+            latencies.append(time.perf_counter() - started)
+    return summarize(latencies, sum(latencies), 0, 0)
+
+
+async def delete_created_rows(since: datetime.datetime) -> None:
+    seeded_users = select(User.id).where(User.email.like(f'%@{SEED_EMAIL_DOMAIN}'))
+    async with async_session() as session:
+        await session.execute(
+            delete(QuizzResult).where(QuizzResult.created_at >= since, QuizzResult.user_id.in_(seeded_users))
+        )
+        await session.execute(
+            delete(Notification).where(Notification.created_at >= since, Notification.user_id.in_(seeded_users))
+        )
+        await session.commit()
+        # cached responses, rendered views and analytics include the deleted results
+        await drop_cached_keys(session)
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit
+
+
+def print_results(results: dict[str, dict[str, float]], baseline: Optional[dict[str, dict[str, float]]]) -> None:
+    print(f'{"scenario":<24}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"errors":>8}')
+    for name, result in results.items():
+        print(
+            f'{name:<24}{result["throughput"]:>9.1f}{result["p50_ms"]:>9.1f}{result["p95_ms"]:>9.1f}'
+            f'{result["p99_ms"]:>9.1f}{result["queries"]:>9.1f}{result["errors"]:>8}'
+        )
+        before = (baseline or {}).get(name)
+        if before:
+            changes = [
+                f'{key} {(result[key] - before[key]) / before[key] * 100:+.0f}%'
+                for key in ('throughput', 'p50_ms', 'p95_ms')
+                if before[key]
+            ]
+            if result['queries'] != before['queries']:
+                changes.append(f'queries {before["queries"]:.1f} -> {result["queries"]:.1f}')
+            print(f'{"":<24}vs baseline: {", ".join(changes)}')
+
+
+async def main(args: argparse.Namespace) -> None:
+    # access log of every request would measure stdout
+    logger.setLevel(logging.WARNING)
+    fixture = await load_fixture()
+
+    async def benchmark_user(request: Request) -> UserDetail:
+        return fixture.users[request.headers[USER_HEADER]]
+
+    app.dependency_overrides[get_current_user] = benchmark_user
+    run_started = datetime.datetime.now()  # noqa: DTZ005
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+            for scenario in SCENARIOS:
+                if not args.only or scenario.name in args.only:
+                    results[scenario.name] = await run_scenario(client, scenario, fixture, args)
+        if not args.only or 'scheduler' in args.only:
+            results['scheduler'] = await run_scheduler(args.scheduler_runs)
+    finally:
+        del app.dependency_overrides[get_current_user]
+        await delete_created_rows(run_started)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+    print(f'commit {git_commit()}, {args.requests} requests per scenario, concurrency {args.concurrency}')
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(
+                {
+                    'commit': git_commit(),
+                    'created_at': run_started.isoformat(),
+                    'arguments': vars(args),
+                    'companies': len(fixture.companies),
+                    'users': len(fixture.users),
+                    'results': results,
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,96 @@
+"""Compares redis memory taken by a cached quizz attempt in legacy per-answer layout and compact encoding.
+
+    python -m benchmarks.cached_response_memory [attempts] [questions]
+
+Uses MEMORY USAGE, on servers without it falls back to raw key and value sizes.
+"""
+
+import asyncio
+import random
+import sys
+from uuid import uuid4
+
+from aioredis import Redis
+from aioredis.exceptions import RedisError
+
+from app.redis import get_redis_client
+from app.redis.response_codec import encode_response
+from app.schemas.quizz_schema import ChoosenAnswerSchema, QuestionResultSchema, QuizzDetailResultSchema
+
+
+def make_attempt(questions: int) -> QuizzDetailResultSchema:
+    return QuizzDetailResultSchema(
+        user_id=uuid4(),
+        quizz_id=uuid4(),
+        questions=[
+            QuestionResultSchema(
+                question_id=uuid4(),
+                choosen_answers=[
+                    ChoosenAnswerSchema(answer_id=uuid4(), is_correct=random.random() < 0.5)  # noqa: S311
+                    for _ in range(random.choice([1, 1, 2]))  # noqa: S311
+                ],
+            )
+            for _ in range(questions)
+        ],
+    )
+
+
+def legacy_records(attempt: QuizzDetailResultSchema, company_id: str) -> dict[str, bytes]:
+    return {
+        f'answer:{attempt.user_id}:{company_id}:{attempt.quizz_id}:{question.question_id}:{answer.answer_id}': (
+            b'1' if answer.is_correct else b'0'
+        )
+        for question in attempt.questions
+        for answer in question.choosen_answers
+    }
+
+
+def compact_records(attempt: QuizzDetailResultSchema, company_id: str) -> dict[str, bytes]:
+    return {f'response:{attempt.user_id}:{company_id}:{attempt.quizz_id}': encode_response(attempt)}
+
+
+async def memory_usage_supported() -> bool:
+    redis = await get_redis_client()
+    try:
+        await redis.memory_usage('benchmark:probe')
+        return True
+    except RedisError:
+        return False
+    finally:
+        await redis.close()
+
+
+async def measure(redis: Redis, records: dict[str, bytes], use_memory_usage: bool) -> int:
+    await redis.mset(records)
+    if use_memory_usage:
+        usage = sum([await redis.memory_usage(key) for key in records])
+    else:
+        usage = sum(len(key) + len(value) for key, value in records.items())
+    await redis.delete(*records)
+    return usage
+
+
+async def main(attempts: int, questions: int) -> None:
+    use_memory_usage = await memory_usage_supported()
+    redis = await get_redis_client()
+    company_id = str(uuid4())
+    legacy, compact = {}, {}
+    for _ in range(attempts):
+        attempt = make_attempt(questions)
+        legacy.update(legacy_records(attempt, company_id))
+        compact.update(compact_records(attempt, company_id))
+
+    legacy_bytes = await measure(redis, legacy, use_memory_usage)
+    compact_bytes = await measure(redis, compact, use_memory_usage)
+    await redis.close()
+
+    print(f'{attempts} attempts, {questions} questions each')
+    print('measured with MEMORY USAGE' if use_memory_usage else 'MEMORY USAGE unavailable, raw key and value sizes')
+    print(f'legacy:  {len(legacy):>8} keys {legacy_bytes / attempts:>10.1f} bytes per attempt')
+    print(f'compact: {len(compact):>8} keys {compact_bytes / attempts:>10.1f} bytes per attempt')
+    print(f'ratio:   {legacy_bytes / compact_bytes:.1f}x')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [1000, 10][len(args) :])))
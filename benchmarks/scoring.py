@@ -0,0 +1,95 @@
+"""Compares grading submissions question by question, as the service used to, with the batch ScoringEngine.
+
+    python -m benchmarks.scoring [submissions] [questions]
+
+Seeds a quizz in a transaction which is rolled back at the end, needs configured postgres.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from math import floor
+from uuid import uuid4
+
+from app.db.db import async_session
+from app.db.models import Answer, Company, Question, Quizz, User
+from app.schemas.quizz_schema import QuestionCompletionSchema, QuizzCompletionSchema
+from app.services.quizz_service.scoring import ScoringEngine
+from app.services.quizz_service.service import QuizzService
+
+ANSWERS_PER_QUESTION = 4
+
+
+def make_completion(quizz: Quizz, answers_by_question: dict[Question, list[Answer]]) -> QuizzCompletionSchema:
+    return QuizzCompletionSchema(
+        quizz_id=quizz.id,
+        questions=[
+            QuestionCompletionSchema(
+                question_id=question.id,
+                answer_ids={answer.id for answer in random.sample(answers, random.randint(1, 2))},  # noqa: S311
+            )
+            for question, answers in answers_by_question.items()
+            if random.random() < 0.9  # noqa: S311
+        ],
+    )
+
+
+async def main(submissions: int, questions: int) -> None:
+    async with async_session() as session:
+        owner = User(username='benchmark', email=f'{uuid4()}@example.com', hashed_password='-')  # noqa: S106
+        company = Company(name='benchmark', owner=owner)
+        session.add_all([owner, company])
+        await session.flush()
+        quizz = Quizz(title='benchmark', frequency=1, company_id=company.id)
+        session.add(quizz)
+        await session.flush()
+        answers_by_question = {}
+        for i in range(questions):
+            question = Question(text=f'question {i}', quizz_id=quizz.id)
+            session.add(question)
+            await session.flush()
+            correct = set(random.sample(range(ANSWERS_PER_QUESTION), random.randint(1, 2)))  # noqa: S311
+            answers_by_question[question] = [
+                Answer(text=f'answer {j}', question_id=question.id, is_correct=j in correct)
+                for j in range(ANSWERS_PER_QUESTION)
+            ]
+            session.add_all(answers_by_question[question])
+        await session.flush()
+        completions = [make_completion(quizz, answers_by_question) for _ in range(submissions)]
+
+        service = QuizzService(session)
+        started = time.perf_counter()
+        legacy_scores = []
+        for completion in completions:
+            score = 0
+            for question in completion.questions:
+                # question and its answers are loaded for every question, as the service used to
+                await service._quizz_repository.get_question(question.question_id)
+                answers = await service._quizz_repository.get_question_answers(question.question_id)
+                question_score, _ = service._score_question(answers, question)
+                score += question_score / questions
+            legacy_scores.append(floor(score * 100))
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        engine = ScoringEngine(await service._quizz_repository.get_quizz_answers(quizz.id))
+        choices = engine.encode_completions(completions)
+        encoded_seconds = time.perf_counter() - started
+        engine_scores = engine.score(choices).tolist()
+        engine_seconds = time.perf_counter() - started
+
+        await session.rollback()
+
+    if engine_scores != legacy_scores:
+        raise SystemExit('engine and per question scoring disagree')
+    print(f'{submissions} submissions, {questions} questions, {ANSWERS_PER_QUESTION} answers each')
+    print(f'per question:      {legacy_seconds:>9.3f}s {submissions / legacy_seconds:>12.0f} submissions/s')
+    print(f'scoring engine:    {engine_seconds:>9.3f}s {submissions / engine_seconds:>12.0f} submissions/s')
+    print(f'  of which loading answers and encoding: {encoded_seconds:.3f}s')
+    print(f'speedup: {legacy_seconds / engine_seconds:.0f}x')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [1000, 10][len(args) :])))
@@ -0,0 +1,193 @@
+"""Seeds a dataset for the API benchmarks into the configured postgres.
+
+    python -m benchmarks.seed [--companies 3] [--members 100] [--quizzes 10] [--questions 15] [--attempts 2] [--years 2]
+
+Every company has an owner, an admin and members, quizzes with four answers per question and attempts
+of every member spread over the last years, answer choices included. Data is generated from a fixed random
+seed, so runs with the same arguments produce the same volumes. A dataset seeded before is removed first,
+all seeded users have emails in SEED_EMAIL_DOMAIN.
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import time
+from collections.abc import Sequence
+from typing import Any, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db import async_session
+from app.db.models import (
+    Answer,
+    Company,
+    CompanyAction,
+    CompanyActionType,
+    Question,
+    Quizz,
+    QuizzAnswerChoice,
+    QuizzResult,
+    User,
+)
+from app.redis import get_redis_client
+from app.repositories import CompanyActionRepository
+from app.repositories.company_repository import PUBLIC_COMPANIES_COUNT_KEY
+from app.repositories.quizz_repository import QuizzRepository
+from app.repositories.user_repository import USERS_COUNT_KEY
+from app.services.quizz_service.scoring import ScoringEngine
+
+SEED_EMAIL_DOMAIN = 'benchmark.example'
+ANSWERS_PER_QUESTION = 4
+INSERT_CHUNK_SIZE = 5000
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Seed benchmark dataset')
+    parser.add_argument('--companies', type=int, default=3)
+    parser.add_argument('--members', type=int, default=100, help='members of each company')
+    parser.add_argument('--quizzes', type=int, default=10, help='quizzes of each company')
+    parser.add_argument('--questions', type=int, default=15, help='questions of each quizz')
+    parser.add_argument('--attempts', type=int, default=2, help='attempts of each member for each quizz')
+    parser.add_argument('--years', type=int, default=2, help='attempts are spread over this many past years')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(args)
+
+
+class Dataset:
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.rows: dict[type, list[dict[str, Any]]] = {
+            model: []
+            for model in (User, Company, CompanyAction, Quizz, Question, Answer, QuizzResult, QuizzAnswerChoice)
+        }
+
+    def add(self, model: type, **values: Any) -> UUID:
+        values.setdefault('id', uuid4())
+        # naive like the defaults of the models, columns are without time zone
+        now = values.setdefault('created_at', datetime.datetime.now())  # noqa: DTZ005
+        values.setdefault('updated_at', now)
+        self.rows[model].append(values)
+        return values['id']
+
+    def add_user(self, name: str) -> UUID:
+        return self.add(User, username=name, email=f'{name}@{SEED_EMAIL_DOMAIN}', hashed_password='-')  # noqa: S106
+
+    def add_company(self, index: int, members: int, quizzes: int, questions: int, attempts: int, years: int) -> None:
+        owner_id = self.add_user(f'owner-{index}')
+        company_id = self.add(
+            Company, name=f'benchmark {index}', description='seeded for benchmarks', owner_id=owner_id, hidden=False
+        )
+        member_ids = [self.add_user(f'member-{index}-{i}') for i in range(members)]
+        for i, member_id in enumerate(member_ids):
+            action = CompanyActionType.ADMIN if i == 0 else CompanyActionType.MEMBERSHIP
+            self.add(CompanyAction, company_id=company_id, user_id=member_id, type=action)
+
+        for q in range(quizzes):
+            quizz_id = self.add(Quizz, title=f'quizz {q}', frequency=self.rng.choice([1, 7, 30]), company_id=company_id)
+            answers = self.add_questions(quizz_id, questions)
+            engine = ScoringEngine(answers)
+            for member_id in member_ids:
+                for _ in range(attempts):
+                    self.add_attempt(company_id, quizz_id, member_id, answers, engine, years)
+
+    def add_questions(self, quizz_id: UUID, questions: int) -> list[Answer]:
+        answers = []
+        for q in range(questions):
+            question_id = self.add(Question, text=f'question {q}', quizz_id=quizz_id)
+            correct = set(self.rng.sample(range(ANSWERS_PER_QUESTION), self.rng.randint(1, 2)))
+            for a in range(ANSWERS_PER_QUESTION):
+                answer_id = self.add(Answer, text=f'answer {a}', question_id=question_id, is_correct=a in correct)
+                answers.append(Answer(id=answer_id, question_id=question_id, is_correct=a in correct))
+        return answers
+
+    def add_attempt(
+        self, company_id: UUID, quizz_id: UUID, user_id: UUID, answers: list[Answer], engine: ScoringEngine, years: int
+    ) -> None:
+        by_question: dict[UUID, list[Answer]] = {}
+        for answer in answers:
+            by_question.setdefault(answer.question_id, []).append(answer)
+        choosen = [
+            answer
+            for question_answers in by_question.values()
+            if self.rng.random() < 0.95
+            for answer in self.rng.sample(question_answers, self.rng.choice([1, 1, 2]))
+        ]
+        score = int(engine.score(engine.encode_answer_ids([[answer.id for answer in choosen]]))[0])
+        created_at = datetime.datetime.now() - datetime.timedelta(  # noqa: DTZ005
+            seconds=self.rng.randint(0, years * 365 * 24 * 3600)
+        )
+        result_id = self.add(
+            QuizzResult, user_id=user_id, quizz_id=quizz_id, company_id=company_id, score=score, created_at=created_at
+        )
+        for position, answer in enumerate(choosen):
+            self.add(
+                QuizzAnswerChoice,
+                quizz_result_id=result_id,
+                question_id=answer.question_id,
+                answer_id=answer.id,
+                is_correct=answer.is_correct,
+                position=position,
+                created_at=created_at,
+            )
+
+
+async def drop_cached_keys(session: AsyncSession) -> None:
+    """Deletes redis keys of seeded companies and their quizzes, they outlive rows deleted behind the app's back."""
+    seeded_companies = (
+        select(Company.id).join(User, Company.owner_id == User.id).where(User.email.like(f'%@{SEED_EMAIL_DOMAIN}'))
+    )
+    company_ids = set((await session.scalars(seeded_companies)).all())
+    quizz_ids = (await session.scalars(select(Quizz.id).where(Quizz.company_id.in_(seeded_companies)))).all()
+    quizz_repository = QuizzRepository(session)
+    company_action_repository = CompanyActionRepository(session)
+
+    keys = [USERS_COUNT_KEY, PUBLIC_COMPANIES_COUNT_KEY]
+    for company_id in company_ids:
+        keys.append(quizz_repository._create_quizzes_count_key(company_id))
+        keys.append(company_action_repository._create_roles_key(company_id))
+    for quizz_id in quizz_ids:
+        keys.append(quizz_repository._create_response_views_key(quizz_id))
+        keys.append(quizz_repository._create_analytics_key(quizz_id))
+        keys.append(quizz_repository._create_rescore_key(quizz_id))
+    redis = await get_redis_client()
+    # single pass over cached responses, their keys start with the user id
+    async for key in redis.scan_iter(match=quizz_repository._create_key('*', '*', '*')):
+        if quizz_repository._parse_key(key.decode())[1] in company_ids:
+            keys.append(key)
+    for start in range(0, len(keys), INSERT_CHUNK_SIZE):
+        await redis.delete(*keys[start : start + INSERT_CHUNK_SIZE])
+    await redis.close()
+
+
+async def drop_seeded_data() -> None:
+    async with async_session() as session:
+        # everything else is owned by seeded users and deleted by cascades
+        await drop_cached_keys(session)
+        await session.execute(delete(User).where(User.email.like(f'%@{SEED_EMAIL_DOMAIN}')))
+        await session.commit()
+
+
+async def seed(args: argparse.Namespace) -> None:
+    await drop_seeded_data()
+    dataset = Dataset(random.Random(args.seed))  # noqa: S311
+    for index in range(args.companies):
+        dataset.add_company(index, args.members, args.quizzes, args.questions, args.attempts, args.years)
+
+    async with async_session() as session:
+        for model, rows in dataset.rows.items():
+            for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                await session.execute(insert(model), rows[start : start + INSERT_CHUNK_SIZE])
+        await session.commit()
+
+    for model, rows in dataset.rows.items():
+        print(f'{model.__tablename__:>20}: {len(rows)}')
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    started = time.perf_counter()
+    asyncio.run(seed(arguments))
+    print(f'seeded in {time.perf_counter() - started:.1f}s')
@@ -26,4 +26,6 @@ cd service
 sudo docker rm -f app-container
 sudo docker build -f Dockerfile.prod -t app-image .
 sudo docker run --env-file env -d --name app-container -p 8000:8000 app-image
-sudo docker exec app-container alembic upgrade head
\ No newline at end of file
+sudo docker exec app-container alembic upgrade head
+sudo docker exec app-container python -m app.redis.migrate_answer_keys
+sudo docker exec app-container python -m app.redis.backfill_answer_choices
@@ -1,9 +1,16 @@
 from fastapi.testclient import TestClient
+import json
+import logging
+
 import pytest
 
+from app.core.config import settings
+from app.utils.instrumentation import QueryBudgetExceeded, fingerprint
+from app.utils.logging import JsonFormatter, logger
+
 
 @pytest.mark.asyncio
-async def test_complete_health_check(client: TestClient, apply_migrations: None):
+async def test_complete_health_check(client: TestClient):
     response = client.get('/health')
     assert response.status_code == 200
 
@@ -14,3 +21,98 @@ async def test_complete_health_check(client: TestClient, apply_migrations: None)
     assert 'db' in data
 
     assert data['app']['status_code'] == 200
+
+
+@pytest.mark.asyncio
+async def test_metrics(client: TestClient):
+    client.get('/health')
+    client.get('/health/not-a-route')
+
+    response = client.get('/health/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+
+    metrics = response.text
+    assert 'http_requests_total{method="GET",route="/health/",status="200"}' in metrics
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"}' in metrics
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/health/",le="+Inf"}' in metrics
+    assert 'http_response_size_bytes_count{method="GET",route="/health/"}' in metrics
+    for component in ('db', 'redis', 'app'):
+        assert f'http_request_component_seconds_total{{method="GET",route="/health/",component="{component}"}}' in metrics
+
+
+@pytest.mark.asyncio
+async def test_query_budget(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    assert client.get('/health/db').status_code == 200
+
+    monkeypatch.setattr(settings, 'QUERY_BUDGET', 0)
+    with pytest.raises(QueryBudgetExceeded, match='GET /health/db exceeded query budget: 1 queries, budget is 0'):
+        client.get('/health/db')
+
+    monkeypatch.setattr(settings, 'QUERY_BUDGET_STRICT', False)
+    assert client.get('/health/db').status_code == 200
+
+
+def test_fingerprint():
+    assert fingerprint("SELECT *\n  FROM users WHERE id IN ($1, $2, $3) AND name = 'it''s' LIMIT 10") == (
+        'SELECT * FROM users WHERE id IN (?, ...) AND name = ? LIMIT ?'
+    )
+    assert fingerprint('INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4) RETURNING t.id') == fingerprint(
+        'INSERT INTO t (a, b) VALUES ($1, $2) RETURNING t.id'
+    )
+
+
+@pytest.mark.asyncio
+async def test_request_is_logged_with_request_id(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+):
+    # logging config of alembic migrations disables app loggers
+    monkeypatch.setattr(logger, 'disabled', False)
+    caplog.set_level(logging.INFO, logger='fastapi')
+
+    response = client.get('/health/db', headers={'X-Request-ID': 'test-request'})
+    assert response.headers['x-request-id'] == 'test-request'
+    assert len(client.get('/health/db').headers['x-request-id']) == 32
+
+    record = next(record for record in caplog.records if record.getMessage() == 'GET /health/db 200')
+    line = json.loads(JsonFormatter().format(record))
+    assert line['level'] == 'INFO'
+    assert line['request_id'] == 'test-request'
+    assert line['message'] == 'GET /health/db 200'
+    assert line['route'] == '/health/db'
+    assert line['queries'] == 1
+    assert line['duration_ms'] >= line['db_ms']
+
+
+@pytest.mark.asyncio
+async def test_server_timing(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, 'SERVER_TIMING', None)
+    monkeypatch.setattr(settings, 'ENVIRONMENT', 'local')
+    timing = client.get('/health/db').headers['server-timing']
+    assert [metric.split(';')[0] for metric in timing.split(', ')] == ['db', 'redis', 'serialize', 'app', 'total']
+    assert 'desc=' not in timing
+
+    monkeypatch.setattr(settings, 'SERVER_TIMING', 'debug')
+    response = client.post(
+        '/users/',
+        json={
+            'username': 'timed',
+            'first_name': 'TIMED',
+            'last_name': 'USER',
+            'email': 'timed@example.com',
+            'password': 'testpass123',
+            'password_confirmation': 'testpass123',
+        },
+    )
+    assert response.status_code == 200
+    metrics = {metric.split(';')[0]: metric for metric in response.headers['server-timing'].split(', ')}
+    assert 'desc="' in metrics['db']
+    assert float(metrics['password'].split('dur=')[1]) > 0
+    assert float(metrics['serialize'].split('dur=')[1]) > 0
+
+    monkeypatch.setattr(settings, 'SERVER_TIMING', 'off')
+    assert 'server-timing' not in client.get('/health/db').headers
+
+    monkeypatch.setattr(settings, 'SERVER_TIMING', None)
+    monkeypatch.setattr(settings, 'ENVIRONMENT', 'production')
+    assert 'server-timing' not in client.get('/health/db').headers
@@ -0,0 +1,84 @@
+import re
+import uuid
+
+from fastapi.testclient import TestClient
+import pytest
+
+from app.core.config import settings
+from app.repositories import UserRepository
+from app.schemas.user_shema import UserDetail, UserSchema
+from app.services.authentication_service.service import AuthenticationService
+from app.utils.permissions import is_admin
+
+FOLDED_LINE = re.compile(r'^\S.* \d+$')
+
+
+@pytest.fixture
+def admin(monkeypatch: pytest.MonkeyPatch, test_user: UserSchema) -> UserSchema:
+    monkeypatch.setattr(settings, 'ADMIN_USER_IDS', [test_user.id])
+    return test_user
+
+
+@pytest.mark.asyncio
+async def test_profile_worker_is_for_admins_only(client: TestClient, access_token: str):
+    response = client.post('/profiler/', params={'seconds': 0.1}, headers={'Authorization': f'Bearer {access_token}'})
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_profile_worker(client: TestClient, admin: UserSchema, access_token: str):
+    response = client.post('/profiler/', params={'seconds': 0.2}, headers={'Authorization': f'Bearer {access_token}'})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'text/plain; charset=utf-8'
+
+    lines = response.text.splitlines()
+    assert lines
+    assert all(FOLDED_LINE.match(line) for line in lines)
+    assert any(line.startswith('MainThread;') for line in lines)
+
+    too_long = client.post(
+        '/profiler/',
+        params={'seconds': settings.PROFILER_MAX_SECONDS + 1},
+        headers={'Authorization': f'Bearer {access_token}'},
+    )
+    assert too_long.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_profile_request(
+    client: TestClient, test_user: UserSchema, access_token: str, monkeypatch: pytest.MonkeyPatch
+):
+    headers = {'Authorization': f'Bearer {access_token}', 'X-Profile': '1'}
+    assert client.get('/users/me/', headers=headers).status_code == 403
+    assert client.get('/users/me/').status_code == 401
+
+    monkeypatch.setattr(settings, 'ADMIN_USER_IDS', [test_user.id])
+    response = client.get('/users/me/', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['x-profile-status'] == '200'
+    assert all(FOLDED_LINE.match(line) for line in response.text.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_signed_up_user_is_not_admin(
+    client: TestClient, admin: UserSchema, user_repo: UserRepository, auth_service: AuthenticationService
+):
+    # emails are not verified, admins are configured by id so a new account can not claim a listed address
+    response = client.post(
+        '/users/',
+        json={
+            'username': 'impostor',
+            'first_name': 'IMPOSTOR',
+            'last_name': 'USER',
+            'email': 'operator@example.com',
+            'password': 'testpass123',
+            'password_confirmation': 'testpass123',
+        },
+    )
+    assert response.status_code == 200
+    impostor = await user_repo.get_user_by_id(uuid.UUID(response.json()['id']))
+    headers = {'Authorization': f'Bearer {auth_service.generate_jwt_token(impostor)}'}
+
+    assert not is_admin(UserDetail.model_validate(impostor))
+    assert client.post('/profiler/', params={'seconds': 0.1}, headers=headers).status_code == 403
+    assert client.get('/users/me/', headers={**headers, 'X-Profile': '1'}).status_code == 403
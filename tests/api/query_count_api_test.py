@@ -0,0 +1,297 @@
+import io
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from fastapi.testclient import TestClient
+import openpyxl
+import pytest
+
+from app.db.models import Company, CompanyAction, CompanyActionType, User
+from app.schemas.quizz_schema import (
+    AnswerCreateSchema,
+    QuestionCompletionSchema,
+    QuestionCreateSchema,
+    QuizzCompletionSchema,
+    QuizzCreateSchema,
+    QuizzSchema,
+)
+from app.schemas.user_shema import UserDetail
+from app.services.authentication_service.service import AuthenticationService
+from app.services.quizz_service.service import QuizzService
+from app.utils.instrumentation import REQUEST_QUERIES, REQUEST_REDIS_COMMANDS
+
+
+@dataclass
+class Dataset:
+    company_id: UUID
+    owner: UserDetail
+    admin: UserDetail
+    member: UserDetail
+    # invited to the company, asking to join it and not related to it
+    invited: UserDetail
+    requesting: UserDetail
+    outsider: UserDetail
+    quizz: QuizzSchema
+
+    def path_params(self, user_id: UUID) -> dict[str, UUID]:
+        question = self.quizz.questions[0]
+        return {
+            'company_id': self.company_id,
+            'quizz_id': self.quizz.id,
+            'user_id': user_id,
+            'question_id': question.id,
+            'answer_id': question.answers[0].id,
+        }
+
+    def completion(self) -> dict:
+        return {
+            'json': {
+                'quizz_id': str(self.quizz.id),
+                'questions': [
+                    {'question_id': str(question.id), 'answer_ids': [str(question.answers[0].id)]}
+                    for question in self.quizz.questions
+                ],
+            }
+        }
+
+    def new_quizz(self) -> dict:
+        return {
+            'json': {
+                'title': 'new',
+                'description': 'new',
+                'frequency': 1,
+                'company_id': str(self.company_id),
+                'questions': [NEW_QUESTION, NEW_QUESTION],
+            }
+        }
+
+    def quizz_workbook(self) -> dict:
+        """Import of the dataset quizz, which marks first answers as correct."""
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['QUIZZ TITLE:', self.quizz.title])
+        sheet.append(['QUIZZ DESCRIPTION:', self.quizz.description])
+        sheet.append(['QUIZZ FREQUENCY:', self.quizz.frequency])
+        for question in self.quizz.questions:
+            sheet.append(['QUESTION:', question.text])
+            for answer in question.answers:
+                sheet.append(['ANSWER:', answer.text, 'CORRECT'])
+        file = io.BytesIO()
+        workbook.save(file)
+        return {'files': {'excel_file': ('quizz.xlsx', file.getvalue())}}
+
+    def invite_outsider(self) -> dict:
+        return {'json': {'email': self.outsider.email}}
+
+    def promote_member(self) -> dict:
+        return {'json': {'user_id': str(self.member.id)}}
+
+
+UPDATED_QUIZZ = {'title': 'renamed', 'description': 'renamed', 'frequency': 2}
+NEW_ANSWER = {'text': 'new', 'is_correct': True}
+NEW_QUESTION = {
+    'text': 'new',
+    'answers': [{'text': 'wrong', 'is_correct': False}, {'text': 'right', 'is_correct': True}],
+}
+
+
+def json_body(body: dict) -> Callable[[Dataset], dict]:
+    return lambda dataset: {'json': body}
+
+
+async def seed(get_db, quizz_service: QuizzService, name: str, members: int, questions: int) -> Dataset:
+    """Company with an admin and members which all completed one quizz twice, an invite and a join request."""
+    owner, invited, requesting, outsider = (
+        User(username=f'{name}-{role}', email=f'{name}-{role}@example.com', hashed_password='-')
+        for role in ('owner', 'invited', 'requesting', 'outsider')
+    )
+    users = [User(username=f'{name}-{i}', email=f'{name}-{i}@example.com', hashed_password='-') for i in range(members)]
+    company = Company(name=name, description=name, hidden=False, owner=owner)
+    get_db.add_all([owner, invited, requesting, outsider, company, *users])
+    await get_db.flush()
+    get_db.add_all(
+        CompanyAction(
+            company_id=company.id,
+            user_id=user.id,
+            type=CompanyActionType.ADMIN if i == 0 else CompanyActionType.MEMBERSHIP,
+        )
+        for i, user in enumerate(users)
+    )
+    get_db.add_all([
+        CompanyAction(company_id=company.id, user_id=invited.id, type=CompanyActionType.INVITATION),
+        CompanyAction(company_id=company.id, user_id=requesting.id, type=CompanyActionType.REQUEST),
+    ])
+    await get_db.commit()
+
+    quizz = await quizz_service.create_quizz(
+        QuizzCreateSchema(
+            title=name,
+            description=name,
+            frequency=1,
+            company_id=company.id,
+            questions=[
+                QuestionCreateSchema(
+                    text=f'question {q}',
+                    answers=[
+                        AnswerCreateSchema(text='wrong', is_correct=False),
+                        AnswerCreateSchema(text='right', is_correct=True),
+                        AnswerCreateSchema(text='also wrong', is_correct=False),
+                    ],
+                )
+                for q in range(questions)
+            ],
+        ),
+        company.id,
+    )
+    for user in users:
+        for attempt in range(2):
+            completion = QuizzCompletionSchema(
+                quizz_id=quizz.id,
+                questions=[
+                    QuestionCompletionSchema(question_id=question.id, answer_ids={question.answers[attempt].id})
+                    for question in quizz.questions
+                ],
+            )
+            await quizz_service.evaluate_quizz(quizz, completion, UserDetail.model_validate(user))
+    return Dataset(
+        company.id,
+        *(UserDetail.model_validate(user) for user in (owner, users[0], users[-1], invited, requesting, outsider)),
+        quizz,
+    )
+
+
+@dataclass
+class Endpoint:
+    method: str
+    # route template, as the request metrics label it
+    route: str
+    as_owner: bool
+    max_queries: int
+    max_redis_commands: int
+    params: Optional[dict[str, str]] = None
+    # dataset user in the route, who also sends requests which are not sent as owner
+    user: str = 'member'
+    # arguments of the request with a body
+    payload: Optional[Callable[[Dataset], dict]] = None
+
+
+ENDPOINTS = [
+    # quizzes
+    Endpoint('GET', '/quizzes/{quizz_id}/', False, 6, 2),
+    Endpoint('GET', '/quizzes/{quizz_id}/correct/', True, 5, 0),
+    Endpoint('GET', '/quizzes/{quizz_id}/average/', True, 4, 0),
+    Endpoint('GET', '/quizzes/{quizz_id}/analytics/', True, 8, 2),
+    Endpoint('GET', '/quizzes/{quizz_id}/responses/my/', False, 1, 1),
+    Endpoint('GET', '/quizzes/{quizz_id}/responses/{user_id}/', True, 4, 1),
+    Endpoint('GET', '/quizzes/{quizz_id}/responses/{user_id}/', True, 9, 1, {'format': 'csv'}),
+    Endpoint('GET', '/quizzes/{quizz_id}/responses/', True, 9, 1),
+    Endpoint('GET', '/quizzes/{quizz_id}/responses/', True, 9, 1, {'format': 'csv'}),
+    Endpoint('GET', '/quizzes/{quizz_id}/completions/{user_id}/', True, 4, 0),
+    Endpoint('GET', '/quizzes/{quizz_id}/completions/{user_id}/average/', True, 5, 0),
+    # companies
+    Endpoint('GET', '/companies/', False, 3, 0),
+    Endpoint('GET', '/companies/my/', False, 2, 0),
+    Endpoint('GET', '/companies/{company_id}', False, 4, 2),
+    Endpoint('GET', '/companies/{company_id}/role/', False, 3, 2),
+    Endpoint('GET', '/companies/{company_id}/members/', False, 3, 0),
+    Endpoint('GET', '/companies/{company_id}/admins/', True, 3, 0),
+    Endpoint('GET', '/companies/{company_id}/invites/', True, 3, 0),
+    Endpoint('GET', '/companies/{company_id}/requests/', True, 3, 0),
+    Endpoint('GET', '/companies/{company_id}/quizzes/', False, 5, 4),
+    Endpoint('GET', '/companies/{company_id}/quizzes/average/', False, 4, 2),
+    Endpoint('GET', '/companies/{company_id}/quizzes/average/members/', True, 4, 0),
+    Endpoint('GET', '/companies/{company_id}/quizzes/responses/{user_id}/', False, 9, 2),
+    Endpoint('GET', '/companies/{company_id}/quizzes/responses/', True, 8, 0),
+    Endpoint('GET', '/companies/{company_id}/quizzes/responses/', True, 8, 0, {'format': 'csv'}),
+    # users
+    Endpoint('GET', '/users/', False, 3, 0),
+    Endpoint('GET', '/users/me/', False, 2, 0),
+    Endpoint('GET', '/users/{user_id}/', False, 2, 0),
+    Endpoint('GET', '/users/{user_id}/companies/', False, 2, 0),
+    Endpoint('GET', '/users/{user_id}/invites/', False, 2, 0),
+    Endpoint('GET', '/users/{user_id}/requests/', False, 2, 0),
+    Endpoint('GET', '/users/{user_id}/quizzes/average/', False, 2, 0),
+    Endpoint('GET', '/users/{user_id}/quizz_responses/', False, 7, 0),
+    Endpoint('GET', '/users/{user_id}/quizzes/latest/', False, 2, 0),
+    Endpoint('GET', '/notifications/', False, 2, 0),
+    Endpoint('POST', '/quizzes/complete/', False, 9, 3, payload=Dataset.completion),
+    # quizz edits
+    Endpoint('POST', '/quizzes/', True, 20, 1, payload=Dataset.new_quizz),
+    Endpoint('PUT', '/quizzes/{quizz_id}/', True, 6, 0, payload=json_body(UPDATED_QUIZZ)),
+    Endpoint('DELETE', '/quizzes/{quizz_id}/', True, 4, 2),
+    Endpoint('POST', '/quizzes/import/{company_id}/', True, 10, 1, payload=Dataset.quizz_workbook),
+    Endpoint('POST', '/quizzes/{quizz_id}/question/', True, 11, 0, payload=json_body(NEW_QUESTION)),
+    Endpoint('PUT', '/quizzes/{quizz_id}/question/{question_id}/', True, 8, 1, payload=json_body({'text': 'new'})),
+    Endpoint('DELETE', '/quizzes/{quizz_id}/question/{question_id}/', True, 8, 1),
+    Endpoint('POST', '/quizzes/{quizz_id}/question/{question_id}/answer/', True, 9, 0, payload=json_body(NEW_ANSWER)),
+    Endpoint('PUT', '/quizzes/{quizz_id}/answer/{answer_id}/', True, 9, 1, payload=json_body(NEW_ANSWER)),
+    Endpoint('DELETE', '/quizzes/{quizz_id}/answer/{answer_id}/', True, 9, 1),
+    # invites, requests and membership changes made by the company
+    Endpoint('POST', '/companies/{company_id}/invites/', True, 6, 1, payload=Dataset.invite_outsider),
+    Endpoint('DELETE', '/companies/{company_id}/invites/{user_id}', True, 3, 1, user='invited'),
+    Endpoint('POST', '/companies/{company_id}/requests/{user_id}', True, 7, 1, user='requesting'),
+    Endpoint('DELETE', '/companies/{company_id}/requests/{user_id}', True, 3, 1, user='requesting'),
+    Endpoint('DELETE', '/companies/{company_id}/members/{user_id}', True, 4, 1),
+    Endpoint('POST', '/companies/{company_id}/admins/', True, 7, 1, payload=Dataset.promote_member),
+    Endpoint('DELETE', '/companies/{company_id}/admins/{user_id}', True, 5, 1, user='admin'),
+    # and by the user
+    Endpoint('POST', '/users/{user_id}/invites/{company_id}/', False, 8, 1, user='invited'),
+    Endpoint('DELETE', '/users/{user_id}/invites/{company_id}/', False, 3, 1, user='invited'),
+    Endpoint('POST', '/users/{user_id}/requests/{company_id}/', False, 7, 1, user='outsider'),
+    Endpoint('DELETE', '/users/{user_id}/requests/{company_id}/', False, 3, 1, user='requesting'),
+    Endpoint('DELETE', '/users/{user_id}/companies/{company_id}/', False, 4, 1),
+]
+
+
+def count_request(
+    client: TestClient, auth_service: AuthenticationService, endpoint: Endpoint, dataset: Dataset
+) -> tuple[int, int]:
+    """Statements and redis round trips of one request, taken from the request metrics."""
+    path_user = getattr(dataset, endpoint.user)
+    user = dataset.owner if endpoint.as_owner else path_user
+    labels = (endpoint.method, endpoint.route)
+    requests = REQUEST_QUERIES.count(*labels)
+    queries = REQUEST_QUERIES.sum(*labels)
+    redis_commands = REQUEST_REDIS_COMMANDS.sum(*labels)
+
+    response = client.request(
+        endpoint.method,
+        endpoint.route.format(**dataset.path_params(path_user.id)),
+        params=endpoint.params,
+        headers={'Authorization': f'Bearer {auth_service.generate_jwt_token(user)}'},
+        **(endpoint.payload(dataset) if endpoint.payload else {}),
+    )
+
+    assert response.is_success, response.text
+    assert REQUEST_QUERIES.count(*labels) == requests + 1, 'route template does not match the request'
+    return (
+        int(REQUEST_QUERIES.sum(*labels) - queries),
+        int(REQUEST_REDIS_COMMANDS.sum(*labels) - redis_commands),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'endpoint',
+    ENDPOINTS,
+    ids=[f'{endpoint.method} {endpoint.route} {endpoint.params or ""}'.strip() for endpoint in ENDPOINTS],
+)
+async def test_endpoint_statements_do_not_grow_with_data(
+    client: TestClient,
+    get_db,
+    quizz_service: QuizzService,
+    auth_service: AuthenticationService,
+    endpoint: Endpoint,
+):
+    small = await seed(get_db, quizz_service, 'small', members=2, questions=2)
+    large = await seed(get_db, quizz_service, 'large', members=6, questions=4)
+
+    small_counts = count_request(client, auth_service, endpoint, small)
+    large_counts = count_request(client, auth_service, endpoint, large)
+
+    assert large_counts[0] <= small_counts[0], f'statements grow with data: {small_counts[0]} -> {large_counts[0]}'
+    assert large_counts[1] <= small_counts[1], f'redis commands grow with data: {small_counts[1]} -> {large_counts[1]}'
+    assert large_counts[0] <= endpoint.max_queries
+    assert large_counts[1] <= endpoint.max_redis_commands
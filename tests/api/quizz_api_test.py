@@ -1,11 +1,16 @@
+import io
+
 from fastapi.testclient import TestClient
+import openpyxl
 import pytest
 
 from app.db.models import CompanyActionType
 from app.repositories.company_action_repository import CompanyActionRepository
 from app.repositories.quizz_repository import QuizzRepository
 from app.schemas.company_schema import CompanySchema
-from app.schemas.quizz_schema import AnswerCreateSchema, QuestionCreateSchema, QuizzCreateSchema, QuizzSchema
+from app.schemas.quizz_schema import (
+    AnswerCreateSchema, QuestionCompletionSchema, QuestionCreateSchema, QuizzCompletionSchema, QuizzCreateSchema, QuizzSchema
+)
 from app.schemas.user_shema import UserSchema
 from app.services.authentication_service.service import AuthenticationService
 from app.services.quizz_service.service import QuizzService
@@ -406,3 +411,165 @@ def test_cannot_update_only_correct_answer_to_false(
         'Authorization': f'Bearer {auth_service.generate_jwt_token(company_and_users[1])}'
     })
     assert response.json()['detail'] == 'Question must have at least one correct answers'
+
+
+def test_company_quizzes_cursor_pagination(
+    client: TestClient,
+    company_and_users: tuple[CompanySchema, UserSchema, UserSchema],
+    auth_service: AuthenticationService,
+    test_quizz: QuizzSchema,
+):
+    headers = {'Authorization': f'Bearer {auth_service.generate_jwt_token(company_and_users[1])}'}
+    response = client.get(f'/companies/{test_quizz.company_id}/quizzes/', params={'limit': 1}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['quizzes'][0]['id'] == str(test_quizz.id)
+
+    next_cursor = response.json()['next_cursor']
+    response = client.get(
+        f'/companies/{test_quizz.company_id}/quizzes/', params={'limit': 1, 'cursor': next_cursor}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()['quizzes'] == []
+    assert response.json()['total_count'] == 1
+
+
+async def test_company_responses_csv_export_is_streamed(
+    client: TestClient,
+    company_and_users: tuple[CompanySchema, UserSchema, UserSchema],
+    auth_service: AuthenticationService,
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+):
+    company, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+
+    headers = {'Authorization': f'Bearer {auth_service.generate_jwt_token(owner)}'}
+    with client.stream(
+        'GET', f'/companies/{company.id}/quizzes/responses/', params={'format': 'csv'}, headers=headers
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/csv')
+        assert 'content-length' not in response.headers
+        body = response.read().decode()
+
+    assert body.splitlines() == [
+        'Quizz,User,Question,Answer,Is Correct',
+        f'Test quizz,{owner.email},{question.text},{question.answers[1].text},True',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_quizz_analytics_are_visible_to_owner_only(
+    client: TestClient,
+    company_and_users: tuple[CompanySchema, UserSchema, UserSchema],
+    company_action_repo: CompanyActionRepository,
+    auth_service: AuthenticationService,
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+):
+    company, owner, user = company_and_users
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, user)
+
+    response = client.get(f'/quizzes/{test_quizz.id}/analytics/', headers={
+        'Authorization': f'Bearer {auth_service.generate_jwt_token(owner)}'
+    })
+    assert response.status_code == 200
+    analytics = response.json()
+    assert analytics['attempts'] == 1
+    assert analytics['questions'][0]['correct_rate'] == 1
+    assert [answer['count'] for answer in analytics['questions'][0]['answers']] == [0, 1, 0]
+
+    response = client.get(f'/quizzes/{test_quizz.id}/analytics/', headers={
+        'Authorization': f'Bearer {auth_service.generate_jwt_token(user)}'
+    })
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_answer_key_change_rescores_results_in_background(
+    client: TestClient,
+    company_and_users: tuple[CompanySchema, UserSchema, UserSchema],
+    auth_service: AuthenticationService,
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+):
+    _, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+    headers = {'Authorization': f'Bearer {auth_service.generate_jwt_token(owner)}'}
+
+    response = client.get(f'/quizzes/{test_quizz.id}/rescore/', headers=headers)
+    assert response.status_code == 404
+
+    response = client.put(
+        f'/quizzes/{test_quizz.id}/answer/{question.answers[2].id}/',
+        json={'text': question.answers[2].text, 'is_correct': True},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = client.get(f'/quizzes/{test_quizz.id}/rescore/', headers=headers)
+    assert response.status_code == 200
+    assert response.json()['status'] == 'done'
+    assert response.json()['updated'] == 1
+    assert (await quizz_repo.get_latest_quizz_result(owner.id, test_quizz.id)).score == 50
+
+
+@pytest.mark.asyncio
+async def test_import_changing_answer_key_rescores_results(
+    client: TestClient,
+    company_and_users: tuple[CompanySchema, UserSchema, UserSchema],
+    auth_service: AuthenticationService,
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+):
+    company, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+    headers = {'Authorization': f'Bearer {auth_service.generate_jwt_token(owner)}'}
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['QUIZZ TITLE:', test_quizz.title])
+    sheet.append(['QUIZZ DESCRIPTION:', test_quizz.description])
+    sheet.append(['QUIZZ FREQUENCY:', test_quizz.frequency])
+    sheet.append(['QUESTION:', question.text])
+    sheet.append(['ANSWER:', question.answers[0].text])
+    sheet.append(['ANSWER:', question.answers[1].text, 'CORRECT'])
+    sheet.append(['ANSWER:', question.answers[2].text, 'CORRECT'])
+    file = io.BytesIO()
+    workbook.save(file)
+
+    response = client.post(
+        f'/quizzes/import/{company.id}/',
+        files={'excel_file': ('quizz.xlsx', file.getvalue())},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = client.get(f'/quizzes/{test_quizz.id}/rescore/', headers=headers)
+    assert response.status_code == 200
+    assert response.json()['status'] == 'done'
+    assert (await quizz_repo.get_latest_quizz_result(owner.id, test_quizz.id)).score == 50
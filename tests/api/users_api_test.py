@@ -366,3 +366,8 @@ async def test_get_me(
     assert data['first_name'] == 'John'
     assert data['last_name'] == 'Snow'
     assert 'hashed_password' not in data
+
+
+def test_get_user_list_invalid_cursor(client: TestClient, fake_authentication):
+    response = client.get('/users/', params={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
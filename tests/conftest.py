@@ -1,12 +1,30 @@
+import asyncio
+import os
+
 import alembic
 import pytest
 from alembic.config import Config
 from fastapi.testclient import TestClient
-from typing import Generator
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from typing import AsyncGenerator, Generator
+
+from app.core.config import settings
+
+# every pytest-xdist worker gets a database of its own, renamed before the app creates its engine
+WORKER_ID = os.environ.get('PYTEST_XDIST_WORKER')
+MAINTENANCE_DSN = settings.postgres_dsn
+if WORKER_ID:
+    settings.POSTGRES_DB = f'{settings.POSTGRES_DB}_{WORKER_ID}'
+# and a redis database of its own, flushed after each test, database 0 is left to the app
+settings.REDIS_DB = 1 + (int(WORKER_ID[len('gw'):]) if WORKER_ID else 0)
 
 from app.core.security import get_current_user
 from app.main import app
-from app.db.db import async_session
+from app.db.db import async_session, engine
+from app.db.models import Base
+from app.redis import get_redis_client
 from app.repositories import UserRepository
 from app.repositories.company_action_repository import CompanyActionRepository
 from app.repositories.company_repository import CompanyRepository
@@ -22,14 +40,48 @@ from app.services.quizz_service.service import QuizzService
 from app.services.users_service import UserService
 
 
-@pytest.fixture(autouse=True)
+async def recreate_worker_database() -> None:
+    maintenance = create_async_engine(MAINTENANCE_DSN, isolation_level='AUTOCOMMIT', poolclass=NullPool)
+    async with maintenance.connect() as connection:
+        await connection.execute(text(f'DROP DATABASE IF EXISTS "{settings.POSTGRES_DB}" WITH (FORCE)'))
+        await connection.execute(text(f'CREATE DATABASE "{settings.POSTGRES_DB}"'))
+    await maintenance.dispose()
+
+
+@pytest.fixture(scope='session', autouse=True)
 def apply_migrations() -> Generator[None, None, None]:
+    """Migrates once per session, tests are isolated by clean_database."""
+    if WORKER_ID:
+        asyncio.run(recreate_worker_database())
     config = Config('alembic.ini')
+    # a run which was interrupted leaves its schema and rows behind
+    alembic.command.downgrade(config, 'base')
     alembic.command.upgrade(config, 'head')
     yield
     alembic.command.downgrade(config, 'base')
 
 
+@pytest.fixture(autouse=True)
+async def clean_database() -> AsyncGenerator[None, None]:
+    """Empties all tables and the redis database after each test, one TRUNCATE instead of migrating down and up again.
+
+    Rolling back a savepoint is not enough here: requests of TestClient run on a loop of their own
+    and services open sessions of their own and commit them.
+    """
+    yield
+    tables = ', '.join(f'"{table.name}"' for table in Base.metadata.sorted_tables)
+    async with engine.begin() as connection:
+        await connection.execute(text(f'TRUNCATE {tables} RESTART IDENTITY CASCADE'))
+    redis = await get_redis_client()
+    await redis.flushdb()
+    await redis.close()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'QUERY_BUDGET_STRICT', True)
+
+
 @pytest.fixture(scope='module')
 def client() -> Generator[TestClient, None, None]:
     with TestClient(app) as c:
@@ -0,0 +1,199 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from app.db.models import CompanyActionType
+from app.redis import get_redis_client
+from app.redis.cache_writer import CircuitBreaker, ResilientCacheWriter
+from app.repositories.company_action_repository import (
+    COMPANY_ROLES_TTL_SECONDS, ROLES_VERSION_FIELD, CompanyActionRepository
+)
+from app.repositories.company_repository import CompanyRepository
+from app.schemas.company_schema import CompanyCreateSchema
+from app.services.company_service.exceptions import CompanyNotFoundException
+from app.services.company_service.service import CompanyService
+
+
+@pytest.mark.asyncio
+async def test_role_is_cached_on_first_check(
+    company_service: CompanyService,
+    company_and_users,
+):
+    company, owner, _ = company_and_users
+
+    await company_service.check_is_member(company.id, owner.id)
+
+    redis = await get_redis_client()
+    cached = await redis.hgetall(f'company_roles:{company.id}')
+    ttl = await redis.ttl(f'company_roles:{company.id}')
+    await redis.close()
+    assert cached[str(owner.id).encode()] == b'membership'
+    # lost invalidations leave a stale role for at most a few minutes
+    assert 0 < ttl <= COMPANY_ROLES_TTL_SECONDS <= 5 * 60
+
+
+@pytest.mark.asyncio
+async def test_created_membership_is_visible_in_cache(
+    company_service: CompanyService,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+):
+    company, _, user = company_and_users
+    assert await company_service.get_user_role_in_company(company.id, user.id) == 'none'
+
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+
+    assert await company_service.get_user_role_in_company(company.id, user.id) == 'member'
+    await company_service.check_is_member(company.id, user.id)
+
+
+@pytest.mark.asyncio
+async def test_updated_role_is_visible_in_cache(
+    company_service: CompanyService,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+):
+    company, owner, user = company_and_users
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+    with pytest.raises(CompanyNotFoundException):
+        await company_service.check_owner_or_admin(company.id, user.id)
+
+    await company_service.add_admin(company.id, user.id, owner)
+
+    await company_service.check_owner_or_admin(company.id, user.id)
+    assert await company_service.get_user_role_in_company(company.id, user.id) == 'admin'
+
+
+@pytest.mark.asyncio
+async def test_removed_member_is_evicted_from_cache(
+    company_service: CompanyService,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+):
+    company, owner, user = company_and_users
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+    await company_service.check_is_member(company.id, user.id)
+
+    await company_service.remove_member(company.id, user.id, owner)
+
+    with pytest.raises(CompanyNotFoundException):
+        await company_service.check_is_member(company.id, user.id)
+
+
+@pytest.mark.asyncio
+async def test_reload_read_before_change_is_not_cached(
+    company_service: CompanyService,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+):
+    company, _, user = company_and_users
+    key = f'company_roles:{company.id}'
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+    redis = await get_redis_client()
+    version = await redis.hget(key, ROLES_VERSION_FIELD)
+    stale_roles = await company_action_repo._get_company_roles(company.id)
+
+    # member is removed after a concurrent reader loaded roles but before it stored them
+    await company_action_repo.delete(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo._store_roles(redis, key, version, stale_roles)
+
+    assert str(user.id).encode() not in await redis.hgetall(key)
+    await redis.close()
+    with pytest.raises(CompanyNotFoundException):
+        await company_service.check_is_member(company.id, user.id)
+
+
+@pytest.mark.asyncio
+async def test_roles_are_read_from_database_when_redis_is_down(
+    company_service: CompanyService,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+    monkeypatch,
+):
+    async def unavailable_redis():
+        raise ConnectionError('redis is down')
+
+    writer = ResilientCacheWriter(
+        timeout_seconds=0.5, queue_size=10, breaker=CircuitBreaker(1, 60), redis_factory=unavailable_redis
+    )
+    monkeypatch.setattr('app.repositories.company_action_repository.cache_writer', writer)
+    company, owner, user = company_and_users
+
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+    await company_service.check_is_member(company.id, user.id)
+    assert await company_service.get_user_role_in_company(company.id, user.id) == 'member'
+    assert writer.breaker.is_open
+    # invalidation is replayed once redis is back
+    assert writer.is_pending(f'company_roles:{company.id}')
+
+
+@pytest.mark.asyncio
+async def test_deleting_other_action_type_keeps_cached_role(
+    company_service: CompanyService,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+):
+    company, _, user = company_and_users
+    company_action_repo.create(company.id, user.id, CompanyActionType.MEMBERSHIP)
+    await company_action_repo.commit()
+    await company_service.check_is_member(company.id, user.id)
+
+    await company_action_repo.delete(company.id, user.id, CompanyActionType.REQUEST)
+
+    await company_service.check_is_member(company.id, user.id)
+
+
+@pytest.mark.asyncio
+async def test_company_deletion_drops_cached_roles(
+    company_service: CompanyService,
+    company_and_users,
+):
+    company, owner, _ = company_and_users
+    await company_service.check_is_member(company.id, owner.id)
+
+    await company_service.delete_company(company.id, owner)
+
+    redis = await get_redis_client()
+    assert not await redis.exists(f'company_roles:{company.id}')
+    await redis.close()
+
+
+@pytest.mark.asyncio
+async def test_company_listings_load_owner_eagerly(
+    company_repo: CompanyRepository,
+    company_action_repo: CompanyActionRepository,
+    company_and_users,
+):
+    _, owner, _ = company_and_users
+    company_repo.db.expunge_all()
+
+    companies, _, _ = await company_repo.get_all_companies(0, 10)
+    owned, _ = await company_repo.get_companies_by_owner_id(owner.id, True, 0, 10)
+    related = await company_action_repo.get_companies_related_to_user(owner.id, CompanyActionType.MEMBERSHIP)
+    part_of = await company_action_repo.get_companies_user_is_part_of(owner.id)
+
+    for company in [*companies, *owned, *related, *part_of]:
+        assert 'owner' not in inspect(company).unloaded
+        assert company.owner.id == owner.id
+
+
+@pytest.mark.asyncio
+async def test_public_companies_estimated_count(
+    company_repo: CompanyRepository,
+    company_service: CompanyService,
+    company_and_users,
+):
+    company, owner, _ = company_and_users
+    await company_service.create_company(CompanyCreateSchema(name='HIDDEN', description='HIDDEN', hidden=True), owner)
+    await company_service._company_repository.db.execute(text('ANALYZE companies'))
+    company_service._company_repository.exact_count_threshold = 0
+
+    companies = await company_service.get_all_companies(1, 10, count_mode='estimate')
+
+    assert companies.count_mode == 'estimate'
+    assert [c.id for c in companies.companies] == [company.id]
+    assert companies.total_count >= 1
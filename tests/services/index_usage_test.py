@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+from app.db.db import engine
+from app.db.models import CompanyActionType
+from app.repositories import UserRepository
+from app.repositories.company_action_repository import CompanyActionRepository
+from app.repositories.company_repository import CompanyRepository
+from app.repositories.notification_repository import NotificationRepository
+from app.repositories.quizz_repository import QuizzRepository
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = [plan['Relation Name']] if plan['Node Type'] == 'Seq Scan' else []
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def assert_index_scans(db, statements):
+    # tables in tests are tiny and planner rightly prefers seq scans there,
+    # with seq scans penalized any remaining one means there is no usable index
+    await db.execute(text('SET LOCAL enable_seqscan = off'))
+    connection = await db.connection()
+    for statement, parameters in statements:
+        results = await connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters)
+        plan = results.scalar_one()[0]['Plan']
+        assert not seq_scans(plan), statement
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(
+    user_repo: UserRepository,
+    company_repo: CompanyRepository,
+    company_action_repo: CompanyActionRepository,
+    quizz_repo: QuizzRepository,
+    notification_repo: NotificationRepository,
+    company_and_users,
+    test_quizz,
+):
+    company, owner, user = company_and_users
+    question = (await quizz_repo.get_quizz_questions(test_quizz.id))[0]
+
+    with captured_statements() as statements:
+        await user_repo.get_all_users(0, 10)
+        await company_repo.get_all_companies(0, 10)
+        await company_repo.get_companies_by_owner_id(owner.id, True, 0, 10)
+        await company_action_repo.get_companies_related_to_user(user.id, CompanyActionType.MEMBERSHIP)
+        await company_action_repo.get_company_action_for_user_by_type(user.id, CompanyActionType.INVITATION)
+        await quizz_repo.get_company_quizzes_with_count(company.id, 0, 10)
+        await quizz_repo.get_quizz_questions(test_quizz.id)
+        await quizz_repo.get_question_answers(question.id)
+        await quizz_repo.get_latest_quizz_result(user.id, test_quizz.id)
+        await quizz_repo.get_average_score_by_quizz(test_quizz.id)
+        await quizz_repo.get_average_score_by_company(company.id)
+        await quizz_repo.get_user_responses(user.id)
+        await quizz_repo.get_user_responses_in_company(user.id, company.id)
+        await quizz_repo.get_company_members_responses(company.id)
+        await quizz_repo.get_quizz_question_stats(test_quizz.id)
+        await quizz_repo.get_quizz_answer_choice_counts(test_quizz.id)
+        await notification_repo.get_user_notifications(user.id)
+
+    await assert_index_scans(quizz_repo.db, statements)
@@ -1,7 +1,27 @@
+import uuid
+
+from sqlalchemy import delete, event, func, select
+
+from app.core.config import settings
+from app.db.db import engine
+from app.db.models import QuizzAnswerChoice, QuizzResult
 from app.redis import get_redis_client
-from app.schemas.quizz_schema import QuestionCompletionSchema, QuizzCompletionSchema, QuizzResultDisplaySchema, QuizzSchema
+from app.redis.backfill_answer_choices import backfill_answer_choices
+from app.redis.cache_writer import CircuitBreaker, ResilientCacheWriter
+from app.redis.instrumented import REDIS_COMMANDS, REDIS_FLAGGED_COMMANDS
+from app.redis.migrate_answer_keys import migrate_answer_keys
+from app.redis.response_codec import decode_response, encode_response
+from app.repositories import UserRepository
+from app.repositories.quizz_repository import QuizzRepository
+from app.schemas.quizz_schema import (
+    AnswerCreateSchema, ChoosenAnswerSchema, QuestionCompletionSchema, QuestionCreateSchema, QuestionResultSchema,
+    QuestionUpdateSchema, QuizzCompletionSchema, QuizzCreateSchema, QuizzDetailResultSchema, AnswerUpdateSchema, QuizzResultDisplaySchema, QuizzResultDisplayWithUserSchema, QuizzSchema
+)
 from app.services.quizz_service.exceptions import QuizzNotFound
+from app.services.quizz_service.rescoring import rescore_quizz
+from app.services.quizz_service.scoring import ScoringEngine, score_responses
 from app.services.quizz_service.service import QuizzService
+from app.utils.logging import logger
 
 
 async def test_evaluate_quizz_wrong(
@@ -118,8 +138,164 @@ async def test_caching_user_response(
     await quizz_service.evaluate_quizz(test_quizz, completion, owner)
     
     redis = await get_redis_client()
-    cache = await redis.get(f'answer:{owner.id}:{company.id}:{test_quizz.id}:{test_quizz.questions[0].id}:{test_quizz.questions[0].answers[1].id}')
-    assert cache == b'1'
+    cache = await redis.get(f'response:{owner.id}:{company.id}:{test_quizz.id}')
+    await redis.close()
+    response = decode_response(owner.id, test_quizz.id, cache)
+    assert len(response.questions[0].choosen_answers) == 1
+    assert response.questions[0].choosen_answers[0].answer_id == test_quizz.questions[0].answers[1].id
+    assert response.questions[0].choosen_answers[0].is_correct
+
+
+async def test_new_attempt_replaces_cached_one(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    question = test_quizz.questions[0]
+    company, owner, _ = company_and_users
+    for answer in (question.answers[0], question.answers[1]):
+        completion = QuizzCompletionSchema(
+            quizz_id=test_quizz.id,
+            questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[answer.id])]
+        )
+        await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+
+    redis = await get_redis_client()
+    keys = await redis.keys(f'response:{owner.id}:*:{test_quizz.id}')
+    cache = await redis.get(keys[0])
+    ttl = await redis.ttl(keys[0])
+    view = await redis.hget(f'response_views:{test_quizz.id}', str(owner.id))
+    await redis.close()
+    assert keys == [f'response:{owner.id}:{company.id}:{test_quizz.id}'.encode()]
+    assert ttl > 0
+    response = decode_response(owner.id, test_quizz.id, cache)
+    assert [answer.answer_id for answer in response.questions[0].choosen_answers] == [question.answers[1].id]
+    assert question.answers[1].text in view.decode()
+    assert question.answers[0].text not in view.decode()
+
+
+async def test_attempt_is_cached_after_redis_recovers(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users,
+    monkeypatch
+):
+    redis_calls = 0
+
+    async def unavailable_redis():
+        nonlocal redis_calls
+        redis_calls += 1
+        raise ConnectionError('redis is down')
+
+    writer = ResilientCacheWriter(
+        timeout_seconds=0.5, queue_size=10, breaker=CircuitBreaker(1, 60), redis_factory=unavailable_redis
+    )
+    monkeypatch.setattr('app.repositories.quizz_repository.cache_writer', writer)
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    company, owner, _ = company_and_users
+
+    assert (await quizz_service.evaluate_quizz(test_quizz, completion, owner)).score == 100
+    # circuit is open, second completion does not wait for redis
+    assert (await quizz_service.evaluate_quizz(test_quizz, completion, owner)).score == 100
+    assert redis_calls == 1
+    assert writer.breaker.is_open
+    assert writer.pending_count == 2
+
+    writer.breaker.reset_seconds = 0
+    writer._redis_factory = get_redis_client
+    assert await writer.flush() == 2
+    assert writer.pending_count == 0
+    assert not writer.breaker.is_open
+    redis = await get_redis_client()
+    cache = await redis.get(f'response:{owner.id}:{company.id}:{test_quizz.id}')
+    await redis.close()
+    assert decode_response(owner.id, test_quizz.id, cache).questions[0].choosen_answers[0].is_correct
+
+
+async def test_invalidation_drops_queued_views(get_db, monkeypatch):
+    async def unavailable_redis():
+        raise ConnectionError('redis is down')
+
+    writer = ResilientCacheWriter(
+        timeout_seconds=0.5, queue_size=1, breaker=CircuitBreaker(5, 60), redis_factory=unavailable_redis
+    )
+    monkeypatch.setattr('app.repositories.quizz_repository.cache_writer', writer)
+    quizz_repository = QuizzRepository(get_db)
+    response = QuizzDetailResultSchema(user_id=uuid.uuid4(), quizz_id=uuid.uuid4(), questions=[])
+    await quizz_repository.replace_cached_attempt(response.user_id, uuid.uuid4(), response.quizz_id, response, b'{}')
+    # bounded queue keeps the latest write only
+    assert writer.pending_count == 1
+    await quizz_repository.delete_cached_response_views(response.quizz_id)
+    # queued view is replaced by the deletion, which waits for redis
+    assert writer.pending_count == 1
+    assert writer.is_pending(f'response_views:{response.quizz_id}')
+    assert await quizz_repository.get_cached_response_view(response.user_id, response.quizz_id) is None
+
+
+async def test_responses_are_read_from_database_while_redis_is_down(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users,
+    monkeypatch
+):
+    async def unavailable_redis():
+        raise ConnectionError('redis is down')
+
+    def completion(answer):
+        return QuizzCompletionSchema(
+            quizz_id=test_quizz.id,
+            questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[answer.id])]
+        )
+
+    question = test_quizz.questions[0]
+    company, owner, _ = company_and_users
+    await quizz_service.evaluate_quizz(test_quizz, completion(question.answers[0]), owner)
+    writer = ResilientCacheWriter(
+        timeout_seconds=0.5, queue_size=10, breaker=CircuitBreaker(1, 60), redis_factory=unavailable_redis
+    )
+    monkeypatch.setattr('app.repositories.quizz_repository.cache_writer', writer)
+    # redis keeps the first attempt, the second one waits in the queue
+    await quizz_service.evaluate_quizz(test_quizz, completion(question.answers[1]), owner)
+    pending = writer.pending_count
+
+    responses = await quizz_repo.get_users_quizz_responses([owner.id], company.id, test_quizz.id)
+    response = await quizz_repo.get_user_quizz_response(owner.id, test_quizz.id)
+
+    for response in (*responses, response):
+        assert [answer.answer_id for answer in response.questions[0].choosen_answers] == [question.answers[1].id]
+    # responses read from the database are not queued for caching
+    assert writer.pending_count == pending
+
+
+async def test_redis_commands_are_reported_with_calling_method(
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users,
+    monkeypatch,
+    caplog
+):
+    company, owner, test_user = company_and_users
+    monkeypatch.setattr(settings, 'REDIS_LARGE_BATCH_KEYS', 1)
+    monkeypatch.setattr(settings, 'REDIS_SLOW_COMMAND_SECONDS', 0)
+    # logging config of alembic migrations disables app loggers
+    monkeypatch.setattr(logger, 'disabled', False)
+    commands = REDIS_COMMANDS.get('MGET', 'response:{id}:{id}:{id}')
+    flagged = REDIS_FLAGGED_COMMANDS.get('MGET', 'large_batch')
+
+    await quizz_repo.get_users_quizz_responses([owner.id, test_user.id], company.id, test_quizz.id)
+
+    assert REDIS_COMMANDS.get('MGET', 'response:{id}:{id}:{id}') == commands + 1
+    assert REDIS_FLAGGED_COMMANDS.get('MGET', 'large_batch') == flagged + 1
+    assert (
+        'Redis MGET response:{id}:{id}:{id} with 2 arguments (large_batch) in QuizzRepository._get_cached_responses'
+        in caplog.text
+    )
+    assert 'Slow redis MGET response:{id}:{id}:{id} took' in caplog.text
 
 
 async def test_get_response_from_cache_json(
@@ -174,6 +350,35 @@ async def test_get_response_from_cache_csv(
     assert result.startswith('Question,Answer,Is Correct')
 
 
+async def test_response_is_loaded_from_database_after_cache_expired(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    company, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+    key = f'response:{owner.id}:{company.id}:{test_quizz.id}'
+    redis = await get_redis_client()
+    await redis.delete(key, f'response_views:{test_quizz.id}')
+
+    response = await quizz_service.get_cached_user_response_json(owner.id, test_quizz.id)
+    members_responses = await quizz_service.get_company_members_responses_from_cache_json(company.id)
+    cached = await redis.get(key)
+    await redis.close()
+
+    assert response.score == 100
+    assert response.questions[0].text == question.text
+    assert response.questions[0].choosen_answers[0].text == question.answers[1].text
+    assert members_responses.responses == [response]
+    # hot tier is filled again on read
+    assert decode_response(owner.id, test_quizz.id, cached).questions[0].choosen_answers[0].is_correct
+
+
 async def test_raises_error_when_response_isnt_in_cache(
     quizz_service: QuizzService,
     company_and_users,
@@ -187,3 +392,435 @@ async def test_raises_error_when_response_isnt_in_cache(
         assert e.detail == 'User response not found'
     else:
         assert False
+
+
+async def test_company_responses_csv_is_streamed_in_chunks(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    company, owner, user = company_and_users
+    for respondent, answer in [(owner, test_quizz.questions[0].answers[1]), (user, test_quizz.questions[0].answers[0])]:
+        completion = QuizzCompletionSchema(
+            quizz_id=test_quizz.id,
+            questions=[QuestionCompletionSchema(question_id=test_quizz.questions[0].id, answer_ids=[answer.id])]
+        )
+        await quizz_service.evaluate_quizz(test_quizz, completion, respondent)
+
+    responses = quizz_repo.iter_latest_responses(QuizzResult.company_id == company.id, chunk_size=1)
+    chunks = [chunk async for chunk in quizz_service._user_responses_to_displayed_csv(responses)]
+
+    assert chunks[0].startswith('Quizz,User,Question,Answer,Is Correct')
+    assert len(chunks) == 3
+    rows = sorted(''.join(chunks[1:]).splitlines())
+    assert rows == sorted([
+        f'Test quizz,{owner.email},{test_quizz.questions[0].text},{test_quizz.questions[0].answers[1].text},True',
+        f'Test quizz,{user.email},{test_quizz.questions[0].text},{test_quizz.questions[0].answers[0].text},False',
+    ])
+
+
+async def test_company_responses_csv_queries_do_not_grow_with_rows(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    company, owner, user = company_and_users
+    question = test_quizz.questions[0]
+    for respondent in [owner, user]:
+        completion = QuizzCompletionSchema(
+            quizz_id=test_quizz.id,
+            questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[a.id for a in question.answers])]
+        )
+        await quizz_service.evaluate_quizz(test_quizz, completion, respondent)
+
+    statements = []
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_statement)
+    try:
+        responses = quizz_repo.iter_company_members_responses(company.id)
+        chunks = [chunk async for chunk in quizz_service._user_responses_to_displayed_csv(responses)]
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count_statement)
+
+    assert len(''.join(chunks).splitlines()) == 1 + 2 * len(question.answers)
+    # stored responses, quizz titles, question texts, answer texts, latest results and users
+    assert len(statements) == 6
+
+
+async def test_users_responses_json_is_rendered_in_fixed_number_of_queries(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, user = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+
+    statements = []
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_statement)
+    try:
+        result = await quizz_service.get_cached_users_responses_json([owner, user], test_quizz.id)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count_statement)
+
+    assert [response.user_email for response in result.responses] == [owner.email]
+    assert result.responses[0].score == 100
+    assert result.responses[0].questions[0].text == question.text
+    assert result.responses[0].questions[0].choosen_answers[0].text == question.answers[1].text
+    # quizz, questions, answers, stored responses of users missing in redis and latest results
+    assert len(statements) == 5
+
+
+async def test_users_responses_csv_is_streamed_per_chunk_of_users(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, user = company_and_users
+    question = test_quizz.questions[0]
+    for respondent, answer in [(owner, question.answers[1]), (user, question.answers[0])]:
+        completion = QuizzCompletionSchema(
+            quizz_id=test_quizz.id,
+            questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[answer.id])]
+        )
+        await quizz_service.evaluate_quizz(test_quizz, completion, respondent)
+
+    statements = []
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    chunks = quizz_service.get_cached_users_responses_csv([owner, user], test_quizz.id, chunk_size=1)
+    assert (await anext(chunks)).startswith('User,Question,Answer,Is Correct')
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_statement)
+    try:
+        first = await anext(chunks)
+        # responses of the second user are not loaded before the rows of the first one are sent
+        first_statements = len(statements)
+        rest = [chunk async for chunk in chunks]
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count_statement)
+
+    assert first == f'{owner.email},{question.text},{question.answers[1].text},True\r\n'
+    assert rest == [f'{user.email},{question.text},{question.answers[0].text},False\r\n']
+    # latest results of the second chunk
+    assert len(statements) == first_statements + 1
+
+
+async def test_rendered_response_is_cached_on_completion_and_dropped_on_edit(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+
+    view = await quizz_repo.get_cached_response_view(owner.id, test_quizz.id)
+    expected = await quizz_service.get_cached_user_response_json(owner.id, test_quizz.id)
+    assert view == expected.model_dump_json(exclude={'user_email'}).encode()
+    view_with_email = await quizz_service.get_cached_user_response_view(owner.id, test_quizz.id)
+    assert QuizzResultDisplayWithUserSchema.model_validate_json(view_with_email) == expected
+
+    await quizz_service.update_question(question.id, test_quizz.id, QuestionUpdateSchema(text='Edited question'))
+
+    assert await quizz_repo.get_cached_response_view(owner.id, test_quizz.id) is None
+    view = await quizz_service.get_cached_user_response_view(owner.id, test_quizz.id)
+    assert QuizzResultDisplayWithUserSchema.model_validate_json(view).questions[0].text == 'Edited question'
+    assert await quizz_repo.get_cached_response_view(owner.id, test_quizz.id) is not None
+
+
+async def test_cached_response_view_shows_current_email(
+    quizz_service: QuizzService,
+    user_repo: UserRepository,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[question.answers[1].id])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+
+    user = await user_repo.get_user_by_id(owner.id)
+    user_repo.update_user(user, {'email': 'renamed@example.com'})
+    await user_repo.commit_me(user)
+
+    view = await quizz_service.get_cached_user_response_view(owner.id, test_quizz.id)
+    assert QuizzResultDisplayWithUserSchema.model_validate_json(view).user_email == 'renamed@example.com'
+
+
+def test_response_codec_roundtrip():
+    question_id, answer_ids = uuid.uuid4(), [uuid.uuid4(), uuid.uuid4()]
+    response = QuizzDetailResultSchema(
+        user_id=uuid.uuid4(),
+        quizz_id=uuid.uuid4(),
+        questions=[
+            QuestionResultSchema(
+                question_id=question_id,
+                choosen_answers=[
+                    ChoosenAnswerSchema(answer_id=answer_ids[0], is_correct=True),
+                    ChoosenAnswerSchema(answer_id=answer_ids[1], is_correct=False),
+                ]
+            ),
+            QuestionResultSchema(question_id=uuid.uuid4(), choosen_answers=[]),
+        ]
+    )
+
+    data = encode_response(response)
+
+    assert decode_response(response.user_id, response.quizz_id, data) == response
+    # header, two questions and two answers
+    assert len(data) == 3 + 2 * 17 + 2 * 17
+
+
+async def test_legacy_answer_keys_are_migrated():
+    user_id, company_id, quizz_id, question_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    correct, wrong = uuid.uuid4(), uuid.uuid4()
+    redis = await get_redis_client()
+    await redis.set(f'answer:{user_id}:{company_id}:{quizz_id}:{question_id}:{correct}', 1, ex=3600)
+    await redis.set(f'answer:{user_id}:{company_id}:{quizz_id}:{question_id}:{wrong}', 0, ex=3600)
+
+    assert await migrate_answer_keys(redis) >= 1
+
+    assert await redis.keys(f'answer:{user_id}:*') == []
+    key = f'response:{user_id}:{company_id}:{quizz_id}'
+    assert 0 < await redis.ttl(key) <= 3600
+    response = decode_response(user_id, quizz_id, await redis.get(key))
+    await redis.close()
+    assert response.questions[0].question_id == question_id
+    assert {(a.answer_id, a.is_correct) for a in response.questions[0].choosen_answers} == {
+        (correct, True), (wrong, False)
+    }
+
+
+async def test_cached_attempts_are_backfilled_to_database(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users,
+    get_db
+):
+    _, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[a.id for a in question.answers])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+    # attempt completed before choices were stored
+    await get_db.execute(delete(QuizzAnswerChoice))
+    await get_db.commit()
+
+    redis = await get_redis_client()
+    assert await backfill_answer_choices(get_db, redis) == 1
+    assert await backfill_answer_choices(get_db, redis) == 0
+    await redis.close()
+    assert await get_db.scalar(select(func.count()).select_from(QuizzAnswerChoice)) == len(question.answers)
+
+
+async def test_deleted_answer_keeps_attempt_history(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users,
+    get_db
+):
+    _, owner, _ = company_and_users
+    question = test_quizz.questions[0]
+    completion = QuizzCompletionSchema(
+        quizz_id=test_quizz.id,
+        questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[a.id for a in question.answers])]
+    )
+    await quizz_service.evaluate_quizz(test_quizz, completion, owner)
+
+    await quizz_service.delete_answer(question.answers[2].id, test_quizz.id)
+
+    choices = (await get_db.execute(select(QuizzAnswerChoice.answer_id))).scalars().all()
+    assert len(choices) == len(question.answers)
+    assert choices.count(None) == 1
+    response = (await quizz_repo.get_latest_responses(QuizzResult.quizz_id == test_quizz.id))[0]
+    assert {answer.answer_id for answer in response.questions[0].choosen_answers} == {
+        answer.id for answer in question.answers[:2]
+    }
+
+
+async def test_question_analytics(
+    quizz_service: QuizzService,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, user = company_and_users
+    await quizz_service.add_question_to_quizz(test_quizz.id, QuestionCreateSchema(
+        text='Second question',
+        answers=[AnswerCreateSchema(text='yes', is_correct=True), AnswerCreateSchema(text='no', is_correct=False)]
+    ))
+    quizz = await quizz_service.fetch_quizz_questions(await quizz_service.get_quizz(test_quizz.id))
+    first, second = quizz.questions
+    # owner gets both questions right, user only the second one
+    for respondent, first_answer in [(owner, first.answers[1]), (user, first.answers[0])]:
+        completion = QuizzCompletionSchema(
+            quizz_id=quizz.id,
+            questions=[
+                QuestionCompletionSchema(question_id=first.id, answer_ids=[first_answer.id]),
+                QuestionCompletionSchema(question_id=second.id, answer_ids=[second.answers[0].id]),
+            ]
+        )
+        await quizz_service.evaluate_quizz(quizz, completion, respondent)
+
+    analytics = await quizz_service.get_quizz_analytics(quizz.id)
+
+    assert analytics.attempts == 2
+    first_stats, second_stats = analytics.questions
+    assert (first_stats.correct_rate, first_stats.discrimination_index) == (0.5, 1)
+    assert (second_stats.correct_rate, second_stats.discrimination_index) == (1, 0)
+    assert [(answer.text, answer.count, answer.share) for answer in first_stats.answers] == [
+        ('option 1', 1, 0.5), ('option 2', 1, 0.5), ('option 3', 0, 0)
+    ]
+    assert first_stats.seconds_since_edit >= 0
+
+
+async def test_scoring_engine_matches_evaluate_quizz(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, _ = company_and_users
+    await quizz_service.add_question_to_quizz(test_quizz.id, QuestionCreateSchema(
+        text='Second question',
+        answers=[
+            AnswerCreateSchema(text='a', is_correct=True),
+            AnswerCreateSchema(text='b', is_correct=True),
+            AnswerCreateSchema(text='c', is_correct=False),
+        ]
+    ))
+    quizz = await quizz_service.fetch_quizz_questions(await quizz_service.get_quizz(test_quizz.id))
+    first, second = quizz.questions
+    answer_sets = [
+        ([first.answers[1]], [second.answers[0], second.answers[1]]),
+        ([first.answers[1]], [second.answers[0]]),
+        ([first.answers[0]], [second.answers[0], second.answers[2]]),
+        ([first.answers[1], first.answers[2]], []),
+    ]
+    completions = [
+        QuizzCompletionSchema(
+            quizz_id=quizz.id,
+            questions=[
+                QuestionCompletionSchema(question_id=question.id, answer_ids=[answer.id for answer in answers])
+                for question, answers in zip(quizz.questions, answer_set) if answers
+            ]
+        )
+        for answer_set in answer_sets
+    ]
+
+    expected = [(await quizz_service.evaluate_quizz(quizz, completion, owner)).score for completion in completions]
+    engine = ScoringEngine(await quizz_repo.get_quizz_answers(quizz.id))
+
+    assert expected == [100, 75, 0, 0]
+    assert engine.score(engine.encode_completions(completions)).tolist() == expected
+    stored = await quizz_repo.get_user_responses(owner.id)
+    assert score_responses(await quizz_repo.get_quizz_answers(quizz.id), stored) == [0]
+
+    unknown_answer = QuizzCompletionSchema(
+        quizz_id=quizz.id, questions=[QuestionCompletionSchema(question_id=first.id, answer_ids=[second.answers[0].id])]
+    )
+    try:
+        engine.encode_completions([unknown_answer])
+    except QuizzNotFound as e:
+        assert e.detail == 'Answer not found'
+    else:
+        assert False
+
+
+async def test_results_are_rescored_after_answer_key_change(
+    quizz_service: QuizzService,
+    quizz_repo: QuizzRepository,
+    test_quizz: QuizzSchema,
+    company_and_users
+):
+    _, owner, user = company_and_users
+    question = test_quizz.questions[0]
+    for respondent, answer in [(owner, question.answers[1]), (user, question.answers[0])]:
+        completion = QuizzCompletionSchema(
+            quizz_id=test_quizz.id,
+            questions=[QuestionCompletionSchema(question_id=question.id, answer_ids=[answer.id])]
+        )
+        await quizz_service.evaluate_quizz(test_quizz, completion, respondent)
+
+    assert not await quizz_service.update_answer(
+        question.answers[0].id, test_quizz.id, AnswerUpdateSchema(text='renamed', is_correct=False)
+    )
+    assert await quizz_service.update_answer(
+        question.answers[0].id, test_quizz.id, AnswerUpdateSchema(text='renamed', is_correct=True)
+    )
+    await rescore_quizz(test_quizz.id, chunk_size=1, pause_seconds=0)
+
+    quizz_repo.db.expire_all()
+    assert (await quizz_repo.get_latest_quizz_result(owner.id, test_quizz.id)).score == 50
+    assert (await quizz_repo.get_latest_quizz_result(user.id, test_quizz.id)).score == 50
+    choice = select(QuizzAnswerChoice.is_correct).where(QuizzAnswerChoice.answer_id == question.answers[0].id)
+    assert await quizz_repo.db.scalar(choice)
+    progress = await quizz_service.get_rescore_progress(test_quizz.id)
+    assert (progress.status, progress.total, progress.processed, progress.updated) == ('done', 2, 2, 2)
+    assert progress.finished_at is not None
+
+
+async def test_import_updates_quizz_in_place(quizz_service: QuizzService, test_quizz: QuizzSchema):
+    question = test_quizz.questions[0]
+    imported = QuizzCreateSchema(
+        title=test_quizz.title,
+        description='Imported description',
+        frequency=test_quizz.frequency,
+        company_id=test_quizz.company_id,
+        questions=[
+            QuestionCreateSchema(
+                text=question.text,
+                answers=[
+                    AnswerCreateSchema(text=question.answers[1].text, is_correct=True),
+                    AnswerCreateSchema(text='option 4', is_correct=False),
+                ],
+            ),
+            QuestionCreateSchema(
+                text='Imported question',
+                answers=[
+                    AnswerCreateSchema(text='yes', is_correct=True),
+                    AnswerCreateSchema(text='no', is_correct=False),
+                ],
+            ),
+        ],
+    )
+
+    quizz, key_changed = await quizz_service.create_or_update_quizz(imported)
+
+    # removed answers change the key
+    assert key_changed
+    assert quizz.id == test_quizz.id
+    assert quizz.description == 'Imported description'
+    assert [q.text for q in quizz.questions] == [question.text, 'Imported question']
+    assert {a.text for a in quizz.questions[0].answers} == {question.answers[1].text, 'option 4'}
+    # kept answer keeps its id, so past choices of it still count
+    assert question.answers[1].id in {a.id for a in quizz.questions[0].answers}
+    assert {a.text for a in quizz.questions[1].answers} == {'yes', 'no'}
+
+    imported.questions = imported.questions[1:]
+    quizz, key_changed = await quizz_service.create_or_update_quizz(imported)
+
+    assert not key_changed
+    assert [q.text for q in quizz.questions] == ['Imported question']
@@ -1,7 +1,11 @@
 import uuid
 import pytest
 from passlib.hash import argon2
+from sqlalchemy import text
+from app.redis import get_redis_client
+from app.redis.cache_writer import CircuitBreaker, ResilientCacheWriter
 from app.repositories import UserRepository
+from app.repositories.user_repository import USERS_COUNT_KEY
 from app.schemas.user_shema import UserSignUpSchema, UserUpdateSchema
 from app.services.users_service import UserService
 from app.services.users_service.exceptions import (
@@ -250,3 +254,113 @@ async def test_delete_user_user_not_found(
         assert 1 == 0, 'UserService did not throw an exception'
     except UserNotFoundException:
         pass
+
+
+@pytest.mark.asyncio
+async def test_get_all_users_with_cursor(
+    user_repo: UserRepository,
+    user_service: UserService,
+):
+    for i in range(5):
+        user = user_repo.create_user_with_hashed_password(
+            username=f'user_{i}',
+            first_name='User',
+            last_name=str(i),
+            email=f'user_{i}@example.com',
+            hashed_password='password123'
+        )
+        await user_repo.commit_me(user)
+
+    first_page = await user_service.get_all_users(1, 2)
+    second_page = await user_service.get_all_users(1, 2, first_page.next_cursor)
+    last_page = await user_service.get_all_users(1, 2, second_page.next_cursor)
+
+    assert [user.username for user in first_page.users] == ['user_0', 'user_1']
+    assert [user.username for user in second_page.users] == ['user_2', 'user_3']
+    assert [user.username for user in last_page.users] == ['user_4']
+    assert last_page.next_cursor is None
+    assert last_page.total_count == 5
+
+    page_mode = await user_service.get_all_users(2, 2)
+    assert page_mode.users == second_page.users
+
+
+@pytest.mark.asyncio
+async def test_get_all_users_count_modes(
+    user_repo: UserRepository,
+    user_service: UserService,
+):
+    redis = await get_redis_client()
+    await redis.delete(USERS_COUNT_KEY)
+    await redis.close()
+    for i in range(3):
+        user = user_repo.create_user_with_hashed_password(
+            username=f'user_{i}',
+            first_name='User',
+            last_name=str(i),
+            email=f'user_{i}@example.com',
+            hashed_password='password123'
+        )
+        await user_repo.commit_me(user)
+
+    exact = await user_service.get_all_users(1, 10)
+    assert (exact.total_count, exact.count_mode) == (3, 'exact')
+
+    cached = await user_service.get_all_users(1, 10, count_mode='cached')
+    assert (cached.total_count, cached.count_mode) == (3, 'cached')
+    user = user_repo.create_user_with_hashed_password(
+        username='user_3',
+        first_name='User',
+        last_name='3',
+        email='user_3@example.com',
+        hashed_password='password123'
+    )
+    await user_repo.commit_me(user)
+    cached = await user_service.get_all_users(1, 10, count_mode='cached')
+    assert cached.total_count == 4
+
+    # small tables are counted exactly, the planner estimate is not worth it
+    small = await user_service.get_all_users(1, 10, count_mode='estimate')
+    assert (small.total_count, small.count_mode) == (4, 'exact')
+
+    await user_repo.db.execute(text('ANALYZE users'))
+    user_service._user_repository.exact_count_threshold = 0
+    estimate = await user_service.get_all_users(1, 10, count_mode='estimate')
+    assert (estimate.total_count, estimate.count_mode) == (4, 'estimate')
+
+
+@pytest.mark.asyncio
+async def test_counts_fall_back_to_database_while_redis_is_down(
+    user_service: UserService,
+    monkeypatch,
+):
+    async def unavailable_redis():
+        raise ConnectionError('redis is down')
+
+    await user_service.get_all_users(1, 10, count_mode='cached')
+    writer = ResilientCacheWriter(
+        timeout_seconds=0.5, queue_size=10, breaker=CircuitBreaker(1, 60), redis_factory=unavailable_redis
+    )
+    monkeypatch.setattr('app.repositories.repository_base.cache_writer', writer)
+
+    # sign up commits before the cached count is dropped, failing redis does not fail it
+    await user_service.create_user(
+        UserSignUpSchema(
+            username='user_1',
+            first_name='User',
+            last_name='1',
+            email='user_1@example.com',
+            password='testpass123',
+            password_confirmation='testpass123',
+        )
+    )
+    assert writer.is_pending(USERS_COUNT_KEY)
+    cached = await user_service.get_all_users(1, 10, count_mode='cached')
+    assert cached.total_count == 1
+
+    writer.breaker.reset_seconds = 0
+    writer._redis_factory = get_redis_client
+    assert await writer.flush() == 1
+    redis = await get_redis_client()
+    assert await redis.get(USERS_COUNT_KEY) is None
+    await redis.close()